@@ -5,7 +5,8 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    # conversion_service.py нужен как файл: его запускает Python из поставки LibreOffice (UNO)
+    datas=[('conversion_service.py', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -1,50 +1,42 @@
 # agency_fee.py
 
-import tkinter as tk
-from tkinter import ttk
 from utils import format_amount
+from banded_table import BandedTable
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Предварительно заполненный словарь с данными agency fee
-# Ключи — диапазоны cv, значения — соответствующие agency fee
-agency_fee_dict = {
-    (0, 1800): 1194,
-    (1801, 3600): 1478,
-    (3601, 5500): 1764,
-    (5501, 7200): 2076,
-    (7201, 11000): 2446,
-    (11001, 15000): 2816,
-    (15001, 22000): 3242,
-    (22001, 30000): 3754,
-    (30001, 37000): 4210,
-    (37001, 44000): 4636,
-    (44001, 51000): 5120,
-    (51001, 59000): 5574,
-    (59001, 66000): 6030,
-    (66001, 73000): 6512,
-    (73001, 92000): 6969,
-    (92001, float('inf')): 8172,
-}
+# Таблица agency fee по CV: верхняя граница полосы входит в неё, полосы идут без разрывов
+# (CV 1800.5 попадает в полосу до 3600)
+AGENCY_FEE_TABLE = BandedTable(
+    uppers=[1800, 3600, 5500, 7200, 11000, 15000, 22000, 30000, 37000, 44000,
+            51000, 59000, 66000, 73000, 92000, float('inf')],
+    values=[1194, 1478, 1764, 2076, 2446, 2816, 3242, 3754, 4210, 4636,
+            5120, 5574, 6030, 6512, 6969, 8172],
+)
 
 def calculate_cv(lbp, beam, rdm):
     """Рассчитывает cv на основе lbp, beam и rdm."""
     return lbp * beam * rdm
 
 def get_agency_fee(cv):
-    """Возвращает agency fee на основе cv из словаря."""
-    for (min_cv, max_cv), fee in agency_fee_dict.items():
-        if min_cv <= cv <= max_cv:
-            return fee
-    return None  # Если cv не попадает ни в один диапазон
+    """Возвращает agency fee на основе cv (None, если cv не попадает ни в один диапазон)."""
+    return AGENCY_FEE_TABLE.lookup(cv)
+
+def get_agency_fees(cvs):
+    """Agency fee для массива cv одним вызовом (numpy); вне таблицы — nan."""
+    return AGENCY_FEE_TABLE.lookup_many(cvs)
 
 def show_agency_fee_table(cv):
     """Отображает всплывающее окно с таблицей agency fee."""
-    agency_fee = get_agency_fee(cv)
+    # Tk импортируется здесь, чтобы get_agency_fee можно было использовать без GUI
+    import tkinter as tk
+    from tkinter import ttk
+
+    band_index = AGENCY_FEE_TABLE.band_index(cv)
 
-    if agency_fee is None:
-        logger.error("CV не соответствует ни одному диапазону в словаре agency_fee_dict.")
+    if band_index is None:
+        logger.error("CV не соответствует ни одному диапазону в таблице agency fee.")
         return
 
     # Создаём новое окно
@@ -54,24 +46,18 @@ def show_agency_fee_table(cv):
     # Создаём таблицу
     columns = ("CV Range", "Agency Fee")
     tree = ttk.Treeview(window, columns=columns, show="headings")
-    tree.heading("CV Range", text="Диапазон CV")
+    tree.heading("CV Range", text="Диапазон CV (до включительно)")
     tree.heading("Agency Fee", text="Agency Fee")
 
-    # Заполняем таблицу данными из словаря
-    for (min_cv, max_cv), fee in agency_fee_dict.items():
+    # Заполняем таблицу полосами; строка выбирается по номеру полосы
+    items = []
+    for min_cv, max_cv, fee in AGENCY_FEE_TABLE.bands():
         cv_range = f"{min_cv} - {max_cv if max_cv != float('inf') else '∞'}"
-        tree.insert("", "end", values=(cv_range, format_amount(fee)))
+        items.append(tree.insert("", "end", values=(cv_range, format_amount(fee))))
 
     # Выделяем строку, соответствующую текущему cv
-    for item in tree.get_children():
-        item_values = tree.item(item)['values']
-        range_str = item_values[0]
-        min_cv_str, max_cv_str = range_str.split(' - ')
-        min_cv_val = float(min_cv_str)
-        max_cv_val = float(max_cv_str.replace('∞', 'inf'))
-        if min_cv_val <= cv <= max_cv_val:
-            tree.selection_set(item)
-            break
+    tree.selection_set(items[band_index])
+    tree.see(items[band_index])
 
     tree.pack(fill=tk.BOTH, expand=True)
 
@@ -0,0 +1,74 @@
+# banded_table.py
+
+from bisect import bisect_left
+
+
+class BandedTable:
+    """
+    Таблица значений по диапазонам (полосам) числовой величины, например agency fee по CV.
+
+    Полосы идут подряд без разрывов, верхняя граница входит в полосу:
+    первая полоса — [lower, upper_0], каждая следующая — (upper_(i-1), upper_i].
+    Последняя верхняя граница может быть float('inf').
+    Поиск полосы — двоичный, O(log n).
+    """
+
+    __slots__ = ('lower', 'uppers', 'values')
+
+    def __init__(self, uppers, values, lower=0):
+        """
+        :param uppers: Верхние границы полос по возрастанию.
+        :param values: Значения для каждой полосы.
+        :param lower: Нижняя граница первой полосы (включительно).
+        """
+        uppers = tuple(uppers)
+        values = tuple(values)
+        if len(uppers) != len(values) or not uppers:
+            raise ValueError("Количество границ и значений полос должно совпадать и быть больше нуля")
+        if any(a >= b for a, b in zip(uppers, uppers[1:])) or uppers[0] < lower:
+            raise ValueError("Границы полос должны строго возрастать")
+        self.lower = lower
+        self.uppers = uppers
+        self.values = values
+
+    @classmethod
+    def from_bands(cls, bands):
+        """Строит таблицу из словаря {(от, до): значение} в порядке возрастания диапазонов."""
+        ranges = sorted(bands)
+        return cls([upper for _, upper in ranges], [bands[band] for band in ranges], lower=ranges[0][0])
+
+    def __len__(self):
+        return len(self.uppers)
+
+    def band_index(self, x):
+        """Номер полосы, в которую попадает x, или None, если x вне таблицы."""
+        if x < self.lower:
+            return None
+        index = bisect_left(self.uppers, x)
+        return index if index < len(self.uppers) else None
+
+    def lookup(self, x, default=None):
+        index = self.band_index(x)
+        return self.values[index] if index is not None else default
+
+    def band_indexes(self, xs):
+        """Номера полос для массива значений (numpy.searchsorted); вне таблицы — -1."""
+        import numpy as np
+
+        xs = np.asarray(xs, dtype=np.float64)
+        indexes = np.searchsorted(np.asarray(self.uppers, dtype=np.float64), xs, side='left')
+        outside = (xs < self.lower) | (indexes >= len(self.uppers)) | np.isnan(xs)
+        return np.where(outside, -1, indexes)
+
+    def lookup_many(self, xs, default=float('nan')):
+        """Значения для массива величин за один вызов; вне таблицы — default."""
+        import numpy as np
+
+        indexes = self.band_indexes(xs)
+        values = np.asarray(self.values, dtype=np.float64)
+        return np.where(indexes >= 0, values[np.maximum(indexes, 0)], default)
+
+    def bands(self):
+        """Полосы в виде кортежей (нижняя граница, верхняя граница, значение)."""
+        lowers = (self.lower,) + self.uppers[:-1]
+        return list(zip(lowers, self.uppers, self.values))
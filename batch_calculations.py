@@ -0,0 +1,204 @@
+# batch_calculations.py
+
+import numpy as np
+
+from tariff_registry import get_tariff, MILES_KEYS
+from utils import parse_input, parse_overtime
+from money import to_minor_array, from_minor_array, vat_on_array, vat_included_in_array
+
+
+def _as_float_column(values, size=None):
+    """Преобразует колонку (числа или строки из формы) в массив float64."""
+    array = np.asarray(values)
+    if array.dtype.kind in 'USO':
+        array = np.array([parse_input(str(value)) for value in array.ravel()], dtype=np.float64)
+    else:
+        array = array.astype(np.float64).ravel()
+    if size is not None and array.size == 1 and size != 1:
+        array = np.full(size, array[0])
+    return array
+
+
+def _as_overtime_column(values, size):
+    """Овертайм принимается как доля (0.25) или как строка из комбобокса ("25%")."""
+    array = np.asarray(values)
+    if array.dtype.kind in 'USO':
+        array = np.array([parse_overtime(str(value)) for value in array.ravel()], dtype=np.float64)
+    else:
+        array = array.astype(np.float64).ravel()
+    if array.size == 1 and size != 1:
+        array = np.full(size, array[0])
+    return array
+
+
+def _as_miles_column(values, size):
+    """Мили, как и в скалярном расчёте, приводятся к целому числу."""
+    array = np.asarray(values)
+    if array.dtype.kind in 'USO':
+        array = np.array([int(value) for value in array.ravel()], dtype=np.float64)
+    else:
+        array = np.trunc(array.astype(np.float64)).ravel()
+    if array.size == 1 and size != 1:
+        array = np.full(size, array[0])
+    return array
+
+
+class BatchResult:
+    """
+    Результат пакетного расчёта.
+
+    Матрицы amount_minor, vat_amount_minor и total_amount_minor (int64, центы) имеют форму
+    (количество судов, количество сборов), порядок колонок совпадает с fee_names и с порядком
+    строк FeeCalculation.fees. Подытоги — точные целые суммы колонок, как в FeeLedger.
+    Атрибуты без суффикса _minor — те же значения в валюте (float64).
+    """
+
+    def __init__(self, fee_names, categories, vat_applicable, cv, amount_minor, vat_amount_minor, total_amount_minor):
+        self.fee_names = tuple(fee_names)
+        self.categories = tuple(categories)
+        self.vat_applicable = np.asarray(vat_applicable, dtype=bool)
+        self.cv = cv
+        self.amount_minor = amount_minor
+        self.vat_amount_minor = vat_amount_minor
+        self.total_amount_minor = total_amount_minor
+        self.subtotal_dues_minor = None
+        self.subtotal_agency_fees_minor = None
+        self.total_vat_minor = None
+        self.grand_total_minor = None
+
+    @property
+    def amount(self):
+        return from_minor_array(self.amount_minor)
+
+    @property
+    def vat_amount(self):
+        return from_minor_array(self.vat_amount_minor)
+
+    @property
+    def total_amount(self):
+        return from_minor_array(self.total_amount_minor)
+
+    @property
+    def subtotal_dues(self):
+        return from_minor_array(self.subtotal_dues_minor)
+
+    @property
+    def subtotal_agency_fees(self):
+        return from_minor_array(self.subtotal_agency_fees_minor)
+
+    @property
+    def total_vat(self):
+        return from_minor_array(self.total_vat_minor)
+
+    @property
+    def grand_total(self):
+        return from_minor_array(self.grand_total_minor)
+
+    def __len__(self):
+        return self.cv.shape[0]
+
+    def column(self, fee_name):
+        """Возвращает индекс колонки сбора по его названию."""
+        return self.fee_names.index(fee_name)
+
+
+def _sum_columns(matrix, mask, extra=None):
+    # Суммы в целых центах точны при любом порядке сложения
+    result = matrix[:, mask].sum(axis=1, dtype=np.int64)
+    if extra is not None:
+        result = result + extra
+    return result
+
+
+def calculate_fees_batch(port_name, columns):
+    """
+    Рассчитывает сборы для множества судов за один проход по тарифу порта.
+
+    :param port_name: Название порта, как в комбобоксе ("Chornomorsk", "Odesa", "Pivdenniy").
+    :param columns: Словарь колонок с ключами как во входных данных FeeCalculator: 'lbp', 'beam', 'rdm',
+        'miles_inward_in', 'miles_inward_out', 'miles_outward_in', 'miles_outward_out',
+        'overtime_in', 'overtime_out', 'agency_fee', 'bank_charges'. Необязательные колонки
+        'additional_dues' и 'additional_fees' содержат суммы дополнительных Dues и Fees по каждому судну.
+        Скалярные значения распространяются на все строки.
+    :return: BatchResult.
+    """
+    tariff = get_tariff(port_name)
+    vat_rate = tariff.vat_rate
+
+    lbp = _as_float_column(columns['lbp'])
+    size = lbp.size
+    beam = _as_float_column(columns['beam'], size)
+    rdm = _as_float_column(columns['rdm'], size)
+    cv = np.ceil(lbp * beam * rdm)
+
+    miles = {key: _as_miles_column(columns.get(key, 0), size) for key in MILES_KEYS}
+    overtime = {
+        'in': _as_overtime_column(columns.get('overtime_in', 0.0), size),
+        'out': _as_overtime_column(columns.get('overtime_out', 0.0), size),
+    }
+
+    fee_names = []
+    categories = []
+    vat_applicable = []
+    amount_columns = []
+    vat_columns = []
+    total_columns = []
+
+    def add_column(name, category, applicable, amount, vat, total):
+        fee_names.append(name)
+        categories.append(category)
+        vat_applicable.append(applicable)
+        amount_columns.append(amount)
+        vat_columns.append(vat)
+        total_columns.append(total)
+
+    zeros = np.zeros(size, dtype=np.int64)
+
+    # Сборы порта в порядке файла тарифа; правила округления — как в fee_ledger.compute_fee
+    for tariff_fee in tariff.fees:
+        base_amount = cv * tariff_fee.coefficient
+        if tariff_fee.miles_key is not None:
+            base_amount = base_amount * miles[tariff_fee.miles_key]
+        if tariff_fee.direction is not None:
+            base_amount = base_amount * (1 + overtime[tariff_fee.direction])
+        amount = to_minor_array(base_amount)
+        if not tariff_fee.vat_applicable:
+            add_column(tariff_fee.name, 'Dues', False, amount, zeros, amount)
+        elif tariff_fee.vat_included:
+            add_column(tariff_fee.name, 'Dues', True, amount, vat_included_in_array(amount, vat_rate), amount)
+        else:
+            vat_amount = vat_on_array(amount, vat_rate)
+            add_column(tariff_fee.name, 'Dues', True, amount, vat_amount, amount + vat_amount)
+
+    # Agency fee и Bank charges
+    agency_fee = to_minor_array(_as_float_column(columns.get('agency_fee', 0.0), size))
+    add_column('Agency fee', 'Agency Fees', False, agency_fee, zeros, agency_fee)
+    bank_charges = to_minor_array(_as_float_column(columns.get('bank_charges', 0.0), size))
+    add_column('Bank charges', 'Agency Fees', False, bank_charges, zeros, bank_charges)
+
+    result = BatchResult(
+        fee_names,
+        categories,
+        vat_applicable,
+        cv,
+        np.column_stack(amount_columns),
+        np.column_stack(vat_columns),
+        np.column_stack(total_columns),
+    )
+
+    # Суммы дополнительных Dues и Fees судна; в скалярном расчёте каждая строка округляется отдельно,
+    # поэтому здесь колонка уже должна быть суммой округлённых строк
+    additional_dues = None
+    if 'additional_dues' in columns:
+        additional_dues = to_minor_array(_as_float_column(columns['additional_dues'], size))
+    additional_fees = None
+    if 'additional_fees' in columns:
+        additional_fees = to_minor_array(_as_float_column(columns['additional_fees'], size))
+
+    categories = np.array(categories)
+    result.subtotal_dues_minor = _sum_columns(result.total_amount_minor, categories == 'Dues', additional_dues)
+    result.subtotal_agency_fees_minor = _sum_columns(
+        result.total_amount_minor, categories == 'Agency Fees', additional_fees)
+    result.total_vat_minor = _sum_columns(result.vat_amount_minor, result.vat_applicable)
+    result.grand_total_minor = result.subtotal_dues_minor + result.subtotal_agency_fees_minor
+    return result
@@ -0,0 +1,434 @@
+# benchmarks.py
+"""
+Набор замеров производительности: расчёт по портам (скалярный и пакетный), поиск agency fee,
+заполнение и сохранение шаблонов, формирование FDA и PDF целиком.
+
+Работает без дисплея и без LibreOffice: конвертация идёт через заглушку soffice,
+которая копирует заранее сформированный PDF.
+
+    python benchmarks.py --output results.json
+    python benchmarks.py --compare baseline.json --threshold 0.25
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+from contextlib import contextmanager
+
+DEFAULT_REPEAT = 7
+DEFAULT_THRESHOLD = 0.20  # допустимое замедление медианы относительно базовой линии
+BATCH_SIZE = 10000
+AGENCY_FEE_CVS = 100000
+POOL_DOCUMENTS = 64
+POOL_INSTANCES = 4
+
+# Заглушка soffice: "конвертирует" документ копированием готового PDF
+STUB_SOFFICE = '''#!{python}
+import os, shutil, sys
+args = sys.argv[1:]
+position = args.index('--outdir')
+outdir = args[position + 1]
+for src in args[position + 2:]:
+    name = os.path.splitext(os.path.basename(src))[0] + '.pdf'
+    shutil.copy({canned_pdf!r}, os.path.join(outdir, name))
+'''
+
+
+def benchmark_inputs(port):
+    from constants import DEFAULT_INPUTS
+    return dict(DEFAULT_INPUTS, port=port, lbp='199.9', beam='32.26', rdm='12.5',
+                overtime_in='25%', overtime_out='50%', additional_dues=[], additional_fees=[])
+
+
+@contextmanager
+def scalar_calculation(workdir, port):
+    from calculations import calculate_proforma
+    inputs = benchmark_inputs(port)
+    yield lambda: calculate_proforma(inputs)
+
+
+@contextmanager
+def batch_calculation(workdir, port):
+    import numpy as np
+    from batch_calculations import calculate_fees_batch
+
+    rng = np.random.default_rng(1)
+    columns = {
+        'lbp': rng.uniform(50, 300, BATCH_SIZE),
+        'beam': rng.uniform(10, 50, BATCH_SIZE),
+        'rdm': rng.uniform(5, 20, BATCH_SIZE),
+        'miles_inward_in': rng.integers(1, 6, BATCH_SIZE),
+        'miles_inward_out': rng.integers(1, 6, BATCH_SIZE),
+        'miles_outward_in': rng.integers(1, 6, BATCH_SIZE),
+        'miles_outward_out': rng.integers(1, 6, BATCH_SIZE),
+        'overtime_in': rng.choice([0.0, 0.25, 0.5, 1.0], BATCH_SIZE),
+        'overtime_out': rng.choice([0.0, 0.25, 0.5, 1.0], BATCH_SIZE),
+        'agency_fee': 1000.0,
+        'bank_charges': 50.0,
+    }
+    yield lambda: calculate_fees_batch(port, columns)
+
+
+def _agency_fee_cvs():
+    from agency_fee import AGENCY_FEE_TABLE
+    lower = AGENCY_FEE_TABLE.lower
+    upper = AGENCY_FEE_TABLE.uppers[-1]
+    step = (upper - lower) / AGENCY_FEE_CVS
+    return [lower + step * i for i in range(AGENCY_FEE_CVS)]
+
+
+@contextmanager
+def compare_all_ports(workdir):
+    """Одно судно по тарифам всех портов: сводная матрица тарифов, один проход."""
+    from port_comparison import compare_ports
+
+    inputs = benchmark_inputs('Chornomorsk')
+    yield lambda: compare_ports(inputs)
+
+
+@contextmanager
+def agency_fee_scalar(workdir):
+    from agency_fee import get_agency_fee
+    cvs = _agency_fee_cvs()
+    yield lambda: [get_agency_fee(cv) for cv in cvs]
+
+
+@contextmanager
+def agency_fee_bulk(workdir):
+    import numpy as np
+    from agency_fee import get_agency_fees
+    cvs = np.array(_agency_fee_cvs())
+    yield lambda: get_agency_fees(cvs)
+
+
+@contextmanager
+def template_fill(workdir):
+    from calculations import calculate_proforma
+    from constants import TEMPLATE_PATH
+    from template_cache import load_template
+    from proforma_document import fill_proforma
+
+    inputs = benchmark_inputs('Chornomorsk')
+    calculation = calculate_proforma(inputs)
+
+    def run():
+        wb = load_template(TEMPLATE_PATH)
+        fill_proforma(wb.active, calculation, inputs)
+        return wb
+    yield run
+
+
+@contextmanager
+def template_save(workdir):
+    from calculations import calculate_proforma
+    from constants import TEMPLATE_PATH
+    from template_cache import load_template
+    from proforma_document import fill_proforma
+
+    inputs = benchmark_inputs('Chornomorsk')
+    calculation = calculate_proforma(inputs)
+
+    # Загруженную книгу с изображениями openpyxl сохраняет только один раз: каждая попытка — новая книга
+    def prepare():
+        wb = load_template(TEMPLATE_PATH)
+        fill_proforma(wb.active, calculation, inputs)
+        return wb
+    yield prepare, lambda wb: wb.save(io.BytesIO())
+
+
+@contextmanager
+def fda_generate(workdir):
+    from calculations import calculate_proforma
+    from fda_tab import build_fda_workbook, write_fda_template
+
+    calculation = calculate_proforma(benchmark_inputs('Chornomorsk'))
+    fda_data = {item.name: item.total_amount * 1.01 for item in calculation.get_fees_and_dues()}
+    template_path = os.path.join(workdir, 'fda_template.xlsx')
+    write_fda_template(template_path, fda_data)
+
+    def run():
+        wb, missing = build_fda_workbook(fda_data, template_path)
+        wb.save(io.BytesIO())
+    yield run
+
+
+INVOICE_LINES = 5000
+
+
+@contextmanager
+def invoice_import(workdir):
+    """Импорт счёта поставщика (XLSX, read_only) с точными, нечёткими и лишними строками."""
+    import openpyxl
+    from calculations import calculate_proforma
+    from invoice_import import import_invoice
+
+    names = [item.name for item in calculate_proforma(benchmark_inputs('Chornomorsk')).get_fees_and_dues()]
+    descriptions = [name.upper() for name in names] + [name[:-1] for name in names] + ["Прочие услуги"]
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Description", "Qty", "Amount"])
+    for index in range(INVOICE_LINES):
+        ws.append([descriptions[index % len(descriptions)], 1, f"{index % 997},50"])
+    path = os.path.join(workdir, 'invoice.xlsx')
+    wb.save(path)
+    yield lambda: import_invoice(path, names)
+
+
+@contextmanager
+def pdf_native(workdir):
+    from calculations import calculate_proforma
+    from proforma_document import render_pdf
+
+    inputs = benchmark_inputs('Chornomorsk')
+    calculation = calculate_proforma(inputs)
+    pdf_path = os.path.join(workdir, 'native.pdf')
+    yield lambda: render_pdf(calculation, inputs, pdf_path, engine='native')
+
+
+@contextmanager
+def pdf_cache_hit(workdir):
+    """Повторный просмотр/печать того же расчёта: документ берётся из кэша документов."""
+    from calculations import calculate_proforma
+    from document_cache import DocumentCache, get_pdf
+
+    cache = DocumentCache(os.path.join(workdir, 'documents'))
+    calculation = calculate_proforma(benchmark_inputs('Chornomorsk'))
+    get_pdf(calculation, engine='native', cache=cache)
+    yield lambda: get_pdf(calculation, engine='native', cache=cache)
+
+
+def write_stub_soffice(workdir):
+    """Создаёт заглушку soffice и PDF, который она возвращает; возвращает путь к заглушке."""
+    from calculations import calculate_proforma
+    from proforma_document import render_pdf
+
+    inputs = benchmark_inputs('Chornomorsk')
+    canned_pdf = os.path.join(workdir, 'canned.pdf')
+    render_pdf(calculate_proforma(inputs), inputs, canned_pdf, engine='native')
+
+    stub_path = os.path.join(workdir, 'soffice')
+    with open(stub_path, 'w', encoding='utf-8') as f:
+        f.write(STUB_SOFFICE.format(python=sys.executable, canned_pdf=canned_pdf))
+    os.chmod(stub_path, 0o755)
+    return stub_path
+
+
+@contextmanager
+def command_converter():
+    """
+    PROFORMA_CONVERTER=command на время замера: воркеры, запущенные в нём, вызывают заглушку soffice.
+    После замера переменная окружения возвращается к прежнему значению.
+    """
+    previous = os.environ.get('PROFORMA_CONVERTER')
+    os.environ['PROFORMA_CONVERTER'] = 'command'
+    try:
+        yield
+    finally:
+        if previous is None:
+            del os.environ['PROFORMA_CONVERTER']
+        else:
+            os.environ['PROFORMA_CONVERTER'] = previous
+
+
+@contextmanager
+def pdf_libreoffice(workdir):
+    """Путь GUI: шаблон -> xlsx -> ConversionService (воркер с заглушкой soffice) -> копирование."""
+    from calculations import calculate_proforma
+    from conversion_service import ConversionService
+    from proforma_document import render_pdf
+
+    with command_converter():
+        service = ConversionService(write_stub_soffice(workdir), profile_dir=os.path.join(workdir, 'profile'))
+        inputs = benchmark_inputs('Chornomorsk')
+        calculation = calculate_proforma(inputs)
+        pdf_path = os.path.join(workdir, 'libreoffice.pdf')
+        try:
+            yield lambda: render_pdf(calculation, inputs, pdf_path, converter=service, engine='libreoffice')
+        finally:
+            service.stop()
+
+
+@contextmanager
+def pdf_libreoffice_pool(workdir):
+    """Массовая конвертация: POOL_DOCUMENTS xlsx через пул из POOL_INSTANCES экземпляров (заглушка soffice)."""
+    from calculations import calculate_proforma
+    from conversion_service import ConversionPool
+    from proforma_document import render_xlsx
+
+    inputs = benchmark_inputs('Chornomorsk')
+    src_paths = []
+    for index in range(POOL_DOCUMENTS):
+        src_paths.append(os.path.join(workdir, f"pool-{index}.xlsx"))
+        render_xlsx(calculate_proforma(inputs), inputs, src_paths[-1])
+    outdir = os.path.join(workdir, 'pool')
+    os.makedirs(outdir, exist_ok=True)
+
+    with command_converter():
+        pool = ConversionPool(write_stub_soffice(workdir), instances=POOL_INSTANCES,
+                              profile_dir=os.path.join(workdir, 'pool-profile'))
+
+        def run():
+            for future in [pool.submit(src_path, outdir) for src_path in src_paths]:
+                future.result()
+        try:
+            yield run
+        finally:
+            pool.stop()
+
+
+def collect_cases():
+    """
+    Список замеров: (имя, число вызовов в одном повторе, фабрика контекста).
+    Контекст отдаёт функцию замера или пару (подготовка, функция).
+    """
+    from tariff_registry import get_ports
+
+    cases = []
+    for port in get_ports():
+        cases.append((f"calc.scalar[{port}]", 200, lambda workdir, port=port: scalar_calculation(workdir, port)))
+        cases.append((f"calc.batch[{port}]", 1, lambda workdir, port=port: batch_calculation(workdir, port)))
+    cases += [
+        ("calc.compare_ports", 200, compare_all_ports),
+        ("agency_fee.scalar", 1, agency_fee_scalar),
+        ("agency_fee.bulk", 1, agency_fee_bulk),
+        ("template.fill", 5, template_fill),
+        ("template.save", 5, template_save),
+        ("fda.generate", 5, fda_generate),
+        ("fda.invoice_import", 1, invoice_import),
+        ("pdf.native", 5, pdf_native),
+        ("pdf.libreoffice_stub", 3, pdf_libreoffice),
+        ("pdf.libreoffice_pool", 1, pdf_libreoffice_pool),
+        ("pdf.cache_hit", 50, pdf_cache_hit),
+    ]
+    return cases
+
+
+def measure(func, number, repeat, prepare=None):
+    """
+    Медиана, минимум и максимум времени одного вызова по repeat повторам (после прогрева).
+
+    :param prepare: Необязательная подготовка вне замера; её результат передаётся в func.
+    """
+    if prepare is None:
+        call = func
+    else:
+        def call():
+            argument = prepare()
+            start = time.perf_counter()
+            func(argument)
+            return time.perf_counter() - start
+
+    call()
+    timings = []
+    for _ in range(repeat):
+        if prepare is None:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            elapsed = time.perf_counter() - start
+        else:
+            elapsed = sum(call() for _ in range(number))
+        timings.append(elapsed / number)
+    return {
+        'median_s': statistics.median(timings),
+        'min_s': min(timings),
+        'max_s': max(timings),
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def run_benchmarks(selected=None, repeat=DEFAULT_REPEAT):
+    """
+    Выполняет замеры (все или с подстрокой из selected в имени).
+
+    :return: Словарь {'meta': ..., 'results': {имя: статистика}}.
+    """
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='proforma-bench-')
+    try:
+        for name, number, factory in collect_cases():
+            if selected and not any(pattern in name for pattern in selected):
+                continue
+            with factory(workdir) as case:
+                # Замер — функция либо пара (подготовка вне замера, функция)
+                prepare, func = case if isinstance(case, tuple) else (None, case)
+                results[name] = measure(func, number, repeat, prepare)
+            print(f"{name:32} {results[name]['median_s'] * 1000:10.3f} мс", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+        },
+        'results': results,
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Сравнивает медианы с базовой линией.
+
+    :return: Список строк (имя, базовая медиана, текущая медиана, отношение, регрессия ли).
+    """
+    rows = []
+    for name, current in results['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            rows.append((name, None, current['median_s'], None, False))
+            continue
+        ratio = current['median_s'] / previous['median_s'] if previous['median_s'] else float('inf')
+        rows.append((name, previous['median_s'], current['median_s'], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def print_comparison(rows, threshold):
+    print(f"{'Замер':32} {'база, мс':>12} {'сейчас, мс':>12} {'отношение':>10}")
+    for name, previous, current, ratio, regression in rows:
+        previous_text = f"{previous * 1000:12.3f}" if previous is not None else f"{'—':>12}"
+        ratio_text = f"{ratio:10.2f}" if ratio is not None else f"{'новый':>10}"
+        flag = f"  РЕГРЕССИЯ (> +{threshold:.0%})" if regression else ""
+        print(f"{name:32} {previous_text} {current * 1000:12.3f} {ratio_text}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности расчёта и документов.")
+    parser.add_argument('-k', '--only', action='append', help="Только замеры, имя которых содержит подстроку")
+    parser.add_argument('-r', '--repeat', type=int, default=DEFAULT_REPEAT, help="Число повторов каждого замера")
+    parser.add_argument('-o', '--output', help="Сохранить результаты (базовую линию) в JSON")
+    parser.add_argument('-c', '--compare', help="Сравнить с базовой линией из JSON")
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Допустимое замедление медианы, доля (по умолчанию 0.20)")
+    args = parser.parse_args(argv)
+
+    # Кэши шаблонов и журналы замеров не должны смешиваться с пользовательскими
+    os.environ.setdefault('PROFORMA_CACHE_DIR', tempfile.mkdtemp(prefix='proforma-bench-cache-'))
+
+    results = run_benchmarks(args.only, args.repeat)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(row[4] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
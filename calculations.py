@@ -1,256 +1,323 @@
 # calculations.py
 
-# from constants import (
-    # FEES_WITHOUT_VAT,
-    # FEES_WITH_VAT_WITH_MILES,
-    # FEES_WITH_VAT_WITHOUT_MILES,
-    # FEES_WITH_INCLUDED_VAT,
-    # VAT_RATE
-# )
-from utils import parse_input, format_amount, parse_overtime, ceil_value
-
-
-class Fee:
-    def __init__(
-            self,
-            name,
-            coefficient,
-            vat_applicable=False,
-            vat_included=False,
-            category='Dues',
-            uses_miles=False,
-            vat_rate=0.0  # Добавляем vat_rate
-    ):
+from types import MappingProxyType
+from functools import lru_cache
+
+from utils import parse_input, parse_overtime, ceil_value
+from tariff_registry import get_tariff
+from fee_ledger import FeeLedger, VAT_MODES, DIRECTIONS, DUES, AGENCY_FEES
+from money import from_minor
+from perf import span
+
+# Фиксированные ставки овертайма для итогов "Basis N% overtime"
+FIXED_OVERTIME_RATES = (0.25, 0.50, 1.00)  # 25%, 50%, 100%
+
+
+class FeeCalculation:
+    """
+    Результат расчёта проформы. Неизменяем: после создания его можно передавать в рабочие потоки
+    и использовать параллельно для документов без копирования.
+
+    Итоги считаются в целых центах (поля *_minor); поля без суффикса — те же суммы в валюте.
+    """
+
+    __slots__ = ('inputs', 'tariff', 'cv', 'ledger', 'additional_dues', 'additional_fees',
+                 'subtotal_dues_minor', 'subtotal_agency_fees_minor', 'total_vat_minor', 'total_amount_minor',
+                 'subtotal_dues', 'subtotal_agency_fees', 'total_vat', 'total_amount',
+                 'dues_grid', 'fixed_totals', 'overtime_totals')
+
+    def __init__(self, inputs, tariff, cv, ledger, additional_dues, additional_fees, overtime_rates,
+                 dues_grid=None):
+        values = {
+            'inputs': MappingProxyType(dict(inputs)),
+            'tariff': tariff,
+            'cv': cv,
+            'ledger': ledger,
+            'additional_dues': tuple(additional_dues),
+            'additional_fees': tuple(additional_fees),
+            'subtotal_dues_minor': ledger.subtotals[DUES],
+            'subtotal_agency_fees_minor': ledger.subtotals[AGENCY_FEES],
+            'total_vat_minor': ledger.total_vat,
+            'total_amount_minor': ledger.subtotals[DUES] + ledger.subtotals[AGENCY_FEES],
+        }
+        values['subtotal_dues'] = from_minor(values['subtotal_dues_minor'])
+        values['subtotal_agency_fees'] = from_minor(values['subtotal_agency_fees_minor'])
+        values['total_vat'] = from_minor(values['total_vat_minor'])
+        values['total_amount'] = from_minor(values['total_amount_minor'])
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+        # Все сочетания фиксированных ставок, включая разные in/out; в fixed_totals — одинаковые in и out
+        # (dues_grid — уже посчитанные подытоги Dues в центах для этих сочетаний, если Dues не менялись)
+        pairs = [(rate_in, rate_out) for rate_in in overtime_rates for rate_out in overtime_rates]
+        if dues_grid is None:
+            with span("calc.overtime_totals"):
+                dues_grid = ledger.overtime_totals(pairs)
+        object.__setattr__(self, 'dues_grid', tuple(dues_grid))
+        overtime_totals = self.calculate_overtime_totals(pairs, self.dues_grid)
+        object.__setattr__(self, 'overtime_totals', MappingProxyType(overtime_totals))
+        object.__setattr__(self, 'fixed_totals', MappingProxyType(
+            {rate: overtime_totals[(rate, rate)] for rate in overtime_rates}))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Результат расчёта нельзя изменять")
+
+    @property
+    def fees(self):
+        """Все строки ведомости (Dues и Agency Fees)."""
+        return self.ledger.lines()
+
+    @property
+    def dues(self):
+        """Строки Dues: сборы порта и дополнительные Dues."""
+        return self.ledger.lines(DUES)
+
+    def calculate_overtime_totals(self, overtime_pairs, dues_grid=None):
         """
-        :param name: Название сбора.
-        :param coefficient: Коэффициент для расчета.
-        :param vat_applicable: Применяется ли VAT (по умолчанию False).
-        :param vat_included: Включен ли VAT в коэффициент (по умолчанию False).
-        :param category: Категория сбора (по умолчанию 'Dues').
-        :param uses_miles: Используются ли мили в расчете (по умолчанию False).
+        Итоги для набора сочетаний овертайма за один проход по ведомости.
+
+        Сборы линейны по овертайму, поэтому пересчитывать входные данные и тариф не нужно.
+        Суммы совпадают с полным пересчётом с этими овертаймами.
+
+        :param overtime_pairs: Сочетания (овертайм in, овертайм out) в долях, например (0.25, 0.5).
+        :param dues_grid: Уже посчитанные подытоги Dues в центах для этих сочетаний.
+        :return: Словарь {(in, out): {'total_fee', 'total_agency_fee', 'grand_total'}} с суммами в валюте.
         """
-        self.name = name
-        self.coefficient = coefficient
-        self.vat_applicable = vat_applicable
-        self.vat_included = vat_included
-        self.category = category
-        self.uses_miles = uses_miles
-        self.amount = 0.0
-        self.vat_amount = 0.0
-        self.total_amount = 0.0
-        self.VAT_RATE = vat_rate  # Сохраняем vat_rate
-
-    def calculate(self, cv, miles=1, overtime_percentage=0.0):
-        base_amount = cv * self.coefficient
-        if self.uses_miles:
-            base_amount *= miles
-
-        base_amount *= (1 + overtime_percentage)
-
-        if self.vat_applicable:
-            if self.vat_included:
-                # VAT уже включен в коэффициент, поэтому не добавляем его к сумме
-                vat_base = base_amount / (1 + self.VAT_RATE)
-                self.vat_amount = base_amount - vat_base
-                self.total_amount = base_amount  # Общая сумма уже включает VAT
-            else:
-                # VAT не включен в коэффициент, добавляем VAT к сумме
-                self.vat_amount = base_amount * self.VAT_RATE
-                self.total_amount = base_amount + self.vat_amount
-        else:
-            self.vat_amount = 0.0
-            self.total_amount = base_amount
+        pairs = list(dict.fromkeys(overtime_pairs))
+        total_agency_fee = self.subtotal_agency_fees_minor
+        if dues_grid is None:
+            dues_grid = self.ledger.overtime_totals(pairs)
+        return {
+            pair: {
+                'total_fee': from_minor(total_fee),
+                'total_agency_fee': from_minor(total_agency_fee),
+                'grand_total': from_minor(total_fee + total_agency_fee),
+            }
+            for pair, total_fee in zip(pairs, dues_grid)
+        }
 
-        self.amount = base_amount
+    def get_fees_and_dues(self):
+        """Строки fees и dues (name, category, total_amount, ...) — представление ведомости без копирования."""
+        return self.ledger.lines()
+
+    def get_fee_display_data(self):
+        """Кортежи (название, VAT, сумма) строк Dues для таблицы результатов."""
+        return self.ledger.display_rows(DUES)
 
-    def get_display_values(self):
-        vat_display = format_amount(self.vat_amount) if self.vat_amount > 0 else "-"
-        total_display = format_amount(self.total_amount)
-        return self.name, vat_display, total_display
+    def get_agency_display_data(self):
+        """
+        Кортежи (название, VAT, сумма) строк Agency Fees: Agency fee, Bank charges и дополнительные Fees.
+        Суммы — из центов ведомости, поэтому напечатанные строки складываются в Subtotal (Agency Fees).
+        """
+        return self.ledger.display_rows(AGENCY_FEES)
+
+
+# Поля формы, изменение которых меняет состав строк ведомости: нужен полный расчёт
+STRUCTURAL_FIELDS = ('port',)
+# Поля формы, от которых зависит CV
+CV_FIELDS = ('lbp', 'beam', 'rdm')
+
+
+@lru_cache(maxsize=32)
+def fee_dependencies(tariff, dues_count, fees_count):
+    """
+    Граф зависимостей: поле формы -> индексы строк ведомости, которые от него зависят.
+
+    Строки ведомости идут в порядке: сборы тарифа, дополнительные Dues, Agency fee, Bank charges,
+    дополнительные Fees. Узел 'cv' объединяет lbp, beam и rdm. Дополнительные строки адресуются
+    парами ('additional_dues', номер) и ('additional_fees', номер). Поле VAT формы в расчёт не входит
+    (ставка VAT задаётся в файле тарифа), поэтому ни от чего не зависит; поля судна влияют только на подписи.
+    """
+    tariff_count = len(tariff.fees)
+    graph = {'cv': tuple(range(tariff_count)), 'vat': ()}
+    for index, tariff_fee in enumerate(tariff.fees):
+        if tariff_fee.miles_key is not None:
+            graph[tariff_fee.miles_key] = graph.get(tariff_fee.miles_key, ()) + (index,)
+        if tariff_fee.direction is not None:
+            key = f"overtime_{tariff_fee.direction}"
+            graph[key] = graph.get(key, ()) + (index,)
+    for position in range(dues_count):
+        graph[('additional_dues', position)] = (tariff_count + position,)
+    agency_index = tariff_count + dues_count
+    graph['agency_fee'] = (agency_index,)
+    graph['bank_charges'] = (agency_index + 1,)
+    for position in range(fees_count):
+        graph[('additional_fees', position)] = (agency_index + 2 + position,)
+    return MappingProxyType(graph)
+
+
+def changed_fields(previous_inputs, inputs):
+    """
+    Поля формы, значения которых отличаются. Для дополнительных строк — пары (список, номер);
+    если изменилось количество дополнительных строк, возвращается None.
+    """
+    changed = set()
+    for key in set(previous_inputs) | set(inputs):
+        if key in ('additional_dues', 'additional_fees'):
+            previous_lines = previous_inputs.get(key, [])
+            lines = inputs.get(key, [])
+            if len(previous_lines) != len(lines):
+                return None
+            changed.update((key, position) for position, (old, new) in enumerate(zip(previous_lines, lines))
+                           if old != new)
+        elif previous_inputs.get(key) != inputs.get(key):
+            changed.add(key)
+    return changed
 
 
 class FeeCalculator:
-    def __init__(self, inputs):
-        self.port_module = None
-        self.inputs = inputs
-        self.cv = 0.0
-        self.fees = []
-        self.additional_dues = []
-        self.additional_fees = []
-        self.subtotal_dues = 0.0
-        self.subtotal_agency_fees = 0.0
-        self.total_vat = 0.0
-        self.total_amount = 0.0
-        # Добавляем атрибуты для фиксированных ставок овертайма
-        self.fixed_overtime_rates = [0.25, 0.50, 1.00]  # 25%, 50%, 100%
-        self.fixed_totals = {}
-
-    def set_port_calculator(self, port_name: str) -> None:
-        try:
-            if port_name == "Chornomorsk":
-                import port_chornomorsk as port_module
-            elif port_name == "Odesa":
-                import port_odessa as port_module
-            elif port_name == "Pivdenniy":
-                import port_yuzhny as port_module
-            else:
-                raise ValueError("Unknown Port")
-        except ImportError as e:
-            raise ImportError(f"Не удалось импортировать модуль для порта {port_name}: {e}")
-        self.port_module = port_module
-
-    def calculate_cv(self):
-        lbp = parse_input(self.inputs['lbp'])
-        beam = parse_input(self.inputs['beam'])
-        rdm = parse_input(self.inputs['rdm'])
+    """
+    Расчёт проформы по тарифу порта.
+
+    Не хранит состояния отдельных расчётов: calculate() можно вызывать одновременно из нескольких
+    потоков на одном экземпляре.
+    """
+
+    def __init__(self, tariff_source=get_tariff, fixed_overtime_rates=FIXED_OVERTIME_RATES):
+        """
+        :param tariff_source: Функция, возвращающая Tariff по названию порта.
+        :param fixed_overtime_rates: Ставки овертайма для фиксированных итогов.
+        """
+        self.tariff_source = tariff_source
+        self.fixed_overtime_rates = tuple(fixed_overtime_rates)
+
+    @staticmethod
+    def calculate_cv(inputs):
+        lbp = parse_input(inputs['lbp'])
+        beam = parse_input(inputs['beam'])
+        rdm = parse_input(inputs['rdm'])
         cv = lbp * beam * rdm
-        self.cv = ceil_value(cv)
-
-    def calculate_fees(self):
-        self.calculate_cv()
-        port_name = self.inputs['port']
-        self.set_port_calculator(port_name)
-        cv = self.cv
-        # Далее используем self.port_module для доступа к данным
-
-        # Получаем данные из модуля порта
-        FEES_WITHOUT_VAT = self.port_module.FEES_WITHOUT_VAT
-        FEES_WITH_VAT_WITH_MILES = self.port_module.FEES_WITH_VAT_WITH_MILES
-        FEES_WITH_VAT_WITHOUT_MILES = self.port_module.FEES_WITH_VAT_WITHOUT_MILES
-        FEES_WITH_INCLUDED_VAT = self.port_module.FEES_WITH_INCLUDED_VAT
-        VAT_RATE = self.port_module.VAT_RATE
-
-        # Преобразование овертайма
-        overtime_in_percentage = parse_overtime(self.inputs['overtime_in'])
-        overtime_out_percentage = parse_overtime(self.inputs['overtime_out'])
-
-        # Расчет сборов без VAT
-        for fee_name, coefficient in FEES_WITHOUT_VAT.items():
-            fee = Fee(name=fee_name, coefficient=coefficient, vat_applicable=False, category='Dues', vat_rate=VAT_RATE)
-            fee.calculate(cv)
-            self.fees.append(fee)
-
-        # Расчет сборов с VAT и учетом миль
-        for fee_name, coefficient in FEES_WITH_VAT_WITH_MILES.items():
-            fee = Fee(name=fee_name, coefficient=coefficient, vat_applicable=True, uses_miles=True, category='Dues', vat_rate=VAT_RATE)
-            if "in" in fee_name.lower():
-                if "inward" in fee_name.lower():
-                    miles = int(self.inputs['miles_inward_in'])
-                    overtime_percentage = overtime_in_percentage
-                else:
-                    miles = int(self.inputs['miles_outward_in'])
-                    overtime_percentage = overtime_in_percentage
+        return ceil_value(cv)
+
+    def calculate(self, inputs):
+        """
+        Рассчитывает сборы, подытоги и итоги по фиксированным ставкам овертайма.
+
+        :param inputs: Значения полей формы (строки) и списки additional_dues / additional_fees.
+        :return: FeeCalculation.
+        """
+        # Строки ведомости; итоги по овертайму считаются в FeeCalculation (отдельный замер)
+        with span("calc.fees"):
+            cv = self.calculate_cv(inputs)
+            tariff = self.tariff_source(inputs['port'])
+            ledger = FeeLedger(tariff.vat_rate)
+
+            # Преобразование овертайма
+            overtime_percentages = {
+                'in': parse_overtime(inputs['overtime_in']),
+                'out': parse_overtime(inputs['overtime_out']),
+            }
+
+            # Сборы порта: признаки VAT, миль и направления заданы в файле тарифа
+            for tariff_fee in tariff.fees:
+                base_amount = cv * tariff_fee.coefficient
+                if tariff_fee.miles_key is not None:
+                    base_amount *= int(inputs[tariff_fee.miles_key])
+                ledger.add_tariff_line(
+                    tariff_fee.name,
+                    base_amount,
+                    VAT_MODES[(tariff_fee.vat_applicable, tariff_fee.vat_included)],
+                    DIRECTIONS[tariff_fee.direction],
+                    overtime_percentages.get(tariff_fee.direction, 0.0),
+                )
+
+            # Обработка дополнительных Dues
+            additional_dues = []
+            for due in inputs.get('additional_dues', []):
+                amount = parse_input(due['amount'])
+                additional_dues.append({'name': due['name'], 'amount': amount})
+                ledger.add_fixed_line(due['name'], DUES, amount)
+
+            # Обработка Agency Fee и Bank Charges
+            ledger.add_fixed_line('Agency fee', AGENCY_FEES, parse_input(inputs['agency_fee']))
+            ledger.add_fixed_line('Bank charges', AGENCY_FEES, parse_input(inputs['bank_charges']))
+
+            # Обработка дополнительных Fees
+            additional_fees = []
+            for fee_input in inputs.get('additional_fees', []):
+                amount = parse_input(fee_input['amount'])
+                additional_fees.append({'name': fee_input['name'], 'amount': amount})
+                ledger.add_fixed_line(fee_input['name'], AGENCY_FEES, amount)
+            ledger.freeze()
+
+        return FeeCalculation(inputs, tariff, cv, ledger, additional_dues, additional_fees,
+                              self.fixed_overtime_rates)
+
+    def recalculate(self, previous, inputs):
+        """
+        Пересчёт после изменения формы: по графу зависимостей пересчитываются только затронутые
+        строки и подытоги их категорий. Результат совпадает с calculate(inputs).
+
+        :return: Кортеж (FeeCalculation, индексы изменившихся строк ведомости или None, если
+            изменился состав строк и результат нужно отобразить заново).
+        """
+        changed = changed_fields(previous.inputs, inputs)
+        tariff = self.tariff_source(inputs['port']) if changed is not None else None
+        if changed is None or tariff is not previous.tariff or any(field in changed for field in STRUCTURAL_FIELDS):
+            return self.calculate(inputs), None
+
+        ledger = previous.ledger
+        tariff_count = len(tariff.fees)
+        graph = fee_dependencies(tariff, len(previous.additional_dues), len(previous.additional_fees))
+
+        cv = previous.cv
+        if any(field in changed for field in CV_FIELDS):
+            cv = self.calculate_cv(inputs)
+        affected = set(graph['cv']) if cv != previous.cv else set()
+        for field in changed:
+            affected.update(graph.get(field, ()))
+
+        additional_dues = list(previous.additional_dues)
+        additional_fees = list(previous.additional_fees)
+        lines = {}
+        names = {}
+        for index in affected:
+            if index < tariff_count:
+                tariff_fee = tariff.fees[index]
+                base_amount = cv * tariff_fee.coefficient
+                if tariff_fee.miles_key is not None:
+                    base_amount *= int(inputs[tariff_fee.miles_key])
+                overtime = parse_overtime(inputs[f"overtime_{tariff_fee.direction}"]) if tariff_fee.direction else 0.0
+                lines[index] = ledger.tariff_line_values(index, base_amount, overtime)
+                continue
+
+            # Строки с суммой из формы
+            position = index - tariff_count
+            if position < len(additional_dues):
+                target, key = additional_dues, 'additional_dues'
+            elif position == len(additional_dues):
+                target, key = None, 'agency_fee'
+            elif position == len(additional_dues) + 1:
+                target, key = None, 'bank_charges'
             else:
-                if "inward" in fee_name.lower():
-                    miles = int(self.inputs['miles_inward_out'])
-                    overtime_percentage = overtime_out_percentage
-                else:
-                    miles = int(self.inputs['miles_outward_out'])
-                    overtime_percentage = overtime_out_percentage
-
-            fee.calculate(cv, miles, overtime_percentage)
-            self.fees.append(fee)
-
-        # Расчет сборов с VAT без учета миль
-        for fee_name, coefficient in FEES_WITH_VAT_WITHOUT_MILES.items():
-            # Проверяем, включен ли VAT в коэффициент
-            vat_included = fee_name in FEES_WITH_INCLUDED_VAT
-            fee = Fee(name=fee_name, coefficient=coefficient, vat_applicable=True, vat_included=vat_included, category='Dues', vat_rate=VAT_RATE)
-            if "in" in fee_name.lower():
-                overtime_percentage = overtime_in_percentage
-            elif "out" in fee_name.lower():
-                overtime_percentage = overtime_out_percentage
+                position -= len(additional_dues) + 2
+                target, key = additional_fees, 'additional_fees'
+
+            if target is None:
+                amount = parse_input(inputs[key])
             else:
-                overtime_percentage = 0.0
-
-            fee.calculate(cv, overtime_percentage=overtime_percentage)
-            self.fees.append(fee)
-
-        # Обработка дополнительных Dues
-        self.additional_dues = []
-        for due in self.inputs.get('additional_dues', []):
-            name = due['name']
-            amount = parse_input(due['amount'])
-            self.additional_dues.append({'name': name, 'amount': amount})
-            # Создаем объект Fee для отображения в таблице
-            fee = Fee(
-                name=name,
-                coefficient=0.0,
-                vat_applicable=False,
-                category='Dues',
-                vat_rate=VAT_RATE
-            )
-            fee.total_amount = amount
-            fee.amount = amount
-            self.fees.append(fee)
-
-        # Обработка Agency Fee и Bank Charges
-        agency_fee_amount = parse_input(self.inputs['agency_fee'])
-        agency_fee = Fee(name='Agency fee', coefficient=0.0, vat_applicable=False, category='Agency Fees', vat_rate=VAT_RATE)
-        agency_fee.total_amount = agency_fee_amount
-        agency_fee.amount = agency_fee_amount
-        self.fees.append(agency_fee)
-
-        bank_charges_amount = parse_input(self.inputs['bank_charges'])
-        bank_charges = Fee(name='Bank charges', coefficient=0.0, vat_applicable=False, category='Agency Fees', vat_rate=VAT_RATE)
-        bank_charges.total_amount = bank_charges_amount
-        bank_charges.amount = bank_charges_amount
-        self.fees.append(bank_charges)
-
-        # Обработка дополнительных Fees
-        self.additional_fees = []
-        for fee_input in self.inputs.get('additional_fees', []):
-            name = fee_input['name']
-            amount = parse_input(fee_input['amount'])
-            self.additional_fees.append({'name': name, 'amount': amount})
-            fee = Fee(name=name, coefficient=0.0, vat_applicable=False, category='Agency Fees', vat_rate=VAT_RATE)
-            fee.total_amount = amount
-            fee.amount = amount
-            self.fees.append(fee)
-
-    def calculate_totals(self):
-        # Суммируем все Dues
-        self.subtotal_dues = sum(fee.total_amount for fee in self.fees if fee.category == 'Dues')
-        self.total_vat = sum(fee.vat_amount for fee in self.fees if fee.vat_applicable)
-
-        # Суммируем Agency Fees
-        self.subtotal_agency_fees = sum(fee.total_amount for fee in self.fees if fee.category == 'Agency Fees')
-
-        self.total_amount = self.subtotal_dues + self.subtotal_agency_fees
+                line = inputs[key][position]
+                amount = parse_input(line['amount'])
+                target[position] = {'name': line['name'], 'amount': amount}
+                names[index] = line['name']
+            lines[index] = ledger.fixed_line_values(amount)
 
-    def get_fees_and_dues(self):
-        """Возвращает список словарей с информацией о fees и dues."""
-        fees_and_dues = []
-        for fee in self.fees:
-            fees_and_dues.append({
-                'name': fee.name,
-                'amount': fee.total_amount,
-                'category': fee.category  # 'Dues' или 'Agency Fees'
-            })
-        return fees_and_dues
-
-    def calculate_fixed_overtime_totals(self):
-        for rate in self.fixed_overtime_rates:
-            # Создаём копию входных данных с заданной ставкой овертайма
-            fixed_inputs = self.inputs.copy()
-            fixed_inputs['overtime_in'] = f"{int(rate * 100)}%"
-            fixed_inputs['overtime_out'] = f"{int(rate * 100)}%"
-
-            # Создаём временный калькулятор для расчёта
-            temp_calculator = FeeCalculator(fixed_inputs)
-            temp_calculator.calculate_fees()
-            temp_calculator.calculate_totals()
-
-            # Сохраняем результаты
-            self.fixed_totals[rate] = {
-                'total_fee': temp_calculator.subtotal_dues,
-                'total_agency_fee': temp_calculator.subtotal_agency_fees,
-                'grand_total': temp_calculator.total_amount
-            }
+        if not lines:
+            return FeeCalculation(inputs, tariff, cv, ledger, additional_dues, additional_fees,
+                                  self.fixed_overtime_rates, previous.dues_grid), set()
 
-    def get_fee_display_data(self):
-        data = []
-        for fee in self.fees:
-            if fee.category == 'Dues':
-                data.append(fee.get_display_values())
-        return data
+        new_ledger = ledger.derive(lines, names)
+        dues_changed = any(ledger.categories[index] == DUES for index in lines)
+        dues_grid = None if dues_changed else previous.dues_grid
+        calculation = FeeCalculation(inputs, tariff, cv, new_ledger, additional_dues, additional_fees,
+                                     self.fixed_overtime_rates, dues_grid)
+        return calculation, set(lines)
+
+
+# Общий экземпляр: расчёт не хранит состояния, поэтому его могут использовать все потоки
+fee_calculator = FeeCalculator()
+
+
+def calculate_proforma(inputs):
+    """Расчёт проформы общим калькулятором."""
+    return fee_calculator.calculate(inputs)
@@ -0,0 +1,273 @@
+# case_store.py
+
+import os
+import json
+import sqlite3
+import threading
+import logging
+from collections import namedtuple
+from datetime import datetime
+
+from constants import CASE_STORE_PATH
+from fee_ledger import CATEGORY_NAMES, VAT_NONE
+from money import to_minor, from_minor
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+INSERT_BATCH_SIZE = 500
+DEFAULT_PAGE_SIZE = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    vessel_name TEXT NOT NULL,
+    vessel_key TEXT NOT NULL,
+    port TEXT NOT NULL,
+    account_name TEXT NOT NULL,
+    account_key TEXT NOT NULL,
+    cv INTEGER NOT NULL,
+    tariff_version TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    subtotal_dues INTEGER NOT NULL,
+    subtotal_agency_fees INTEGER NOT NULL,
+    total_vat INTEGER NOT NULL,
+    total INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cases_created ON cases (created_at, id);
+CREATE INDEX IF NOT EXISTS cases_vessel ON cases (vessel_key, created_at, id);
+CREATE INDEX IF NOT EXISTS cases_port ON cases (port, created_at, id);
+CREATE INDEX IF NOT EXISTS cases_account ON cases (account_key, created_at, id);
+
+CREATE TABLE IF NOT EXISTS case_lines (
+    case_id INTEGER NOT NULL REFERENCES cases (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    vat_applicable INTEGER NOT NULL,
+    amount INTEGER NOT NULL,
+    vat_amount INTEGER NOT NULL,
+    total_amount INTEGER NOT NULL,
+    PRIMARY KEY (case_id, position)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS fda_lines (
+    case_id INTEGER NOT NULL REFERENCES cases (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    recorded_at TEXT NOT NULL,
+    PRIMARY KEY (case_id, name)
+) WITHOUT ROWID;
+"""
+
+# Строка результатов поиска; суммы в валюте
+CaseSummary = namedtuple('CaseSummary', ['id', 'created_at', 'vessel_name', 'port', 'account_name', 'cv', 'total'])
+
+
+def search_key(text):
+    """Ключ поиска по названию: без регистра и лишних пробелов (в том числе для кириллицы)."""
+    return ' '.join(str(text).split()).casefold()
+
+
+def _prefix_range(prefix):
+    # Префиксный поиск диапазоном по индексу: key >= prefix AND key < prefix + максимальный символ
+    return prefix, prefix + '\U0010ffff'
+
+
+class CaseStore:
+    """
+    Локальное хранилище расчётов (PDA) и фактических сумм (FDA) в SQLite.
+
+    Суммы хранятся в центах (money.py). Поиск по судну, порту, клиенту и дате использует индексы
+    и постраничную выдачу по ключу (created_at, id), поэтому время страницы не зависит от размера истории.
+    Одно соединение на хранилище, обращения из разных потоков сериализуются блокировкой.
+    """
+
+    def __init__(self, path=CASE_STORE_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        if path != ':memory:':
+            self._connection.execute("PRAGMA journal_mode = WAL")
+            self._connection.execute("PRAGMA synchronous = NORMAL")
+        with self._connection:
+            self._connection.executescript(SCHEMA)
+            self._connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    @staticmethod
+    def _case_row(calculation, created_at):
+        inputs = calculation.inputs
+        vessel_name = str(inputs.get('vessel_name', '')).strip()
+        account_name = str(inputs.get('acc_name', '')).strip()
+        return (
+            created_at,
+            vessel_name,
+            search_key(vessel_name),
+            inputs['port'],
+            account_name,
+            search_key(account_name),
+            calculation.cv,
+            calculation.tariff.version,
+            json.dumps(dict(inputs), ensure_ascii=False),
+            calculation.subtotal_dues_minor,
+            calculation.subtotal_agency_fees_minor,
+            calculation.total_vat_minor,
+            calculation.total_amount_minor,
+        )
+
+    @staticmethod
+    def _line_rows(case_id, calculation):
+        ledger = calculation.ledger
+        return [
+            (case_id, position, name, CATEGORY_NAMES[category], int(vat_mode != VAT_NONE), amount, vat_amount, total)
+            for position, (name, category, vat_mode, amount, vat_amount, total) in enumerate(zip(
+                ledger.names, ledger.categories, ledger.vat_modes, ledger.amounts, ledger.vat_amounts, ledger.totals))
+        ]
+
+    def _insert(self, calculation, created_at):
+        cursor = self._connection.execute(
+            "INSERT INTO cases (created_at, vessel_name, vessel_key, port, account_name, account_key, cv,"
+            " tariff_version, inputs, subtotal_dues, subtotal_agency_fees, total_vat, total)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            self._case_row(calculation, created_at))
+        case_id = cursor.lastrowid
+        self._connection.executemany(
+            "INSERT INTO case_lines VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self._line_rows(case_id, calculation))
+        return case_id
+
+    def add_case(self, calculation, created_at=None):
+        """Сохраняет расчёт (FeeCalculation) со строками ведомости; возвращает id случая."""
+        created_at = created_at or datetime.now().isoformat(timespec='seconds')
+        with self._lock, self._connection:
+            return self._insert(calculation, created_at)
+
+    def add_cases(self, calculations, batch_size=INSERT_BATCH_SIZE):
+        """
+        Массовое сохранение: по batch_size расчётов в одной транзакции.
+
+        :param calculations: Итерируемое FeeCalculation или пар (FeeCalculation, дата ISO).
+        :return: Список id в порядке входных данных.
+        """
+        case_ids = []
+        batch = []
+
+        def flush():
+            with self._lock, self._connection:
+                for calculation, created_at in batch:
+                    case_ids.append(self._insert(calculation, created_at))
+            batch.clear()
+
+        for item in calculations:
+            calculation, created_at = item if isinstance(item, tuple) else (item, None)
+            batch.append((calculation, created_at or datetime.now().isoformat(timespec='seconds')))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        return case_ids
+
+    def save_fda(self, case_id, fda_data):
+        """Сохраняет (заменяет) фактические суммы FDA случая: {название строки: сумма}."""
+        recorded_at = datetime.now().isoformat(timespec='seconds')
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM fda_lines WHERE case_id = ?", (case_id,))
+            self._connection.executemany(
+                "INSERT INTO fda_lines VALUES (?, ?, ?, ?)",
+                [(case_id, name, to_minor(amount), recorded_at) for name, amount in fda_data.items()])
+
+    def search(self, vessel=None, port=None, account=None, date_from=None, date_to=None,
+               after=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        Страница случаев от новых к старым.
+
+        :param vessel: Начало названия судна (без учёта регистра).
+        :param account: Начало названия клиента (без учёта регистра).
+        :param date_from: Дата или дата-время ISO, включительно.
+        :param date_to: Дата или дата-время ISO, включительно (дата — весь день).
+        :param after: (created_at, id) последней строки предыдущей страницы.
+        :return: Список CaseSummary.
+        """
+        conditions = []
+        parameters = []
+        if vessel:
+            conditions.append("vessel_key >= ? AND vessel_key < ?")
+            parameters += _prefix_range(search_key(vessel))
+        if account:
+            conditions.append("account_key >= ? AND account_key < ?")
+            parameters += _prefix_range(search_key(account))
+        if port:
+            conditions.append("port = ?")
+            parameters.append(port)
+        if date_from:
+            conditions.append("created_at >= ?")
+            parameters.append(date_from)
+        if date_to:
+            conditions.append("created_at <= ?")
+            parameters.append(date_to if 'T' in date_to else date_to + 'T99')
+        if after is not None:
+            conditions.append("(created_at, id) < (?, ?)")
+            parameters += list(after)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = ("SELECT id, created_at, vessel_name, port, account_name, cv, total FROM cases "
+                 f"{where} ORDER BY created_at DESC, id DESC LIMIT ?")
+        with self._lock:
+            rows = self._connection.execute(query, parameters + [limit]).fetchall()
+        return [CaseSummary(*row[:6], from_minor(row[6])) for row in rows]
+
+    def load_inputs(self, case_id):
+        """Входные данные формы сохранённого случая (для загрузки в форму и пересчёта)."""
+        with self._lock:
+            row = self._connection.execute("SELECT inputs FROM cases WHERE id = ?", (case_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Случай {case_id} не найден")
+        return json.loads(row[0])
+
+    def load_lines(self, case_id):
+        """Строки ведомости случая: список (название, категория, VAT, сумма, VAT, итого) в валюте."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT name, category, vat_applicable, amount, vat_amount, total_amount FROM case_lines"
+                " WHERE case_id = ? ORDER BY position", (case_id,)).fetchall()
+        return [(name, category, bool(vat), from_minor(amount), from_minor(vat_amount), from_minor(total))
+                for name, category, vat, amount, vat_amount, total in rows]
+
+    def matches(self, case_id, calculation):
+        """True, если случай хранит этот расчёт: те же входные данные и те же строки ведомости."""
+        try:
+            inputs = self.load_inputs(case_id)
+        except KeyError:
+            return False
+        if inputs != json.loads(json.dumps(dict(calculation.inputs), ensure_ascii=False)):
+            return False
+        stored = [(line[0], line[5]) for line in self.load_lines(case_id)]
+        return stored == [(line.name, line.total_amount) for line in calculation.ledger.lines()]
+
+    def load_fda(self, case_id):
+        """Фактические суммы FDA случая: {название строки: сумма}."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT name, amount FROM fda_lines WHERE case_id = ?", (case_id,)).fetchall()
+        return {name: from_minor(amount) for name, amount in rows}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_case_store():
+    """Общее хранилище приложения (открывается при первом обращении)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CaseStore()
+            logger.info(f"Хранилище расчётов: {_store.path}")
+        return _store
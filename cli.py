@@ -0,0 +1,224 @@
+# cli.py
+
+import os
+import re
+import csv
+import json
+import shutil
+import argparse
+import tempfile
+import logging
+from collections import deque
+
+from calculations import calculate_proforma
+from constants import DEFAULT_INPUTS, PDF_ENGINE
+from conversion_service import ConversionPool, POOL_INSTANCES, POOL_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+TOTALS_COLUMNS = [
+    'record',
+    'vessel_name',
+    'port',
+    'cv',
+    'subtotal_dues',
+    'subtotal_agency_fees',
+    'total_vat',
+    'total',
+    'grand_total_25_ot',
+    'grand_total_50_ot',
+    'grand_total_100_ot',
+    'document',
+    'error',
+]
+# Записей в ожидании конвертации на один экземпляр LibreOffice
+PENDING_PER_INSTANCE = POOL_BATCH_SIZE * 4
+
+
+def iter_records(path, input_format='auto'):
+    """
+    Построчно читает записи из CSV или JSONL, не загружая файл целиком.
+
+    :return: Генератор пар (номер строки, словарь записи).
+    """
+    if input_format == 'auto':
+        input_format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+    with open(path, encoding='utf-8', newline='') as f:
+        if input_format == 'csv':
+            for line_number, record in enumerate(csv.DictReader(f), start=2):
+                yield line_number, record
+        else:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if line:
+                    yield line_number, json.loads(line)
+
+
+def _parse_extra_lines(value):
+    """Дополнительные Dues/Fees: список в JSONL или JSON-строка в колонке CSV."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = json.loads(value)
+    return [{'name': str(item['name']), 'amount': str(item['amount'])} for item in value]
+
+
+def normalize_record(record):
+    """Приводит запись к виду входных данных FeeCalculator: значения по умолчанию из формы и строки вместо чисел."""
+    inputs = dict(DEFAULT_INPUTS)
+    for key, value in record.items():
+        if key in ['additional_dues', 'additional_fees'] or value is None or value == '':
+            continue
+        inputs[key] = str(value)
+    inputs['additional_dues'] = _parse_extra_lines(record.get('additional_dues'))
+    inputs['additional_fees'] = _parse_extra_lines(record.get('additional_fees'))
+    return inputs
+
+
+def calculate_record(inputs):
+    """Выполняет тот же расчёт, что и кнопка "Рассчитать" в GUI."""
+    return calculate_proforma(inputs)
+
+
+def document_name(record_id, inputs, extension):
+    """Имя файла документа: идентификатор записи и название судна без недопустимых символов."""
+    vessel_name = re.sub(r'[^\w.-]+', '_', inputs.get('vessel_name', '')).strip('_')
+    base_name = f"{record_id}_{vessel_name}" if vessel_name else str(record_id)
+    return base_name + extension
+
+
+def calculation_row(row, calculation):
+    row.update({
+        'cv': calculation.cv,
+        'subtotal_dues': f"{calculation.subtotal_dues:.2f}",
+        'subtotal_agency_fees': f"{calculation.subtotal_agency_fees:.2f}",
+        'total_vat': f"{calculation.total_vat:.2f}",
+        'total': f"{calculation.total_amount:.2f}",
+        'grand_total_25_ot': f"{calculation.fixed_totals[0.25]['grand_total']:.2f}",
+        'grand_total_50_ot': f"{calculation.fixed_totals[0.50]['grand_total']:.2f}",
+        'grand_total_100_ot': f"{calculation.fixed_totals[1.00]['grand_total']:.2f}",
+    })
+
+
+def run_batch(input_path, output_dir, input_format='auto', document_format=None, engine=PDF_ENGINE,
+              jobs=POOL_INSTANCES):
+    """
+    Обрабатывает записи по одной и сразу дописывает итоги в totals.csv, поэтому память не растёт
+    с размером входного файла.
+
+    PDF через LibreOffice конвертируются в пуле из jobs экземпляров (0 — по числу ядер): записи
+    рассчитываются и заполняются в основном потоке, конвертация идёт параллельно, а строки totals.csv
+    пишутся в порядке входного файла.
+
+    :return: Кортеж (количество успешных записей, количество ошибок).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    totals_path = os.path.join(output_dir, 'totals.csv')
+
+    if document_format:
+        # openpyxl нужен только для документов
+        from proforma_document import render_pdf, render_xlsx, get_soffice_path
+
+    pool = None
+    if document_format == 'pdf' and engine == 'libreoffice':
+        soffice_path = get_soffice_path()
+        if soffice_path:
+            pool = ConversionPool(soffice_path, instances=jobs)
+        else:
+            logger.warning("LibreOffice не найден, PDF формируются встроенным рендерером")
+            engine = 'native'
+
+    succeeded = 0
+    failed = 0
+    # Записи в порядке входного файла: (строка итогов, Future конвертации или None, путь к PDF, xlsx)
+    pending = deque()
+    max_pending = PENDING_PER_INSTANCE * len(pool.services) if pool is not None else 0
+    tmp_dir = tempfile.mkdtemp() if pool is not None else None
+    try:
+        with open(totals_path, 'w', encoding='utf-8', newline='') as totals_file:
+            writer = csv.DictWriter(totals_file, fieldnames=TOTALS_COLUMNS)
+            writer.writeheader()
+
+            def finish(row, future, document_path, xlsx_path):
+                nonlocal succeeded, failed
+                if future is not None:
+                    try:
+                        pdf_tmp_path = future.result()
+                        shutil.move(pdf_tmp_path, document_path)
+                        row['document'] = document_path
+                    except Exception as e:
+                        logger.error(f"Ошибка конвертации записи {row['record']}: {e}")
+                        row['error'] = str(e)
+                    finally:
+                        os.remove(xlsx_path)
+                if row.get('error'):
+                    failed += 1
+                else:
+                    succeeded += 1
+                writer.writerow(row)
+
+            for index, (line_number, record) in enumerate(iter_records(input_path, input_format)):
+                record_id = record.get('request_id') or record.get('id') or line_number
+                row = {'record': record_id, 'vessel_name': record.get('vessel_name', ''),
+                       'port': record.get('port', '')}
+                future = document_path = xlsx_path = None
+                try:
+                    inputs = normalize_record(record)
+                    row['port'] = inputs['port']
+                    calculation = calculate_record(inputs)
+                    calculation_row(row, calculation)
+
+                    if document_format == 'pdf':
+                        document_path = os.path.join(output_dir, document_name(record_id, inputs, '.pdf'))
+                        if pool is not None:
+                            # Имя по номеру записи: в одном вызове soffice имена файлов не должны совпадать
+                            xlsx_path = os.path.join(tmp_dir, f"{index}.xlsx")
+                            render_xlsx(calculation, inputs, xlsx_path)
+                            future = pool.submit(xlsx_path, tmp_dir)
+                        else:
+                            render_pdf(calculation, inputs, document_path, engine=engine)
+                            row['document'] = document_path
+                    elif document_format == 'xlsx':
+                        document_path = os.path.join(output_dir, document_name(record_id, inputs, '.xlsx'))
+                        render_xlsx(calculation, inputs, document_path)
+                        row['document'] = document_path
+                except Exception as e:
+                    logger.error(f"Ошибка в записи {record_id}: {e}")
+                    row['error'] = str(e)
+
+                pending.append((row, future, document_path, xlsx_path))
+                # Готовые записи пишутся сразу; ожидающих не больше max_pending, поэтому память не растёт
+                while pending and (pending[0][1] is None or pending[0][1].done() or len(pending) > max_pending):
+                    finish(*pending.popleft())
+            while pending:
+                finish(*pending.popleft())
+    finally:
+        if pool is not None:
+            pool.stop()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    logger.info(f"Пакетная обработка завершена: {succeeded} успешно, {failed} с ошибками. Итоги: {totals_path}")
+    return succeeded, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='main.py batch',
+        description="Пакетный расчёт проформ из CSV/JSONL без графического интерфейса."
+    )
+    parser.add_argument('input', help="Файл с записями (CSV или JSONL, одна запись на строку).")
+    parser.add_argument('-o', '--output-dir', default='output', help="Каталог для totals.csv и документов.")
+    parser.add_argument('--format', dest='input_format', choices=['auto', 'csv', 'jsonl'], default='auto',
+                        help="Формат входного файла (по умолчанию определяется по расширению).")
+    parser.add_argument('--documents', choices=['pdf', 'xlsx'], default=None,
+                        help="Формировать документ для каждой записи.")
+    parser.add_argument('--engine', choices=['native', 'libreoffice'], default=PDF_ENGINE,
+                        help="Способ формирования PDF.")
+    parser.add_argument('-j', '--jobs', type=int, default=POOL_INSTANCES,
+                        help="Число экземпляров LibreOffice для конвертации PDF (0 — по числу ядер).")
+    args = parser.parse_args(argv)
+
+    succeeded, failed = run_batch(args.input, args.output_dir, args.input_format, args.documents, args.engine,
+                                  args.jobs)
+    return 0 if failed == 0 else 1
@@ -1,60 +1,73 @@
 # constants.py
 
 import os
-import sys
 
-# Определение категорий сборов
-FEES_WITHOUT_VAT = {
-    "Tonnage dues (In/out)": 0.2784,
-    "Canal dues (in/out)": 0.0512,
-    "Lighthouse dues": 0.045,
-    "Berth dues": 0.028,
-    "Sanitary dues": 0.0176,
-    "Administrative dues": 0.0176,
-    "Port information fee": 0.0065,
-}
-
-FEES_WITH_VAT_WITH_MILES = {
-    "Inward pilotage in": 0.0139,
-    "Inward pilotage out": 0.0139,
-    "Outward pilotage in": 0.0014,
-    "Outward pilotage out": 0.0014,
-}
-
-FEES_WITH_VAT_WITHOUT_MILES = {
-    "Services of VTCS": 0.1072799,
-    "Tugs in": 0.2720,
-    "Tugs out": 0.2720,
-    "Mooring in": 0.0136832,
-    "Mooring out": 0.0136832,
-}
-
-FEES_WITH_INCLUDED_VAT = {
-    "Services of VTCS",
-    "Tugs in",
-    "Tugs out",
-    "Mooring in",
-    "Mooring out",
-}
-
-# Ставка VAT
-VAT_RATE = 0.20  # 20%
-
-# Получаем путь к ресурсу
-def resource_path(relative_path):
-    """Получает путь к ресурсу, работает для dev и PyOxidizer"""
-    if getattr(sys, 'frozen', False):
-        # Если приложение упаковано с помощью PyOxidizer
-        base_path = os.path.dirname(sys.executable)
-    else:
-        # Если запускается в режиме разработки
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
+from utils import resource_path, user_cache_dir, user_log_dir, user_data_dir
 
 # Использование
 LOGO_PATH = resource_path('icons/app_icon.icns')
 TEMPLATE_PATH = resource_path('templates/template.xlsx')
+# Каталог с тарифами портов, по одному файлу JSON на порт (tariff_registry.py)
+TARIFFS_DIR = resource_path('tariffs')
 START_ROW_FEES = 23
 START_ROW_AGENCY_FEES = 45
-FDA_TEMPLATE_PATH = 'templates/fda_template.xlsx'  # Укажите правильный путь к вашему шаблону
+# Каталог для кэшей (индексы шаблонов и т. п.)
+CACHE_DIR = user_cache_dir()
+# Бюджет памяти кэша разобранных шаблонов Excel (template_cache.py)
+TEMPLATE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+# Бюджет дискового кэша сформированных документов (document_cache.py)
+DOCUMENT_CACHE_MAX_BYTES = 200 * 1024 * 1024
+# База расчётов PDA/FDA (case_store.py)
+CASE_STORE_PATH = os.path.join(user_data_dir(), 'cases.sqlite3')
+# Колоночная история «PDA против FDA» (variance_history.py)
+VARIANCE_HISTORY_DIR = os.path.join(user_data_dir(), 'variance')
+# Способ формирования PDF: 'native' — встроенный рендерер (pdf_renderer.py; текст ячеек и размеры строк
+# и колонок берёт из template.xlsx, принятые отличия — в docstring render_proforma_pdf),
+# 'libreoffice' — заполнение template.xlsx и конвертация через soffice
+PDF_ENGINE = 'native'
+# Количество рабочих потоков GUI для формирования документов (document_jobs.py)
+DOCUMENT_WORKERS = 3
+# Задержка живого пересчёта после ввода в форму, мс
+LIVE_RECALC_DELAY_MS = 300
+# Журнал приложения (logger_config.py): каталог, ротация по размеру и формат ('text' или 'json' — JSON Lines)
+LOG_DIR = user_log_dir()
+LOG_FILE_NAME = 'app.log'
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+LOG_FORMAT = 'text'
+# Уровни журналов: '' — корневой логгер; переопределяются переменной PROFORMA_LOG_LEVELS ("gui=DEBUG,PIL=WARNING")
+LOG_LEVELS = {
+    '': 'INFO',
+    'PIL': 'WARNING',
+}
+# Замеры времени этапов (perf.py): включены ли при запуске и сколько последних замеров хранить на этап
+PERF_ENABLED = False
+PERF_MAX_SAMPLES = 1000
+# Бюджет холодного старта до первого интерактивного кадра, с (python main.py --startup-check)
+STARTUP_BUDGET_SECONDS = 2.0
+# Шрифты с кириллицей для встроенного рендерера (первый найденный)
+PDF_UNICODE_FONTS = [
+    '/Library/Fonts/Arial Unicode.ttf',
+    '/System/Library/Fonts/Supplemental/Arial.ttf',
+    'C:\\Windows\\Fonts\\arial.ttf',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/TTF/DejaVuSans.ttf',
+]
+FDA_TEMPLATE_PATH = resource_path('templates/fda_template.xlsx')
+# Пакетное формирование FDA: число процессов (0 — по числу ядер)
+FDA_BATCH_WORKERS = 0
+
 
+# Значения полей формы по умолчанию (используются GUI и пакетным режимом)
+DEFAULT_INPUTS = {
+    'port': "Chornomorsk",
+    'miles_inward_in': "1",
+    'miles_inward_out': "1",
+    'miles_outward_in': "14",
+    'miles_outward_out': "14",
+    'agency_fee': "0",
+    'bank_charges': "190.00",
+    'vat': "20",
+    'overtime_in': "0%",
+    'overtime_out': "0%",
+}
@@ -0,0 +1,638 @@
+# conversion_service.py
+
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import signal
+import tempfile
+import threading
+import subprocess
+import logging
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+CONVERSION_TIMEOUT = 60  # секунд на один документ
+PING_TIMEOUT = 10
+# Пул конвертации: экземпляров (0 — по числу ядер) и файлов на одно обращение к экземпляру
+POOL_INSTANCES = 0
+POOL_BATCH_SIZE = 8
+WORKER_FLAG = '--conversion-worker'
+DEFAULT_PROFILE_DIR = os.path.join(tempfile.gettempdir(), 'proforma-soffice-profile')
+
+
+class ConversionError(RuntimeError):
+    """Ошибка конвертации документа."""
+
+
+class ConversionTimeout(ConversionError):
+    """Конвертер не ответил за отведённое время и был перезапущен."""
+
+
+def _profile_url(profile_dir):
+    """Путь к профилю LibreOffice в виде file:// URL для -env:UserInstallation."""
+    path = os.path.abspath(profile_dir).replace('\\', '/')
+    if not path.startswith('/'):
+        path = '/' + path
+    return 'file://' + path
+
+
+def _kill_process_tree(process):
+    """Завершает процесс вместе с дочерними (soffice, запущенный воркером)."""
+    if process is None or process.poll() is not None:
+        return
+    try:
+        if sys.platform.startswith('win'):
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)], capture_output=True)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        process.kill()
+    try:
+        process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        logger.error(f"Процесс конвертера {process.pid} не завершился")
+
+
+def _pdf_path(src_path, outdir):
+    return os.path.join(outdir, os.path.splitext(os.path.basename(src_path))[0] + '.pdf')
+
+
+# --- Сторона воркера -------------------------------------------------------
+
+class CommandConverter:
+    """Конвертация вызовом soffice --convert-to с отдельным (заранее прогретым) профилем."""
+
+    mode = 'command'
+
+    def __init__(self, soffice_path, profile_dir, fallback_reason=None):
+        self.soffice_path = soffice_path
+        self.profile_dir = profile_dir
+        self.fallback_reason = fallback_reason  # почему не используется UNO (None — выбран явно)
+
+    def _run(self, src_paths, outdir):
+        command = [
+            self.soffice_path,
+            f'-env:UserInstallation={_profile_url(self.profile_dir)}',
+            '--headless',
+            '--convert-to',
+            'pdf',
+            '--outdir',
+            outdir,
+            *src_paths
+        ]
+        return subprocess.run(command, capture_output=True, text=True, stdin=subprocess.DEVNULL)
+
+    def convert(self, src_path, outdir):
+        result = self._run([src_path], outdir)
+        if result.returncode != 0:
+            raise ConversionError(f"Ошибка при конвертации Excel в PDF:\n{result.stderr}")
+        return _pdf_path(src_path, outdir)
+
+    def convert_many(self, src_paths, outdir):
+        """
+        Один запуск soffice на несколько файлов: запуск LibreOffice дороже конвертации небольшого документа.
+        Имена файлов должны различаться — PDF получают имя исходного файла.
+
+        :return: Пути к PDF в порядке src_paths (наличие файлов проверяет вызывающий).
+        """
+        result = self._run(src_paths, outdir)
+        pdf_paths = [_pdf_path(src_path, outdir) for src_path in src_paths]
+        if result.returncode != 0 and not any(os.path.exists(path) for path in pdf_paths):
+            raise ConversionError(f"Ошибка при конвертации Excel в PDF:\n{result.stderr}")
+        return pdf_paths
+
+    def close(self):
+        pass
+
+
+class UnoConverter:
+    """Конвертация через постоянно запущенный LibreOffice, управляемый по UNO."""
+
+    mode = 'uno'
+
+    def __init__(self, soffice_path, profile_dir):
+        import uno  # noqa: F401 (проверяем наличие python-uno)
+        self.pipe_name = f"proforma_{os.getpid()}"
+        self.office = subprocess.Popen(
+            [
+                soffice_path,
+                f'-env:UserInstallation={_profile_url(profile_dir)}',
+                '--headless',
+                '--invisible',
+                '--nologo',
+                '--norestore',
+                '--nodefault',
+                f'--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext',
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self.desktop = self._connect()
+
+    def _connect(self, attempts=60):
+        import uno
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context)
+        url = f"uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext"
+        for _ in range(attempts):
+            try:
+                context = resolver.resolve(url)
+                return context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+            except Exception:
+                if self.office.poll() is not None:
+                    raise ConversionError("LibreOffice завершился при запуске")
+                time.sleep(0.5)
+        raise ConversionError("Не удалось подключиться к LibreOffice")
+
+    @staticmethod
+    def _properties(**values):
+        from com.sun.star.beans import PropertyValue
+        properties = []
+        for name, value in values.items():
+            prop = PropertyValue()
+            prop.Name = name
+            prop.Value = value
+            properties.append(prop)
+        return tuple(properties)
+
+    def convert(self, src_path, outdir):
+        import uno
+        pdf_path = _pdf_path(src_path, outdir)
+        document = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(src_path)), "_blank", 0, self._properties(Hidden=True))
+        if document is None:
+            raise ConversionError(f"LibreOffice не смог открыть {src_path}")
+        try:
+            document.storeToURL(uno.systemPathToFileUrl(os.path.abspath(pdf_path)),
+                                self._properties(FilterName="calc_pdf_Export"))
+        finally:
+            document.close(True)
+        return pdf_path
+
+    def close(self):
+        try:
+            self.desktop.terminate()
+        except Exception:
+            pass
+        try:
+            self.office.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.office.kill()
+
+
+def create_converter(soffice_path, profile_dir):
+    """
+    Использует UNO, если доступен python-uno, иначе вызывает soffice --convert-to.
+    PROFORMA_CONVERTER=command принудительно выбирает вызов soffice (например, для заглушки в benchmarks.py).
+    """
+    if os.environ.get('PROFORMA_CONVERTER') == 'command':
+        return CommandConverter(soffice_path, profile_dir)
+    try:
+        return UnoConverter(soffice_path, profile_dir)
+    except ImportError as e:
+        return CommandConverter(soffice_path, profile_dir, fallback_reason=f"python-uno недоступен ({e})")
+
+
+def convert_files(converter, src_paths, outdir):
+    """
+    Конвертирует несколько файлов: одним вызовом, если конвертер это умеет (soffice --convert-to),
+    иначе по одному (UNO: LibreOffice уже запущен, отдельные вызовы ничего не стоят).
+
+    :return: Список результатов по файлам: {'ok': True, 'pdf': путь} или {'ok': False, 'error': текст}.
+    """
+    if hasattr(converter, 'convert_many'):
+        try:
+            pdf_paths = converter.convert_many(src_paths, outdir)
+        except Exception as e:
+            return [{'ok': False, 'error': str(e)} for _ in src_paths]
+    else:
+        pdf_paths = []
+        for src_path in src_paths:
+            try:
+                pdf_paths.append(converter.convert(src_path, outdir))
+            except Exception as e:
+                pdf_paths.append(e)
+
+    results = []
+    for pdf_path in pdf_paths:
+        if isinstance(pdf_path, Exception):
+            results.append({'ok': False, 'error': str(pdf_path)})
+        elif not os.path.exists(pdf_path):
+            results.append({'ok': False, 'error': "Сгенерированный PDF-файл не найден."})
+        else:
+            results.append({'ok': True, 'pdf': pdf_path})
+    return results
+
+
+def run_worker(soffice_path, profile_dir):
+    """
+    Цикл воркера: читает задания JSON-строками из stdin и отвечает JSON-строками в stdout.
+
+    Запросы: {"op": "ping"}, {"op": "convert", "src": ..., "outdir": ...},
+    {"op": "convert_many", "srcs": [...], "outdir": ...}, {"op": "shutdown"}.
+    """
+    output = sys.stdout
+    # Всё, что могут напечатать сторонние библиотеки, не должно попасть в канал протокола
+    sys.stdout = sys.stderr
+
+    def reply(message):
+        output.write(json.dumps(message) + '\n')
+        output.flush()
+
+    converter = create_converter(soffice_path, profile_dir)
+    reply({'op': 'ready', 'mode': converter.mode, 'pid': os.getpid(),
+           'fallback_reason': getattr(converter, 'fallback_reason', None)})
+    try:
+        for line in sys.stdin:
+            request = json.loads(line)
+            op = request.get('op')
+            if op == 'ping':
+                reply({'id': request.get('id'), 'ok': True})
+            elif op == 'convert':
+                try:
+                    pdf_path = converter.convert(request['src'], request['outdir'])
+                    if not os.path.exists(pdf_path):
+                        raise ConversionError("Сгенерированный PDF-файл не найден.")
+                    reply({'id': request.get('id'), 'ok': True, 'pdf': pdf_path})
+                except Exception as e:
+                    reply({'id': request.get('id'), 'ok': False, 'error': str(e)})
+            elif op == 'convert_many':
+                reply({'id': request.get('id'), 'ok': True,
+                       'results': convert_files(converter, request['srcs'], request['outdir'])})
+            elif op == 'shutdown':
+                break
+            else:
+                reply({'id': request.get('id'), 'ok': False, 'error': f"Неизвестная операция: {op}"})
+    finally:
+        converter.close()
+
+
+# --- Сторона приложения ----------------------------------------------------
+
+def find_office_python(soffice_path):
+    """Интерпретатор Python из поставки LibreOffice (в нём есть модуль uno) или None."""
+    program_dir = os.path.dirname(os.path.realpath(soffice_path))
+    candidates = [
+        os.path.join(program_dir, 'python.exe'),  # Windows: program/python.exe
+        os.path.join(program_dir, 'python'),  # сборки LibreOffice с сайта для Linux
+        os.path.join(os.path.dirname(program_dir), 'Resources', 'python'),  # macOS: Contents/Resources/python
+    ]
+    for path in candidates:
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return None
+
+
+def _uno_importable():
+    import importlib.util
+    return importlib.util.find_spec('uno') is not None
+
+
+def _worker_script():
+    """Файл этого модуля для запуска чужим интерпретатором; в упакованном приложении — копия из поставки."""
+    if not getattr(sys, 'frozen', False):
+        return os.path.abspath(__file__)
+    path = os.path.join(getattr(sys, '_MEIPASS', os.path.dirname(sys.executable)), 'conversion_service.py')
+    return path if os.path.exists(path) else None
+
+
+def _worker_command(soffice_path, profile_dir):
+    """
+    Команда запуска воркера. Если в интерпретаторе приложения нет python-uno (обычно так в упакованных
+    сборках для macOS и Windows), воркер запускается интерпретатором из поставки LibreOffice — иначе
+    каждая конвертация была бы отдельным запуском soffice.
+    """
+    if os.environ.get('PROFORMA_CONVERTER') != 'command' and not _uno_importable():
+        office_python = find_office_python(soffice_path)
+        script = _worker_script()
+        if office_python and script:
+            return [office_python, script, WORKER_FLAG, soffice_path, profile_dir]
+    if getattr(sys, 'frozen', False):
+        # В упакованном приложении воркер — это сам исполняемый файл с флагом WORKER_FLAG (см. main.py)
+        command = [sys.executable, WORKER_FLAG]
+    else:
+        command = [sys.executable, os.path.abspath(__file__), WORKER_FLAG]
+    return command + [soffice_path, profile_dir]
+
+
+class ConversionService:
+    """
+    Долгоживущий сервис конвертации xlsx -> PDF.
+
+    Воркер запускается один раз (можно заранее, в фоне) и принимает задания через pipe.
+    Зависший воркер убивается по таймауту задания и перезапускается при следующем обращении.
+    """
+
+    def __init__(self, soffice_path, profile_dir=DEFAULT_PROFILE_DIR, timeout=CONVERSION_TIMEOUT):
+        self.soffice_path = soffice_path
+        self.profile_dir = profile_dir
+        self.timeout = timeout
+        self.mode = None
+        self.fallback_reason = None
+        self._process = None
+        self._responses = None
+        self._lock = threading.Lock()
+        self._request_id = 0
+
+    def _read_responses(self, process, responses):
+        for line in process.stdout:
+            try:
+                responses.put(json.loads(line))
+            except ValueError:
+                logger.warning(f"Неожиданный вывод конвертера: {line.rstrip()}")
+        responses.put(None)  # воркер завершился
+
+    def _start(self):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        popen_kwargs = {}
+        if sys.platform.startswith('win'):
+            popen_kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            popen_kwargs['start_new_session'] = True
+        command = _worker_command(self.soffice_path, self.profile_dir)
+        if command[0] != sys.executable:
+            # Интерпретатору LibreOffice не нужны пути к библиотекам приложения
+            popen_kwargs['env'] = {key: value for key, value in os.environ.items()
+                                   if key not in ('PYTHONHOME', 'PYTHONPATH')}
+        self._process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            **popen_kwargs
+        )
+        self._responses = queue.Queue()
+        threading.Thread(target=self._read_responses, args=(self._process, self._responses), daemon=True).start()
+
+        # Первый запуск LibreOffice (создание профиля) может быть долгим, поэтому ждём полный таймаут задания
+        ready = self._wait_response(self.timeout)
+        self.mode = ready.get('mode')
+        self.fallback_reason = ready.get('fallback_reason')
+        logger.info(f"Конвертер запущен (pid {self._process.pid}, режим {self.mode})")
+        if self.fallback_reason:
+            logger.warning(f"Конвертер работает без UNO: {self.fallback_reason}. "
+                           f"Каждый документ запускает soffice заново")
+
+    def _stop(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.write(json.dumps({'op': 'shutdown'}) + '\n')
+            process.stdin.flush()
+            process.wait(timeout=10)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            pass
+        _kill_process_tree(process)
+
+    def _restart(self, reason):
+        logger.warning(f"Перезапуск конвертера: {reason}")
+        _kill_process_tree(self._process)
+        self._process = None
+
+    def _wait_response(self, timeout):
+        try:
+            response = self._responses.get(timeout=timeout)
+        except queue.Empty:
+            self._restart("нет ответа")
+            raise ConversionTimeout(f"Конвертер не ответил за {timeout} с.")
+        if response is None:
+            self._restart("воркер завершился")
+            raise ConversionError("Процесс конвертера неожиданно завершился.")
+        return response
+
+    def _request(self, message, timeout):
+        if self._process is None or self._process.poll() is not None:
+            self._start()
+        self._request_id += 1
+        message['id'] = self._request_id
+        try:
+            self._process.stdin.write(json.dumps(message) + '\n')
+            self._process.stdin.flush()
+        except OSError as e:
+            self._restart(e)
+            raise ConversionError(f"Не удалось передать задание конвертеру: {e}")
+        while True:
+            response = self._wait_response(timeout)
+            # Пропускаем ответы, не относящиеся к текущему заданию
+            if response.get('id') == message['id']:
+                return response
+
+    def status(self):
+        """Состояние конвертера для пользователя (вкладка диагностики)."""
+        if self.mode is None:
+            return "не запущен"
+        if self.mode == 'uno':
+            return "LibreOffice запущен постоянно (UNO)"
+        if self.fallback_reason:
+            return f"запуск soffice на каждый документ: {self.fallback_reason}"
+        return "запуск soffice на каждый документ"
+
+    def warm_up(self):
+        """Запускает воркер в фоновом потоке, чтобы первая конвертация не ждала старта LibreOffice."""
+        threading.Thread(target=self.ping, daemon=True).start()
+
+    def ping(self, timeout=PING_TIMEOUT):
+        """Проверка работоспособности: True, если воркер запущен и отвечает."""
+        with self._lock:
+            try:
+                return bool(self._request({'op': 'ping'}, timeout)['ok'])
+            except ConversionError as e:
+                logger.error(f"Конвертер не отвечает: {e}")
+                return False
+
+    def convert(self, src_path, outdir, timeout=None):
+        """
+        Конвертирует xlsx в PDF.
+
+        :return: Путь к PDF в outdir.
+        :raises ConversionTimeout: Если задание не уложилось в таймаут (воркер перезапускается).
+        :raises ConversionError: При ошибке конвертации.
+        """
+        with self._lock:
+            response = self._request(
+                {'op': 'convert', 'src': os.path.abspath(src_path), 'outdir': os.path.abspath(outdir)},
+                timeout or self.timeout
+            )
+        if not response['ok']:
+            raise ConversionError(response['error'])
+        return response['pdf']
+
+    def convert_many(self, src_paths, outdir, timeout=None):
+        """
+        Конвертирует несколько xlsx в PDF одним заданием воркера (имена файлов должны различаться).
+
+        :return: Список пар (путь к PDF, None) или (None, текст ошибки) в порядке src_paths.
+        :raises ConversionTimeout: Если задание не уложилось в таймаут (воркер перезапускается).
+        """
+        with self._lock:
+            response = self._request(
+                {'op': 'convert_many', 'srcs': [os.path.abspath(path) for path in src_paths],
+                 'outdir': os.path.abspath(outdir)},
+                (timeout or self.timeout) * len(src_paths)
+            )
+        return [(result['pdf'], None) if result['ok'] else (None, result['error']) for result in response['results']]
+
+    def stop(self):
+        with self._lock:
+            self._stop()
+
+
+class ConversionPool:
+    """
+    Пул из нескольких изолированных сервисов конвертации для массового формирования документов.
+
+    У каждого экземпляра свой воркер, свой LibreOffice и свой профиль (-env:UserInstallation),
+    поэтому экземпляры не блокируют друг друга. Задания ставятся в ограниченную очередь (submit ждёт,
+    пока в ней освободится место), каждый экземпляр забирает до batch_size заданий и конвертирует их
+    одним обращением — при soffice --convert-to это один запуск LibreOffice на несколько файлов.
+    convert() совместим с ConversionService, поэтому пул можно передать в render_pdf как converter.
+    """
+
+    def __init__(self, soffice_path, instances=POOL_INSTANCES, profile_dir=DEFAULT_PROFILE_DIR,
+                 batch_size=POOL_BATCH_SIZE, queue_size=None, timeout=CONVERSION_TIMEOUT):
+        instances = instances or os.cpu_count() or 1
+        self.batch_size = max(1, batch_size)
+        self.services = [ConversionService(soffice_path, f"{profile_dir}-{index}", timeout)
+                         for index in range(instances)]
+        self._queue = queue.Queue(maxsize=queue_size or instances * self.batch_size * 2)
+        # Проверка остановки и постановка в очередь — под одной блокировкой со stop(): задание не может
+        # попасть в очередь после сигналов остановки, которые уже никто не заберёт
+        self._state_lock = threading.Lock()
+        self._stopped = False
+        self._threads = []
+        for index, service in enumerate(self.services):
+            thread = threading.Thread(target=self._serve, args=(service,), name=f"conversion-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Пул конвертации: экземпляров {instances}, файлов на обращение до {self.batch_size}")
+
+    def warm_up(self):
+        """Запускает все экземпляры в фоне (первый запуск LibreOffice создаёт профиль и долог)."""
+        for service in self.services:
+            service.warm_up()
+
+    def submit(self, src_path, outdir):
+        """
+        Ставит конвертацию в очередь; блокируется, если очередь заполнена.
+
+        :return: concurrent.futures.Future с путём к PDF в outdir.
+        """
+        future = Future()
+        with self._state_lock:
+            if self._stopped:
+                raise ConversionError("Пул конвертации остановлен")
+            self._queue.put((os.path.abspath(src_path), os.path.abspath(outdir), future))
+        return future
+
+    def convert(self, src_path, outdir, timeout=None):
+        return self.submit(src_path, outdir).result(timeout)
+
+    def _take_batch(self):
+        """Первое задание — с ожиданием, остальные — только уже стоящие в очереди. None — сигнал остановки."""
+        batch = []
+        stop = False
+        job = self._queue.get()
+        while job is not None:
+            batch.append(job)
+            if len(batch) >= self.batch_size:
+                break
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+        else:
+            stop = True
+        return batch, stop
+
+    @staticmethod
+    def _invocations(batch):
+        """Делит задания на обращения: один каталог вывода и разные имена файлов в каждом."""
+        groups = []
+        for job in batch:
+            src_path, outdir, _ = job
+            name = os.path.basename(src_path)
+            for group_outdir, names, jobs in groups:
+                if group_outdir == outdir and name not in names:
+                    names.add(name)
+                    jobs.append(job)
+                    break
+            else:
+                groups.append((outdir, {name}, [job]))
+        return [(outdir, jobs) for outdir, _, jobs in groups]
+
+    def _serve(self, service):
+        while True:
+            batch, stop = self._take_batch()
+            for outdir, jobs in self._invocations(batch):
+                jobs = [job for job in jobs if job[2].set_running_or_notify_cancel()]
+                if not jobs:
+                    continue
+                try:
+                    results = service.convert_many([src_path for src_path, _, _ in jobs], outdir)
+                except Exception as e:
+                    for _, _, future in jobs:
+                        future.set_exception(e)
+                    continue
+                for (_, _, future), (pdf_path, error) in zip(jobs, results):
+                    if error is None:
+                        future.set_result(pdf_path)
+                    else:
+                        future.set_exception(ConversionError(error))
+            if stop:
+                break
+
+    def stop(self):
+        """
+        Дожидается заданий, уже стоящих в очереди, и останавливает экземпляры.
+        Задания, оставшиеся в очереди после остановки экземпляров, завершаются ошибкой ConversionError,
+        чтобы их не ждали вечно.
+        """
+        with self._state_lock:
+            if self._stopped:
+                return
+            self._stopped = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        for service in self.services:
+            service.stop()
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None and job[2].set_running_or_notify_cancel():
+                job[2].set_exception(ConversionError("Пул конвертации остановлен"))
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_conversion_service():
+    """Возвращает общий сервис конвертации или None, если LibreOffice не установлен."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            from proforma_document import get_soffice_path
+            soffice_path = get_soffice_path()
+            if not soffice_path:
+                return None
+            _service = ConversionService(soffice_path)
+            atexit.register(_service.stop)
+        return _service
+
+
+if __name__ == "__main__":
+    # python conversion_service.py --conversion-worker <soffice> <profile_dir>
+    if len(sys.argv) == 4 and sys.argv[1] == WORKER_FLAG:
+        run_worker(sys.argv[2], sys.argv[3])
@@ -0,0 +1,115 @@
+# diagnostics_tab.py
+
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+import logging
+
+from perf import perf
+
+logger = logging.getLogger(__name__)
+
+# Период обновления таблицы замеров, пока они включены, мс
+REFRESH_INTERVAL_MS = 1000
+
+
+class DiagnosticsTab:
+    """Вкладка с замерами времени этапов (perf.py): p50/p95/max по каждому этапу и выгрузка в файл."""
+
+    COLUMNS = (
+        ('phase', "Этап", 220, 'w'),
+        ('count', "Замеров", 80, 'e'),
+        ('p50_ms', "p50, мс", 90, 'e'),
+        ('p95_ms', "p95, мс", 90, 'e'),
+        ('max_ms', "max, мс", 90, 'e'),
+        ('total_ms', "Всего, мс", 100, 'e'),
+    )
+
+    def __init__(self, parent, get_converter=None):
+        """:param get_converter: Функция, возвращающая сервис конвертации PDF (или None) для строки состояния."""
+        self.parent = parent
+        self.get_converter = get_converter
+        self.enabled_var = tk.BooleanVar(value=perf.enabled)
+        self.refresh_after_id = None
+        self.create_widgets()
+        self.refresh()
+
+    def create_widgets(self):
+        self.frame = ttk.Frame(self.parent)
+        self.frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        title_label = ttk.Label(self.frame, text="Время этапов", font=('Helvetica', 16, 'bold'))
+        title_label.pack(pady=10)
+
+        controls = ttk.Frame(self.frame)
+        controls.pack(fill=tk.X, pady=5)
+        ttk.Checkbutton(controls, text="Собирать замеры", variable=self.enabled_var,
+                        command=self.toggle).pack(side=tk.LEFT)
+        ttk.Button(controls, text="Экспорт", command=self.export).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(controls, text="Сбросить", command=self.reset).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(controls, text="Обновить", command=self.refresh).pack(side=tk.RIGHT, padx=5)
+
+        self.tree = ttk.Treeview(self.frame, columns=[column[0] for column in self.COLUMNS],
+                                 show='headings', height=12)
+        for key, heading, width, anchor in self.COLUMNS:
+            self.tree.heading(key, text=heading)
+            self.tree.column(key, width=width, anchor=anchor)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+
+        self.converter_label = ttk.Label(self.frame, text="")
+        self.converter_label.pack(fill=tk.X, pady=5)
+
+    def update_converter_status(self):
+        converter = self.get_converter() if self.get_converter else None
+        text = f"Конвертер PDF: {converter.status()}" if converter is not None else "Конвертер PDF: не используется"
+        if self.converter_label.cget('text') != text:
+            self.converter_label.config(text=text)
+
+    def toggle(self):
+        perf.enabled = self.enabled_var.get()
+        logger.info(f"Замеры времени этапов {'включены' if perf.enabled else 'выключены'}")
+        self.refresh()
+
+    def refresh(self):
+        if self.refresh_after_id is not None:
+            self.parent.after_cancel(self.refresh_after_id)
+            self.refresh_after_id = None
+
+        self.update_converter_status()
+        rows = {}
+        for stat in perf.stats():
+            rows[stat['phase']] = (
+                stat['phase'],
+                stat['count'],
+                f"{stat['p50_ms']:.1f}",
+                f"{stat['p95_ms']:.1f}",
+                f"{stat['max_ms']:.1f}",
+                f"{stat['total_ms']:.1f}",
+            )
+        for item_id in self.tree.get_children():
+            if item_id not in rows:
+                self.tree.delete(item_id)
+        for phase, values in rows.items():
+            if self.tree.exists(phase):
+                self.tree.item(phase, values=values)
+            else:
+                self.tree.insert("", "end", iid=phase, values=values)
+
+        if perf.enabled:
+            self.refresh_after_id = self.parent.after(REFRESH_INTERVAL_MS, self.refresh)
+
+    def reset(self):
+        perf.reset()
+        self.refresh()
+
+    def export(self):
+        path = filedialog.asksaveasfilename(defaultextension=".json",
+                                            filetypes=[("JSON", "*.json"), ("CSV", "*.csv")],
+                                            title="Сохранить метрики")
+        if not path:
+            return
+        try:
+            perf.export(path)
+            messagebox.showinfo("Успех", "Метрики сохранены.")
+        except OSError as e:
+            logger.error(f"Ошибка при сохранении метрик: {e}")
+            messagebox.showerror("Ошибка", f"Не удалось сохранить метрики: {e}")
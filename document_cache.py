@@ -0,0 +1,192 @@
+# document_cache.py
+
+import os
+import json
+import shutil
+import hashlib
+import datetime
+import tempfile
+import threading
+import logging
+
+from constants import CACHE_DIR, DOCUMENT_CACHE_MAX_BYTES, TEMPLATE_PATH, PDF_ENGINE
+from template_index import file_hash
+from utils import parse_input, parse_overtime
+
+logger = logging.getLogger(__name__)
+
+# Увеличивается при изменении вида документов или состава ключа, чтобы не выдавать из кэша документы старого вида
+DOCUMENT_CACHE_VERSION = 3
+# Число блокировок формирования документов; ключ выбирает свою по хэшу
+KEY_LOCK_STRIPES = 64
+
+# Поля формы, которые попадают в документ только как числа: "12,5" и "12.5" дают один документ
+NUMBER_FIELDS = ('lbp', 'beam', 'rdm', 'agency_fee', 'bank_charges')
+MILES_FIELDS = ('miles_inward_in', 'miles_inward_out', 'miles_outward_in', 'miles_outward_out')
+OVERTIME_FIELDS = ('overtime_in', 'overtime_out')
+LINE_FIELDS = ('additional_dues', 'additional_fees')
+
+
+def normalize_inputs(inputs):
+    """Входные данные в каноническом виде для ключа кэша (числа — как числа, а не как введённый текст)."""
+    normalized = {}
+    for name, value in inputs.items():
+        try:
+            if name in NUMBER_FIELDS:
+                value = parse_input(str(value))
+            elif name in MILES_FIELDS:
+                value = int(value)
+            elif name in OVERTIME_FIELDS:
+                value = parse_overtime(str(value))
+            elif name in LINE_FIELDS:
+                value = [[line['name'], parse_input(str(line['amount']))] for line in value]
+            else:
+                value = str(value)
+        except (ValueError, TypeError, KeyError):
+            value = str(value)
+        normalized[name] = value
+    return normalized
+
+
+_template_hashes = {}
+
+
+def template_hash(path=TEMPLATE_PATH):
+    """Хэш шаблона; пересчитывается только при изменении файла (mtime/размер)."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _template_hashes.get(path)
+    if cached is None or cached[0] != stamp:
+        cached = _template_hashes[path] = (stamp, file_hash(path))
+    return cached[1]
+
+
+def document_key(calculation, engine=PDF_ENGINE):
+    """
+    Ключ документа: хэш нормализованных входных данных, версии тарифа, шаблона и даты документа.
+    Одинаковые расчёты дают один ключ, поэтому PDF формируется один раз для просмотра, печати и сохранения.
+    Шаблон входит в ключ для обоих движков: встроенный рендерер тоже берёт из него текст и раскладку.
+    Дата входит в ключ, потому что документ печатает текущую дату: назавтра он формируется заново.
+    """
+    payload = {
+        'version': DOCUMENT_CACHE_VERSION,
+        'engine': engine,
+        'inputs': normalize_inputs(calculation.inputs),
+        'tariff': calculation.tariff.version,
+        'template': template_hash(),
+        'date': datetime.date.today().isoformat(),
+    }
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class DocumentCache:
+    """
+    Дисковый кэш сформированных документов (PDF и заполненный xlsx), адресуемый ключом document_key.
+
+    Файлы лежат в каталоге кэша как <ключ>.<расширение>; обращение обновляет mtime файла,
+    а при превышении бюджета размера удаляются файлы, к которым дольше всего не обращались.
+    """
+
+    def __init__(self, directory=os.path.join(CACHE_DIR, 'documents'), max_bytes=DOCUMENT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(KEY_LOCK_STRIPES)]
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def get(self, key, extension):
+        """Путь к документу в кэше или None."""
+        path = self.path(key, extension)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key, extension, src_path):
+        """Копирует документ в кэш (атомарно) и возвращает путь к нему в кэше."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key, extension)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            shutil.copyfile(src_path, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            os.remove(tmp_path)
+            raise
+        self.evict(keep=path)
+        return path
+
+    def key_lock(self, key):
+        """
+        Блокировка ключа: один и тот же документ одновременно формирует только один поток.
+        Блокировок фиксированное число: разные ключи могут делить одну, тогда их документы формируются по очереди.
+        """
+        return self._key_locks[int(key[:8], 16) % KEY_LOCK_STRIPES]
+
+    def evict(self, keep=None):
+        """Удаляет давно не использовавшиеся документы, пока кэш больше бюджета."""
+        with self._lock:
+            try:
+                entries = []
+                with os.scandir(self.directory) as scan:
+                    for entry in scan:
+                        if entry.is_file() and not entry.name.endswith('.tmp'):
+                            stat = entry.stat()
+                            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            except OSError:
+                return
+            size = sum(entry[1] for entry in entries)
+            for _, file_size, path in sorted(entries):
+                if size <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Файл может быть открыт просмотрщиком (Windows) — удалим в другой раз
+                    continue
+                size -= file_size
+                logger.debug(f"Документ {path} вытеснен из кэша")
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+document_cache = DocumentCache()
+
+
+def get_pdf(calculation, converter=None, engine=PDF_ENGINE, progress=None, cache=document_cache):
+    """
+    PDF проформы из кэша; при промахе формирует его (и заполненный xlsx для LibreOffice) и кладёт в кэш.
+
+    :return: Путь к PDF в кэше. Файл нельзя изменять: для сохранения пользователю его нужно скопировать.
+    """
+    from proforma_document import render_pdf
+
+    key = document_key(calculation, engine)
+    with cache.key_lock(key):
+        cached = cache.get(key, 'pdf')
+        if cached is not None:
+            logger.info(f"PDF взят из кэша документов ({key[:12]})")
+            return cached
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            pdf_path = os.path.join(tmp_dir, 'proforma.pdf')
+            xlsx_path = os.path.join(tmp_dir, 'proforma.xlsx')
+            render_pdf(calculation, calculation.inputs, pdf_path, converter=converter, engine=engine,
+                       progress=progress, xlsx_path=xlsx_path)
+            if os.path.exists(xlsx_path):
+                cache.put(key, 'xlsx', xlsx_path)
+            return cache.put(key, 'pdf', pdf_path)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
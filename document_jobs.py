@@ -0,0 +1,168 @@
+# document_jobs.py
+
+import itertools
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import DOCUMENT_WORKERS
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL_MS = 100
+
+STATUS_QUEUED = "В очереди"
+STATUS_RUNNING = "Выполняется"
+STATUS_DONE = "Готово"
+STATUS_FAILED = "Ошибка"
+STATUS_CANCELLED = "Отменено"
+
+
+class JobCancelled(Exception):
+    """Задание отменено пользователем."""
+
+
+class DocumentJob:
+    """Задание на формирование документа. Поля меняет рабочий поток, читает — поток Tk при опросе."""
+
+    def __init__(self, job_id, title, on_success=None, on_error=None):
+        self.id = job_id
+        self.title = title
+        self.on_success = on_success
+        self.on_error = on_error
+        self.status = STATUS_QUEUED
+        self.phase = ""
+        self.percent = 0
+        self.error = None
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    def progress(self, phase, percent):
+        """Вызывается из рабочего потока между этапами; здесь же проверяется отмена."""
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+        self.phase = phase
+        self.percent = percent
+
+    def cancel(self):
+        self._cancel_event.set()
+        if self.future is not None and self.future.cancel():
+            # Задание ещё не начиналось — рабочий поток его не возьмёт
+            self.status = STATUS_CANCELLED
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.status in (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+
+    def describe(self):
+        if self.status == STATUS_RUNNING and self.phase:
+            return f"{self.status}: {self.phase} ({self.percent}%)"
+        if self.status == STATUS_FAILED and self.error:
+            return f"{self.status}: {self.error}"
+        return self.status
+
+
+class DocumentJobQueue:
+    """
+    Пул рабочих потоков для формирования документов.
+
+    Задания выполняются вне главного потока, а их состояние и результаты передаются в Tk
+    через опрос root.after(): колбэки on_success/on_error и on_update вызываются только в потоке Tk.
+    """
+
+    def __init__(self, root, max_workers=DOCUMENT_WORKERS, on_update=None):
+        self.root = root
+        self.on_update = on_update
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='document')
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._polling = False
+        self._reported = {}
+
+    def submit(self, title, func, *args, on_success=None, on_error=None):
+        """
+        Ставит задание в очередь. func вызывается в рабочем потоке как func(job, *args)
+        и может сообщать о ходе работы через job.progress(phase, percent).
+        """
+        job = DocumentJob(next(self._ids), title, on_success, on_error)
+        self.jobs[job.id] = job
+        job.future = self.executor.submit(self._run, job, func, args)
+        self._notify(job)
+        self._schedule_poll()
+        return job
+
+    @staticmethod
+    def _run(job, func, args):
+        job.status = STATUS_RUNNING
+        try:
+            result = func(job, *args)
+        except JobCancelled:
+            job.status = STATUS_CANCELLED
+            return None
+        except Exception as e:
+            logger.exception(f"Ошибка в задании '{job.title}'")
+            job.error = str(e)
+            job.status = STATUS_FAILED
+            return None
+        job.percent = 100
+        job.status = STATUS_CANCELLED if job.cancelled else STATUS_DONE
+        return result
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None and not job.finished:
+            job.cancel()
+            self._notify(job)
+
+    def _notify(self, job):
+        state = job.describe()
+        if self._reported.get(job.id) != state:
+            self._reported[job.id] = state
+            if self.on_update is not None:
+                self.on_update(job)
+
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self):
+        self._polling = False
+        active = False
+        for job in list(self.jobs.values()):
+            if job.future.done() and job.finished:
+                self._notify(job)
+                self._deliver(job)
+            else:
+                active = True
+                self._notify(job)
+        if active:
+            self._schedule_poll()
+
+    def _deliver(self, job):
+        # Колбэки вызываются один раз, после чего задание остаётся только в списке для отображения
+        callback = None
+        if job.status == STATUS_DONE and job.on_success is not None:
+            callback, argument = job.on_success, job.future.result()
+        elif job.status == STATUS_FAILED and job.on_error is not None:
+            callback, argument = job.on_error, job.error
+        job.on_success = job.on_error = None
+        if callback is not None:
+            callback(argument)
+
+    def active_count(self):
+        return sum(1 for job in self.jobs.values() if not job.finished)
+
+    def clear_finished(self):
+        for job_id in [job.id for job in self.jobs.values() if job.finished and job.future.done()]:
+            del self.jobs[job_id]
+            self._reported.pop(job_id, None)
+
+    def shutdown(self):
+        for job in self.jobs.values():
+            job.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,217 @@
+# fda_batch.py
+"""
+Пакетное формирование FDA по манифесту: книги формируются параллельно в пуле процессов
+и сохраняются сразу в выходной каталог, без диалогов.
+
+Манифест — JSONL, одна запись на строку:
+
+    {"case_id": 12, "actuals": {"Agency fee": 1500.0, "Bank charges": 45}}
+    {"case_id": 13, "invoice": "invoices/13.xlsx"}
+    {"id": "MV-OCEAN-0425", "vessel_name": "OCEAN", "actuals": {...}}
+
+case_id — случай из истории расчётов: из него берутся название судна и строки PDA (для импорта счёта),
+а фактические суммы записываются в историю, как при формировании FDA во вкладке.
+
+    python main.py fda-batch manifest.jsonl -o fda_output --jobs 4
+"""
+
+import os
+import csv
+import json
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from constants import FDA_TEMPLATE_PATH, FDA_BATCH_WORKERS
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_COLUMNS = ['line', 'record', 'case_id', 'document', 'lines', 'missing', 'error']
+# Записей на одну передачу в процесс: меньше обменов между процессами на больших манифестах
+CHUNK_SIZE = 8
+
+
+def _init_worker(template_path):
+    """Инициализация процесса пула: шаблон и его индекс загружаются один раз на процесс."""
+    from template_cache import load_template
+    from template_index import load_template_index
+
+    load_template_index(template_path)
+    load_template(template_path)
+
+
+def generate_fda_document(task):
+    """
+    Формирует и сохраняет одну FDA. Выполняется в процессе пула.
+
+    :param task: Кортеж (номер строки манифеста, {строка: сумма}, путь к файлу, путь к шаблону).
+    :return: Кортеж (номер строки манифеста, путь к файлу, строки без поля в шаблоне, текст ошибки или None).
+    """
+    from fda_tab import build_fda_workbook
+
+    line_number, fda_data, document_path, template_path = task
+    try:
+        wb, missing = build_fda_workbook(fda_data, template_path)
+        tmp_path = document_path + '.tmp'
+        wb.save(tmp_path)
+        os.replace(tmp_path, document_path)
+    except Exception as e:
+        return line_number, None, [], f"{type(e).__name__}: {e}"
+    return line_number, document_path, missing, None
+
+
+def iter_manifest(path):
+    """Записи манифеста: генератор пар (номер строки, словарь записи)."""
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if line:
+                yield line_number, json.loads(line)
+
+
+def resolve_record(record, manifest_dir, store=None):
+    """
+    Фактические суммы и название судна записи манифеста.
+
+    :return: Кортеж ({строка: сумма}, название судна).
+    :raises ValueError: Если в записи нет сумм или их нельзя получить.
+    """
+    from invoice_import import import_invoice
+
+    case_id = record.get('case_id')
+    vessel_name = record.get('vessel_name', '')
+    pda_names = None
+    if case_id is not None and store is not None:
+        vessel_name = vessel_name or store.load_inputs(case_id).get('vessel_name', '')
+        pda_names = [line[0] for line in store.load_lines(case_id)]
+
+    if 'actuals' in record:
+        fda_data = {str(name): float(amount) for name, amount in record['actuals'].items()}
+    elif 'invoice' in record:
+        if pda_names is None:
+            raise ValueError("Для импорта счёта нужен case_id случая из истории расчётов")
+        result = import_invoice(os.path.join(manifest_dir, record['invoice']), pda_names)
+        if result.unmatched:
+            logger.warning(f"Случай {case_id}: строк счёта без пары в PDA — {len(result.unmatched)}")
+        fda_data = result.amounts
+    else:
+        raise ValueError("В записи нет ни actuals, ни invoice")
+    if not fda_data:
+        raise ValueError("Нет ни одной фактической суммы")
+    return fda_data, vessel_name
+
+
+def record_actuals(store, case_id, fda_data):
+    """Записывает фактические суммы в историю расчётов и историю отклонений PDA/FDA."""
+    from variance_history import get_variance_history
+
+    store.save_fda(case_id, fda_data)
+    pda_amounts = {line[0]: line[5] for line in store.load_lines(case_id)}
+    get_variance_history().append(
+        case_id, store.load_inputs(case_id)['port'],
+        [(name, pda_amounts.get(name, 0.0), amount) for name, amount in fda_data.items()])
+
+
+def run_fda_batch(manifest_path, output_dir, template_path=FDA_TEMPLATE_PATH, jobs=FDA_BATCH_WORKERS,
+                  record=True):
+    """
+    Формирует FDA по всем записям манифеста и пишет сводку fda_summary.csv в выходной каталог.
+
+    Записи разбираются в основном процессе (там же — обращения к истории расчётов),
+    книги формируются и сохраняются в пуле из jobs процессов (0 — по числу ядер).
+    Идентификатор записи (id или case_id) задаёт имя документа, поэтому повтор идентификатора
+    в манифесте — ошибка этой строки: иначе две записи писали бы один файл.
+
+    :param record: Записывать фактические суммы случаев (case_id) в историю.
+    :return: Кортеж (количество успешных записей, количество ошибок).
+    """
+    from cli import document_name
+
+    if not os.path.exists(template_path):
+        raise FileNotFoundError(f"Шаблон FDA не найден по пути {template_path}")
+    template_path = os.path.abspath(template_path)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    store = None
+    try:
+        from case_store import get_case_store
+        store = get_case_store()
+    except Exception as e:
+        logger.warning(f"История расчётов недоступна, case_id не используется: {e}")
+
+    rows = {}  # номер строки манифеста -> строка сводки
+    record_lines = {}  # идентификатор записи -> номер строки, где он встретился впервые
+    tasks = []
+    for line_number, item in iter_manifest(manifest_path):
+        record_id = str(item.get('id') or item.get('case_id') or line_number)
+        row = rows[line_number] = {'line': line_number, 'record': record_id, 'case_id': item.get('case_id', '')}
+        try:
+            if record_id in record_lines:
+                raise ValueError(f"Идентификатор {record_id} уже встречался в строке {record_lines[record_id]}")
+            record_lines[record_id] = line_number
+            fda_data, vessel_name = resolve_record(item, manifest_dir, store)
+        except Exception as e:
+            logger.error(f"Ошибка в записи {record_id} (строка {line_number}): {e}")
+            row['error'] = str(e)
+            continue
+        row['lines'] = len(fda_data)
+        row['actuals'] = fda_data
+        document_path = os.path.join(output_dir, document_name(f"FDA_{record_id}", {'vessel_name': vessel_name},
+                                                               '.xlsx'))
+        tasks.append((line_number, fda_data, document_path, template_path))
+
+    workers = jobs or os.cpu_count() or 1
+    workers = max(1, min(workers, len(tasks)))
+    if tasks:
+        logger.info(f"Пакетное формирование FDA: {len(tasks)} документов, процессов {workers}")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(template_path,)) as executor:
+            for line_number, document_path, missing, error in executor.map(generate_fda_document, tasks,
+                                                                           chunksize=CHUNK_SIZE):
+                row = rows[line_number]
+                row['document'] = document_path or ''
+                row['missing'] = ', '.join(missing)
+                if error:
+                    logger.error(f"Ошибка формирования FDA {row['record']}: {error}")
+                    row['error'] = error
+
+    succeeded = failed = 0
+    summary_path = os.path.join(output_dir, 'fda_summary.csv')
+    with open(summary_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for row in rows.values():
+            if row.get('error'):
+                failed += 1
+            else:
+                succeeded += 1
+                if record and store is not None and row['case_id'] != '':
+                    try:
+                        record_actuals(store, row['case_id'], row['actuals'])
+                    except Exception as e:
+                        logger.warning(f"Не удалось записать FDA случая {row['case_id']} в историю: {e}")
+            writer.writerow(row)
+
+    logger.info(f"Пакетное формирование FDA завершено: {succeeded} успешно, {failed} с ошибками. "
+                f"Сводка: {summary_path}")
+    return succeeded, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='main.py fda-batch',
+        description="Пакетное формирование FDA по манифесту (JSONL) без графического интерфейса."
+    )
+    parser.add_argument('manifest', help="Манифест: по записи JSONL на случай (actuals или invoice).")
+    parser.add_argument('-o', '--output-dir', default='fda_output', help="Каталог для FDA и fda_summary.csv.")
+    parser.add_argument('--template', default=FDA_TEMPLATE_PATH, help="Шаблон FDA.")
+    parser.add_argument('-j', '--jobs', type=int, default=FDA_BATCH_WORKERS,
+                        help="Число процессов (0 — по числу ядер).")
+    parser.add_argument('--no-record', action='store_true',
+                        help="Не записывать фактические суммы в историю расчётов.")
+    args = parser.parse_args(argv)
+
+    succeeded, failed = run_fda_batch(args.manifest, args.output_dir, args.template, args.jobs,
+                                      record=not args.no_record)
+    return 0 if failed == 0 else 1
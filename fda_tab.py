@@ -1,21 +1,235 @@
 # fda_tab.py
 
 import tkinter as tk
-from tkinter import ttk, messagebox
-import openpyxl
+from tkinter import ttk, messagebox, filedialog
 import os
 import logging
 
 from utils import format_amount, parse_input
-from constants import FDA_TEMPLATE_PATH  # Убедитесь, что этот путь правильный
+from constants import FDA_TEMPLATE_PATH
+from template_index import load_template_index, report_placeholders
+from template_cache import load_template
+from invoice_import import import_invoice
+from perf import span
 
 logger = logging.getLogger(__name__)
 
+# Сколько несопоставленных строк счёта показывать в отчёте об импорте (все — в журнале)
+UNMATCHED_REPORT_LINES = 15
+
+
+HEADERS = ["Наименование", "PDA", "FDA (ввод)"]
+ROW_PADY = 2
+DEFAULT_VISIBLE_ROWS = 15  # запрашиваемая высота таблицы в строках; фактическая — по размеру вкладки
+WHEEL_ROWS = 3  # строк за один шаг колеса мыши
+
+
+class _GridRow:
+    """Виджеты одной видимой строки таблицы и название строки FDA, которую они сейчас показывают."""
+
+    __slots__ = ('name_label', 'pda_label', 'entry', 'var', 'key', 'shown')
+
+    def __init__(self, name_label, pda_label, entry, var):
+        self.name_label = name_label
+        self.pda_label = pda_label
+        self.entry = entry
+        self.var = var
+        self.key = None
+        self.shown = False
+
+
+class FDAGrid(ttk.Frame):
+    """
+    Редактируемая таблица FDA с виртуализацией: виджеты создаются только для видимых строк
+    и при прокрутке показывают другие строки. Введённые значения хранятся по названию строки
+    отдельно от виджетов, поэтому переживают прокрутку, пересчёт PDA и смену состава строк.
+    """
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.row_keys = []  # названия строк по порядку
+        self.pda_texts = {}  # название -> сумма PDA для отображения
+        self.values = {}  # название -> введённый текст FDA
+        self.offset = 0  # индекс первой видимой строки
+        self.rows = []  # пул виджетов видимых строк
+        self.capacity = 1
+        self._binding = False  # значения пула меняются программно, не вводом пользователя
+
+        self.body = ttk.Frame(self)
+        self.body.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.body.columnconfigure(0, weight=1)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        for col, header in enumerate(HEADERS):
+            label = ttk.Label(self.body, text=header, font=('Helvetica', 12, 'bold'))
+            label.grid(row=0, column=col, padx=5, pady=5, sticky='w' if col == 0 else '')
+        self.header_height = max(label.winfo_reqheight(), 20) + 10
+        # Размер области задаётся явно, а не виджетами пула: иначе новые строки пула растягивали бы окно
+        self.body.grid_propagate(False)
+        self.body.configure(width=640, height=self.header_height + DEFAULT_VISIBLE_ROWS * self.row_height)
+
+        self._bind_wheel(self.body)
+        self.body.bind("<Configure>", lambda event: self.resize(event.height))
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self.on_wheel)
+        widget.bind("<Button-4>", self.on_wheel)
+        widget.bind("<Button-5>", self.on_wheel)
+
+    def _create_row(self):
+        var = tk.StringVar()
+        row = _GridRow(ttk.Label(self.body), ttk.Label(self.body), ttk.Entry(self.body, textvariable=var), var)
+        var.trace_add('write', lambda *args: self._on_edit(row))
+        for widget in (row.name_label, row.pda_label, row.entry):
+            self._bind_wheel(widget)
+        row.entry.bind("<Tab>", lambda event: self._move_focus(row, 1))
+        row.entry.bind("<Return>", lambda event: self._move_focus(row, 1))
+        row.entry.bind("<Down>", lambda event: self._move_focus(row, 1))
+        row.entry.bind("<Up>", lambda event: self._move_focus(row, -1))
+        for sequence in ("<Shift-Tab>", "<ISO_Left_Tab>"):
+            try:
+                row.entry.bind(sequence, lambda event: self._move_focus(row, -1))
+            except tk.TclError:
+                pass  # ISO_Left_Tab есть не на всех платформах
+        self.rows.append(row)
+        return row
+
+    @property
+    def row_height(self):
+        if not self.rows:
+            self._create_row()
+        return max(self.rows[0].entry.winfo_reqheight(), 20) + 2 * ROW_PADY
+
+    def resize(self, height):
+        """Подбирает число строк пула под высоту области."""
+        self.capacity = max(1, (height - self.header_height) // self.row_height)
+        while len(self.rows) < self.capacity:
+            self._create_row()
+        self.refresh()
+
+    def set_rows(self, rows):
+        """
+        Обновляет состав строк и суммы PDA: перерисовываются только изменившиеся видимые строки.
+
+        :param rows: Пары (название строки, сумма PDA); строки с одинаковым названием объединяются.
+        """
+        amounts = {}
+        for name, amount in rows:
+            amounts[name] = amounts.get(name, 0.0) + amount
+        self.row_keys = list(amounts)
+        self.pda_texts = {name: format_amount(amount) for name, amount in amounts.items()}
+        self.refresh()
+
+    def set_values(self, values, replace=False):
+        """
+        Записывает значения FDA ({название: текст}) и обновляет видимые строки.
+
+        :param replace: Удалить прежние значения (другой случай), а не дополнить их.
+        """
+        if replace:
+            self.values.clear()
+        self.values.update(values)
+        self.refresh()
+
+    def value(self, key):
+        return self.values.get(key, '').strip()
+
+    def refresh(self):
+        self.offset = max(0, min(self.offset, len(self.row_keys) - self.capacity))
+        self._binding = True
+        try:
+            for slot, row in enumerate(self.rows):
+                index = self.offset + slot
+                if slot >= self.capacity or index >= len(self.row_keys):
+                    if row.shown:
+                        for widget in (row.name_label, row.pda_label, row.entry):
+                            widget.grid_remove()
+                        row.shown = False
+                    row.key = None
+                    continue
+                key = self.row_keys[index]
+                if row.key != key:
+                    row.key = key
+                    row.name_label.config(text=key)
+                value = self.values.get(key, '')
+                if row.var.get() != value:
+                    row.var.set(value)
+                pda_text = self.pda_texts[key]
+                if row.pda_label.cget('text') != pda_text:
+                    row.pda_label.config(text=pda_text)
+                if not row.shown:
+                    grid_row = slot + 1
+                    row.name_label.grid(row=grid_row, column=0, padx=5, pady=ROW_PADY, sticky='w')
+                    row.pda_label.grid(row=grid_row, column=1, padx=5, pady=ROW_PADY)
+                    row.entry.grid(row=grid_row, column=2, padx=5, pady=ROW_PADY)
+                    row.shown = True
+        finally:
+            self._binding = False
+        if self.row_keys:
+            self.scrollbar.set(self.offset / len(self.row_keys),
+                               min(1.0, (self.offset + self.capacity) / len(self.row_keys)))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _on_edit(self, row):
+        if not self._binding and row.key is not None:
+            self.values[row.key] = row.var.get()
+
+    def scroll_to(self, offset):
+        if offset != self.offset:
+            # Поле с фокусом при прокрутке покажет другую строку: фокус уходит с него, чтобы ввод не попал не туда
+            try:
+                focused = self.focus_get()
+            except (KeyError, tk.TclError):
+                focused = None
+            if any(row.entry is focused for row in self.rows):
+                self.body.focus_set()
+            self.offset = offset
+            self.refresh()
+
+    def on_scrollbar(self, *args):
+        if args[0] == 'moveto':
+            self.scroll_to(int(round(float(args[1]) * len(self.row_keys))))
+        elif args[0] == 'scroll':
+            step = self.capacity if args[2] == 'pages' else 1
+            self.scroll_to(self.offset + int(args[1]) * step)
+
+    def on_wheel(self, event):
+        if event.num == 4 or getattr(event, 'delta', 0) > 0:
+            direction = -1
+        else:
+            direction = 1
+        self.scroll_to(max(0, self.offset + direction * WHEEL_ROWS))
+        return "break"
+
+    def focus_key(self, key):
+        """Прокручивает таблицу к строке и ставит курсор в её поле FDA."""
+        index = self.row_keys.index(key)
+        if index < self.offset:
+            self.scroll_to(index)
+        elif index >= self.offset + self.capacity:
+            self.scroll_to(index - self.capacity + 1)
+        entry = self.rows[index - self.offset].entry
+        entry.focus_set()
+        entry.icursor(tk.END)
+
+    def _move_focus(self, row, step):
+        if row.key is None:
+            return None
+        index = self.row_keys.index(row.key) + step
+        if not 0 <= index < len(self.row_keys):
+            return None  # за пределами таблицы — обычный переход фокуса
+        self.focus_key(self.row_keys[index])
+        return "break"
+
+
 class FDATab:
-    def __init__(self, parent, pda_data):
+    def __init__(self, parent, pda_data, on_fda_generated=None, jobs=None):
         self.parent = parent  # Это будет фрейм вкладки FDA
         self.pda_data = pda_data  # Данные из PDA
-        self.entries = {}  # Словарь для хранения полей ввода
+        self.on_fda_generated = on_fda_generated  # Вызывается с суммами FDA после сохранения документа
+        self.jobs = jobs  # DocumentJobQueue для чтения счетов вне потока интерфейса (необязательно)
         self.create_widgets()
 
     def create_widgets(self):
@@ -27,73 +241,93 @@ class FDATab:
         title_label = ttk.Label(self.frame, text="FDA", font=('Helvetica', 16, 'bold'))
         title_label.pack(pady=10)
 
-        # Создаём фрейм для таблицы fees и dues
-        self.table_frame = ttk.Frame(self.frame)
-        self.table_frame.pack(fill=tk.BOTH, expand=True)
-
-        # Создаём заголовки колонок
-        headers = ["Наименование", "PDA", "FDA (ввод)"]
-        for col, header in enumerate(headers):
-            label = ttk.Label(self.table_frame, text=header, font=('Helvetica', 12, 'bold'))
-            label.grid(row=0, column=col, padx=5, pady=5)
+        buttons = ttk.Frame(self.frame)
+        buttons.pack(side=tk.BOTTOM, pady=10)
+        # Кнопка "Импорт счёта": суммы FDA из счёта поставщика
+        import_button = ttk.Button(buttons, text="Импорт счёта (CSV/XLSX)", command=self.import_invoice_file)
+        import_button.pack(side=tk.LEFT, padx=5)
+        # Кнопка "Сформировать FDA"
+        generate_button = ttk.Button(buttons, text="Сформировать FDA", command=self.generate_fda)
+        generate_button.pack(side=tk.LEFT, padx=5)
 
-        # Заполняем таблицу
+        # Таблица fees и dues
+        self.table = FDAGrid(self.frame)
+        self.table.pack(fill=tk.BOTH, expand=True)
         self.populate_table()
 
-        # Кнопка "Сформировать FDA"
-        generate_button = ttk.Button(self.frame, text="Сформировать FDA", command=self.generate_fda)
-        generate_button.pack(pady=10)
-
     def populate_table(self):
-        logger.info(f"Populating FDA table with data: {self.pda_data}")
-        # Очищаем предыдущие данные
-        for widget in self.table_frame.winfo_children():
-            widget.destroy()
-
-        # Создаём заголовки колонок
-        headers = ["Наименование", "PDA", "FDA (ввод)"]
-        for col, header in enumerate(headers):
-            label = ttk.Label(self.table_frame, text=header, font=('Helvetica', 12, 'bold'))
-            label.grid(row=0, column=col, padx=5, pady=5)
+        logger.debug("Populating FDA table with data: %s", self.pda_data)
+        self.table.set_rows((item.name, item.total_amount) for item in self.pda_data)
 
-        self.entries = {}  # Сбросить словарь полей ввода
+    def update_pda_data(self, pda_data):
+        """Обновляет данные PDA; введённые значения FDA сохраняются по названию строки."""
+        self.pda_data = pda_data
+        self.populate_table()
 
-        # Заполняем таблицу актуальными данными
-        for row, item in enumerate(self.pda_data, start=1):
-            name = item['name']
-            pda_value = item['amount']
+    def set_fda_values(self, fda_data, replace=False):
+        """Вписывает суммы FDA ({название строки: сумма}), например сохранённые в истории расчётов."""
+        self.table.set_values({name: format_amount(amount) for name, amount in fda_data.items()}, replace)
 
-            # Наименование
-            name_label = ttk.Label(self.table_frame, text=name)
-            name_label.grid(row=row, column=0, padx=5, pady=5, sticky='w')
+    def import_invoice_file(self):
+        """Заполняет поля FDA суммами из счёта поставщика."""
+        path = filedialog.askopenfilename(title="Импорт счёта",
+                                          filetypes=[("Счета", "*.csv *.xlsx *.xlsm *.txt"), ("Все файлы", "*.*")])
+        if not path:
+            return
+        fee_names = list(self.table.row_keys)
+        if self.jobs is not None:
+            self.jobs.submit(f"Импорт счёта {os.path.basename(path)}",
+                             lambda job: import_invoice(path, fee_names),
+                             on_success=self.apply_invoice, on_error=self.show_import_error)
+            return
+        try:
+            result = import_invoice(path, fee_names)
+        except Exception as e:
+            logger.exception(f"Ошибка импорта счёта {path}")
+            self.show_import_error(str(e))
+            return
+        self.apply_invoice(result)
 
-            # Значение из PDA (неизменяемое)
-            pda_label = ttk.Label(self.table_frame, text=format_amount(pda_value))
-            pda_label.grid(row=row, column=1, padx=5, pady=5)
+    def show_import_error(self, error):
+        messagebox.showerror("Ошибка", f"Не удалось импортировать счёт: {error}")
 
-            # Поле ввода для FDA
-            fda_entry = ttk.Entry(self.table_frame)
-            fda_entry.grid(row=row, column=2, padx=5, pady=5)
-            self.entries[name] = fda_entry
+    def apply_invoice(self, result):
+        """Вписывает суммы импорта (invoice_import.ImportResult) в поля FDA и показывает отчёт."""
+        self.set_fda_values({name: amount for name, amount in result.amounts.items() if name in self.table.pda_texts})
 
-    def update_pda_data(self, pda_data):
-        """Обновляет данные PDA и перезаполняет таблицу."""
-        self.pda_data = pda_data
-        logger.info(f"Updating FDA tab with PDA data: {self.pda_data}")
-        self.populate_table()
+        report = [f"Заполнено строк FDA: {len(result.amounts)} из {len(self.table.row_keys)}."]
+        empty = [name for name in self.table.row_keys if not self.table.value(name)]
+        if empty:
+            report.append(f"Без суммы в счёте: {', '.join(empty)}.")
+        if result.fuzzy:
+            report.append("Сопоставлено по похожему названию:")
+            report += [f"  {description} → {name}" for description, name in result.fuzzy.items()]
+        if result.unmatched:
+            report.append(f"Строки счёта без пары в PDA ({len(result.unmatched)}):")
+            report += [f"  стр. {line.line_no}: {line.description} — {format_amount(line.amount)}"
+                       for line in result.unmatched[:UNMATCHED_REPORT_LINES]]
+            if len(result.unmatched) > UNMATCHED_REPORT_LINES:
+                report.append(f"  ... и ещё {len(result.unmatched) - UNMATCHED_REPORT_LINES}")
+            for line in result.unmatched:
+                logger.info(f"Строка счёта без пары: {line.line_no}: {line.description} = {line.amount}")
+        if result.skipped:
+            report.append(f"Пропущено строк без суммы: {result.skipped}.")
+        messagebox.showinfo("Импорт счёта", "\n".join(report))
 
     def generate_fda(self):
         # Собираем данные из полей ввода
         fda_data = {}
-        for name, entry in self.entries.items():
-            value_str = entry.get().strip()
+        for name in self.table.row_keys:
+            value_str = self.table.value(name)
             if not value_str:
+                self.table.focus_key(name)
                 messagebox.showwarning("Внимание", f"Пожалуйста, заполните поле для {name}.")
                 return
             try:
                 value = parse_input(value_str)
                 fda_data[name] = value
             except ValueError:
+                self.table.focus_key(name)
                 messagebox.showerror("Ошибка", f"Неверный формат числа для {name}.")
                 return
 
@@ -106,34 +340,73 @@ class FDATab:
             messagebox.showerror("Ошибка", f"Шаблон FDA не найден по пути {FDA_TEMPLATE_PATH}.")
             return
 
-        # Загружаем шаблон
         try:
-            wb = openpyxl.load_workbook(FDA_TEMPLATE_PATH)
-            ws = wb.active
+            wb, missing = build_fda_workbook(fda_data)
         except Exception as e:
             logger.error(f"Ошибка при загрузке шаблона FDA: {e}")
             messagebox.showerror("Ошибка", f"Не удалось загрузить шаблон FDA: {e}")
             return
-
-        # Вставляем данные в шаблон
-        for row in ws.iter_rows():
-            for cell in row:
-                if cell.value and isinstance(cell.value, str):
-                    for name, value in fda_data.items():
-                        placeholder = f"{{{{{name}}}}}"
-                        if placeholder in cell.value:
-                            cell.value = cell.value.replace(placeholder, format_amount(value))
+        if missing:
+            messagebox.showwarning("Внимание", f"В шаблоне FDA нет полей для: {', '.join(missing)}")
 
         # Сохраняем файл
-        save_path = tk.filedialog.asksaveasfilename(defaultextension=".xlsx",
-                                                    filetypes=[("Excel files", "*.xlsx")],
-                                                    title="Сохранить FDA")
+        save_path = filedialog.asksaveasfilename(defaultextension=".xlsx",
+                                                 filetypes=[("Excel files", "*.xlsx")],
+                                                 title="Сохранить FDA")
         if not save_path:
             return
 
         try:
-            wb.save(save_path)
+            with span("fda.save"):
+                wb.save(save_path)
+            if self.on_fda_generated is not None:
+                self.on_fda_generated(fda_data)
             messagebox.showinfo("Успех", "FDA успешно сохранена.")
         except Exception as e:
             logger.error(f"Ошибка при сохранении FDA: {e}")
             messagebox.showerror("Ошибка", f"Не удалось сохранить FDA: {e}")
+
+
+def build_fda_workbook(fda_data, template_path=FDA_TEMPLATE_PATH):
+    """
+    Заполняет шаблон FDA суммами без участия интерфейса.
+
+    :param fda_data: {название строки: сумма FDA}.
+    :return: Кортеж (книга openpyxl, названия строк, для которых в шаблоне нет полей).
+    """
+    with span("fda.load_template"):
+        wb = load_template(template_path)
+
+    # Вставляем данные только в ячейки с плейсхолдерами из индекса шаблона
+    with span("fda.fill_template"):
+        index = load_template_index(template_path)
+        unknown, missing = report_placeholders(index, fda_data, os.path.basename(template_path))
+        # Общий шаблон содержит строки всех портов: поля строк, которых нет в этом расчёте, остаются пустыми
+        values = dict.fromkeys(index.placeholders, '')
+        values.update((name, format_amount(value)) for name, value in fda_data.items())
+        index.fill(wb.active, values)
+    return wb, missing
+
+
+def write_fda_template(path, names):
+    """
+    Создаёт шаблон FDA: по строке с плейсхолдером {{название}} на каждую строку PDA.
+    Так сделан поставляемый templates/fda_template.xlsx (названия строк всех тарифов).
+    """
+    import openpyxl
+    from openpyxl.styles import Font
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = 'FDA'
+    ws.append(["FINAL DISBURSEMENT ACCOUNT"])
+    ws['A1'].font = Font(bold=True, size=14)
+    ws.append([])
+    ws.append(["Наименование", "FDA"])
+    for cell in ws[3]:
+        cell.font = Font(bold=True)
+    for name in names:
+        ws.append([name, f"{{{{{name}}}}}"])
+    ws.column_dimensions['A'].width = 40
+    ws.column_dimensions['B'].width = 18
+    wb.save(path)
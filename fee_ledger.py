@@ -0,0 +1,236 @@
+# fee_ledger.py
+
+from array import array
+from collections import namedtuple
+from collections.abc import Sequence
+
+from money import to_minor, from_minor, vat_on, vat_included_in, format_minor
+
+# Коды категорий
+DUES = 0
+AGENCY_FEES = 1
+CATEGORY_NAMES = ('Dues', 'Agency Fees')
+
+# Как начисляется VAT
+VAT_NONE = 0
+VAT_ADDED = 1
+VAT_INCLUDED = 2
+VAT_MODES = {(False, False): VAT_NONE, (True, False): VAT_ADDED, (True, True): VAT_INCLUDED}
+
+# К какому овертайму относится строка
+NO_DIRECTION = 0
+DIRECTION_IN = 1
+DIRECTION_OUT = 2
+DIRECTIONS = {None: NO_DIRECTION, 'in': DIRECTION_IN, 'out': DIRECTION_OUT}
+
+# Строка ведомости, как её видят документы и интерфейс (суммы в валюте, из центов ведомости)
+FeeLine = namedtuple('FeeLine', ['name', 'category', 'vat_applicable', 'amount', 'vat_amount', 'total_amount'])
+
+
+def compute_fee(base_amount, overtime_percentage, vat_mode, vat_rate):
+    """
+    Рассчитывает строку тарифа в центах. Сумма строки округляется до цента,
+    VAT считается от уже округлённой суммы и тоже округляется; итого — их точная сумма.
+
+    :param base_amount: CV * коэффициент (и * мили для сборов с милями).
+    :return: Кортеж (сумма, VAT, итого) в центах.
+    """
+    amount = to_minor(base_amount * (1 + overtime_percentage))
+
+    if vat_mode == VAT_INCLUDED:
+        # VAT уже включен в коэффициент, поэтому не добавляем его к сумме
+        return amount, vat_included_in(amount, vat_rate), amount
+    if vat_mode == VAT_ADDED:
+        # VAT не включен в коэффициент, добавляем VAT к сумме
+        vat_amount = vat_on(amount, vat_rate)
+        return amount, vat_amount, amount + vat_amount
+    return amount, 0, amount
+
+
+class FeeLedger:
+    """
+    Ведомость сборов расчёта: параллельные массивы вместо объекта на каждую строку.
+
+    Суммы строк, подытоги по категориям и VAT хранятся в целых центах (money.py) и накапливаются
+    при добавлении строк. После freeze() ведомость не изменяется и может читаться из любых потоков.
+    """
+
+    __slots__ = ('vat_rate', 'names', 'categories', 'vat_modes', 'directions', 'bases',
+                 'amounts', 'vat_amounts', 'totals', 'subtotals', 'total_vat', 'frozen')
+
+    def __init__(self, vat_rate):
+        self.vat_rate = vat_rate
+        self.names = []
+        self.categories = array('b')
+        self.vat_modes = array('b')
+        self.directions = array('b')
+        self.bases = array('d')  # сумма до овертайма и VAT, для пересчёта по овертайму
+        self.amounts = array('q')  # центы
+        self.vat_amounts = array('q')
+        self.totals = array('q')
+        self.subtotals = [0, 0]  # по кодам категорий, центы
+        self.total_vat = 0
+        self.frozen = False
+
+    def _append(self, name, category, vat_mode, direction, base, amount, vat_amount, total):
+        if self.frozen:
+            raise RuntimeError("Ведомость сборов уже сформирована и не может изменяться")
+        self.names.append(name)
+        self.categories.append(category)
+        self.vat_modes.append(vat_mode)
+        self.directions.append(direction)
+        self.bases.append(base)
+        self.amounts.append(amount)
+        self.vat_amounts.append(vat_amount)
+        self.totals.append(total)
+        self.subtotals[category] += total
+        if vat_mode != VAT_NONE:
+            self.total_vat += vat_amount
+
+    def add_tariff_line(self, name, base_amount, vat_mode, direction, overtime_percentage):
+        """Строка тарифа порта (всегда Dues)."""
+        amount, vat_amount, total = compute_fee(base_amount, overtime_percentage, vat_mode, self.vat_rate)
+        self._append(name, DUES, vat_mode, direction, base_amount, amount, vat_amount, total)
+
+    def add_fixed_line(self, name, category, amount):
+        """Строка с суммой, введённой вручную: без VAT и овертайма."""
+        self._append(name, category, VAT_NONE, NO_DIRECTION, *self.fixed_line_values(amount))
+
+    def freeze(self):
+        self.frozen = True
+        self.names = tuple(self.names)
+        return self
+
+    def derive(self, lines, names=None):
+        """
+        Новая сформированная ведомость, в которой заменены только указанные строки.
+        Подытоги пересчитываются лишь для затронутых категорий (и VAT — если затронуты строки с VAT).
+
+        :param lines: {индекс: (сумма до овертайма, сумма, VAT, итого)} — значения tariff_line_values()
+            или fixed_line_values().
+        :param names: {индекс: новое название}.
+        """
+        ledger = FeeLedger(self.vat_rate)
+        ledger.names = list(self.names)
+        for index, name in (names or {}).items():
+            ledger.names[index] = name
+        ledger.names = tuple(ledger.names)
+        ledger.categories = self.categories
+        ledger.vat_modes = self.vat_modes
+        ledger.directions = self.directions
+        ledger.bases = array('d', self.bases)
+        ledger.amounts = array('q', self.amounts)
+        ledger.vat_amounts = array('q', self.vat_amounts)
+        ledger.totals = array('q', self.totals)
+        for index, (base, amount, vat_amount, total) in lines.items():
+            ledger.bases[index] = base
+            ledger.amounts[index] = amount
+            ledger.vat_amounts[index] = vat_amount
+            ledger.totals[index] = total
+
+        ledger.subtotals = list(self.subtotals)
+        for category in {self.categories[index] for index in lines}:
+            subtotal = 0
+            for index, code in enumerate(self.categories):
+                if code == category:
+                    subtotal += ledger.totals[index]
+            ledger.subtotals[category] = subtotal
+        ledger.total_vat = self.total_vat
+        if any(self.vat_modes[index] != VAT_NONE for index in lines):
+            total_vat = 0
+            for index, vat_mode in enumerate(self.vat_modes):
+                if vat_mode != VAT_NONE:
+                    total_vat += ledger.vat_amounts[index]
+            ledger.total_vat = total_vat
+        ledger.frozen = True
+        return ledger
+
+    def tariff_line_values(self, index, base_amount, overtime_percentage):
+        """Значения строки тарифа index для derive() с новой базой и овертаймом."""
+        amount, vat_amount, total = compute_fee(base_amount, overtime_percentage, self.vat_modes[index], self.vat_rate)
+        return base_amount, amount, vat_amount, total
+
+    @staticmethod
+    def fixed_line_values(amount):
+        """Значения строки с суммой из формы (в валюте) для derive()."""
+        minor = to_minor(amount)
+        return amount, minor, 0, minor
+
+    def __len__(self):
+        return len(self.names)
+
+    def line(self, index):
+        return FeeLine(
+            self.names[index],
+            CATEGORY_NAMES[self.categories[index]],
+            self.vat_modes[index] != VAT_NONE,
+            from_minor(self.amounts[index]),
+            from_minor(self.vat_amounts[index]),
+            from_minor(self.totals[index]),
+        )
+
+    def indexes(self, category=None):
+        if category is None:
+            return range(len(self.names))
+        return [index for index, code in enumerate(self.categories) if code == category]
+
+    def lines(self, category=None):
+        """Строки ведомости (все или одной категории) как представление без копирования."""
+        return LedgerView(self, self.indexes(category), self.line)
+
+    def display_rows(self, category=DUES):
+        """Кортежи (название, VAT, сумма) для таблицы результатов."""
+        return LedgerView(self, self.indexes(category), self.display_row)
+
+    def display_row(self, index):
+        vat_amount = self.vat_amounts[index]
+        vat_display = format_minor(vat_amount) if vat_amount > 0 else "-"
+        return self.names[index], vat_display, format_minor(self.totals[index])
+
+    def overtime_totals(self, overtime_pairs):
+        """
+        Подытоги Dues для набора сочетаний (овертайм in, овертайм out) за один проход по ведомости.
+        От овертайма зависят только строки с направлением, остальные берутся как есть.
+
+        :return: Список подытогов Dues в центах в порядке overtime_pairs.
+        """
+        pairs = list(overtime_pairs)
+        total_fees = [0] * len(pairs)
+        vat_rate = self.vat_rate
+        for index, category in enumerate(self.categories):
+            if category != DUES:
+                continue
+            direction = self.directions[index]
+            if direction == NO_DIRECTION:
+                total = self.totals[index]
+                for pair_index in range(len(pairs)):
+                    total_fees[pair_index] += total
+                continue
+            base_amount = self.bases[index]
+            vat_mode = self.vat_modes[index]
+            side = 0 if direction == DIRECTION_IN else 1
+            for pair_index, pair in enumerate(pairs):
+                total_fees[pair_index] += compute_fee(base_amount, pair[side], vat_mode, vat_rate)[2]
+        return total_fees
+
+
+class LedgerView(Sequence):
+    """Неизменяемое представление строк ведомости: элементы строятся при обращении."""
+
+    __slots__ = ('_ledger', '_indexes', '_build')
+
+    def __init__(self, ledger, indexes, build):
+        self._ledger = ledger
+        self._indexes = indexes
+        self._build = build
+
+    def __len__(self):
+        return len(self._indexes)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._build(index) for index in self._indexes[position]]
+        return self._build(self._indexes[position])
+
+    def __repr__(self):
+        return repr(list(self))
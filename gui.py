@@ -2,7 +2,6 @@
 
 import sys
 import os
-import tempfile
 import shutil
 import subprocess
 import logging
@@ -11,27 +10,35 @@ from tkinter import messagebox, filedialog, E, W, N, S
 
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from PIL import Image, ImageTk
-import openpyxl
-from openpyxl.utils import get_column_letter
-from openpyxl.cell.cell import Cell, MergedCell
-
-from calculations import FeeCalculator
-from constants import (
-    START_ROW_FEES,
-    START_ROW_AGENCY_FEES,
-    LOGO_PATH,
-    TEMPLATE_PATH,
-    LOGO_PATH,
-    TEMPLATE_PATH
-)
+
+from calculations import calculate_proforma, fee_calculator
+from constants import LOGO_PATH, DEFAULT_INPUTS, PDF_ENGINE, LIVE_RECALC_DELAY_MS
+from fee_ledger import DUES, AGENCY_FEES
+from document_jobs import DocumentJobQueue
+from tariff_registry import get_ports
 from utils import format_amount, parse_input, resource_path
+from money import format_minor
+from images import load_photo
+from document_cache import get_pdf
+from conversion_service import get_conversion_service
 from agency_fee import calculate_cv, show_agency_fee_table, get_agency_fee
 from fda_tab import FDATab
+from diagnostics_tab import DiagnosticsTab
+from history_tab import HistoryTab
+from case_store import get_case_store
+from perf import span
+from port_comparison import compare_ports
 
 logger = logging.getLogger(__name__)
 
 
+def agency_fee_labels(ledger):
+    """Тексты меток "Agency fee" и "Bank charges": суммы ведомости хранятся в центах."""
+    agency_fee_index, bank_charges_index = ledger.indexes(AGENCY_FEES)[:2]
+    return (f"Agency fee: {format_minor(ledger.totals[agency_fee_index])}",
+            f"Bank charges: {format_minor(ledger.totals[bank_charges_index])}")
+
+
 class ScrollableFrame(ttk.Frame):
     def __init__(self, container, *args, **kwargs):
         super().__init__(container, *args, **kwargs)
@@ -112,9 +119,20 @@ class ProformaApp:
         # Создаем стиль с выбранной темой
         self.style = ttk.Style(theme='cosmo')  # Вы можете выбрать другую тему
         self.pda_data = []  # Список fees и dues из PDA
+        self.recalc_after_id = None  # Отложенный живой пересчёт
+        self.case_id = None  # id последнего расчёта в хранилище (case_store.py)
+        # Документы формируются в рабочих потоках, окно при этом остаётся отзывчивым
+        self.jobs = DocumentJobQueue(self.root, on_update=self.update_job_row)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.converter = None
         self.create_widgets()
         self.last_pdf_path = None  # Для хранения пути к последнему сгенерированному PDF
         self.cv = 0  # Инициализируем cv
+        # Запускаем LibreOffice заранее, чтобы первое сохранение PDF не ждало его старта
+        if PDF_ENGINE == 'libreoffice':
+            self.converter = get_conversion_service()
+            if self.converter is not None:
+                self.converter.warm_up()
 
     def set_app_icon(self):
         if sys.platform.startswith('win'):
@@ -126,15 +144,14 @@ class ProformaApp:
         elif sys.platform.startswith('darwin'):
             try:
                 icon_path = resource_path(os.path.join('icons', 'app_icon.png'))
-                image = Image.open(icon_path)
-                photo = ImageTk.PhotoImage(image)
+                photo = load_photo(icon_path)
                 self.root.iconphoto(False, photo)
             except Exception as e:
                 logger.exception("Ошибка при установке иконки приложения: %s", e)
         else:
             icon_path = resource_path(os.path.join('icons', 'app_icon.png'))
             try:
-                photo = ImageTk.PhotoImage(file=icon_path)
+                photo = load_photo(icon_path)
                 self.root.iconphoto(False, photo)
             except Exception as e:
                 logger.exception("Ошибка при установке иконки приложения: %s", e)
@@ -149,17 +166,27 @@ class ProformaApp:
         self.input_frame = ttk.Frame(notebook)
         self.result_frame = ttk.Frame(notebook)
         self.fda_frame = ttk.Frame(notebook)  # Новая вкладка FDA
+        self.history_frame = ttk.Frame(notebook)
+        self.diagnostics_frame = ttk.Frame(notebook)
 
         notebook.add(self.input_frame, text='Ввод данных')
         notebook.add(self.result_frame, text='Результаты')
         notebook.add(self.fda_frame, text='FDA')  # Добавляем вкладку FDA
+        notebook.add(self.history_frame, text='История')
+        notebook.add(self.diagnostics_frame, text='Диагностика')
 
         # Вызов методов для создания виджетов
         self.create_input_widgets()
         self.create_result_widgets()
 
         # Создаем экземпляр вкладки FDA с пустыми данными
-        self.fda_tab = FDATab(self.fda_frame, self.pda_data)
+        self.fda_tab = FDATab(self.fda_frame, self.pda_data, on_fda_generated=self.save_fda_actuals,
+                              jobs=self.jobs)
+        # История расчётов: поиск и загрузка прошлых случаев в форму
+        self.history_tab = HistoryTab(self.history_frame, self.load_case, get_ports)
+        self.root.after_idle(self.history_tab.search)
+        # Замеры времени этапов (perf.py)
+        self.diagnostics_tab = DiagnosticsTab(self.diagnostics_frame, get_converter=lambda: self.converter)
 
     def create_input_widgets(self):
         # Создаем прокручиваемый фрейм
@@ -174,9 +201,7 @@ class ProformaApp:
         logo_frame.pack(pady=10)
 
         try:
-            logo_image = Image.open(LOGO_PATH)
-            logo_image = logo_image.resize((300, 300), Image.LANCZOS)
-            self.logo_photo = ImageTk.PhotoImage(logo_image)
+            self.logo_photo = load_photo(LOGO_PATH, (300, 300))
             logo_label = ttk.Label(logo_frame, image=self.logo_photo)
             logo_label.pack()
         except Exception as e:
@@ -240,12 +265,12 @@ class ProformaApp:
             label.pack(side=LEFT)
             if var_name in ['overtime_in', 'overtime_out']:
                 combobox = ttk.Combobox(frame, values=["0%", "25%", "50%", "100%"], state="readonly")
-                combobox.set("0%")
                 combobox.pack(side=LEFT, fill=X, expand=True)
                 self.entries[var_name] = combobox
             elif var_name == 'port':
-                combobox = ttk.Combobox(frame, values=["Chornomorsk", "Odesa", "Pivdenniy"], state="readonly")
-                combobox.set("Chornomorsk")
+                combobox = ttk.Combobox(frame, values=get_ports(), state="readonly")
+                # Список портов перечитывается при открытии: новый файл тарифа появляется без перезапуска
+                combobox.configure(postcommand=lambda box=combobox: box.configure(values=get_ports()))
                 combobox.pack(side=LEFT, fill=X, expand=True)
                 self.entries[var_name] = combobox
             else:
@@ -254,13 +279,15 @@ class ProformaApp:
                 self.entries[var_name] = entry
 
         # Значения по умолчанию
-        self.entries['miles_inward_in'].insert(0, "1")
-        self.entries['miles_inward_out'].insert(0, "1")
-        self.entries['miles_outward_in'].insert(0, "14")
-        self.entries['miles_outward_out'].insert(0, "14")
-        self.entries['agency_fee'].insert(0, "0")
-        self.entries['bank_charges'].insert(0, "190.00")
-        self.entries['vat'].insert(0, "20")
+        for var_name, value in DEFAULT_INPUTS.items():
+            if var_name in ['port', 'overtime_in', 'overtime_out']:
+                self.entries[var_name].set(value)
+            else:
+                self.entries[var_name].insert(0, value)
+
+        # Живой пересчёт при вводе
+        for widget in self.entries.values():
+            self.bind_live_recalculation(widget)
 
         # Кнопка расчета CV
         calculate_cv_button = ttk.Button(
@@ -274,9 +301,7 @@ class ProformaApp:
         # Кнопка расчета с иконкой
         # Загрузка иконки
         try:
-            calculate_icon = Image.open('icons/calculate_icon.png')
-            calculate_icon = calculate_icon.resize((24, 24), Image.LANCZOS)
-            calculate_icon_photo = ImageTk.PhotoImage(calculate_icon)
+            calculate_icon_photo = load_photo(resource_path(os.path.join('icons', 'calculate_icon.png')), (24, 24))
         except Exception as e:
             logger.exception("Необработанное исключение")
             print(f"Ошибка при загрузке иконки: {e}")
@@ -294,57 +319,123 @@ class ProformaApp:
             calculate_button.image = calculate_icon_photo  # Сохранение ссылки на изображение
         calculate_button.pack(pady=20)
 
+        # Состояние живого пересчёта (ошибки ввода показываются здесь, без всплывающих окон)
+        self.live_status_label = ttk.Label(container, text="", bootstyle='danger')
+        self.live_status_label.pack()
+
         # Фрейм для дополнительных Dues
-        dues_frame = ttk.Labelframe(container, text="Дополнительные Dues")
-        dues_frame.pack(fill=X, padx=10, pady=10)
+        self.dues_frame = ttk.Labelframe(container, text="Дополнительные Dues")
+        self.dues_frame.pack(fill=X, padx=10, pady=10)
 
         self.additional_dues = []
 
-        def add_additional_due():
-            due_frame = ttk.Frame(dues_frame)
-            due_frame.pack(fill=X, pady=2)
+        add_due_button = ttk.Button(self.dues_frame, text="Добавить Due", command=self.add_additional_due,
+                                    bootstyle='success')
+        add_due_button.pack(anchor='w', padx=5, pady=5)
 
-            due_name_entry = ttk.Entry(due_frame)
-            due_name_entry.pack(side=LEFT, padx=5, pady=5, fill=X, expand=True)
-            due_name_entry.insert(0, "Название Due")
+        # Фрейм для дополнительных Fees
+        self.fees_frame = ttk.Labelframe(container, text="Дополнительные Fees")
+        self.fees_frame.pack(fill=X, padx=10, pady=10)
 
-            due_amount_entry = ttk.Entry(due_frame, width=15)
-            due_amount_entry.pack(side=LEFT, padx=5, pady=5)
-            due_amount_entry.insert(0, "Сумма")
+        self.additional_fees = []
 
-            remove_button = ttk.Button(due_frame, text="Удалить", command=lambda: self.remove_additional_due(due_frame))
-            remove_button.pack(side=LEFT, padx=5, pady=5)
+        add_fee_button = ttk.Button(self.fees_frame, text="Добавить Fee", command=self.add_additional_fee,
+                                    bootstyle='success')
+        add_fee_button.pack(anchor='w', padx=5, pady=5)
 
-            self.additional_dues.append((due_name_entry, due_amount_entry))
+    def add_additional_due(self, name="Название Due", amount="Сумма"):
+        due_frame = ttk.Frame(self.dues_frame)
+        due_frame.pack(fill=X, pady=2)
 
-        add_due_button = ttk.Button(dues_frame, text="Добавить Due", command=add_additional_due, bootstyle='success')
-        add_due_button.pack(anchor='w', padx=5, pady=5)
+        due_name_entry = ttk.Entry(due_frame)
+        due_name_entry.pack(side=LEFT, padx=5, pady=5, fill=X, expand=True)
+        due_name_entry.insert(0, name)
 
-        # Фрейм для дополнительных Fees
-        fees_frame = ttk.Labelframe(container, text="Дополнительные Fees")
-        fees_frame.pack(fill=X, padx=10, pady=10)
+        due_amount_entry = ttk.Entry(due_frame, width=15)
+        due_amount_entry.pack(side=LEFT, padx=5, pady=5)
+        due_amount_entry.insert(0, amount)
 
-        self.additional_fees = []
+        remove_button = ttk.Button(due_frame, text="Удалить", command=lambda: self.remove_additional_due(due_frame))
+        remove_button.pack(side=LEFT, padx=5, pady=5)
 
-        def add_additional_fee():
-            fee_frame = ttk.Frame(fees_frame)
-            fee_frame.pack(fill=X, pady=2)
+        self.additional_dues.append((due_name_entry, due_amount_entry))
+        self.bind_live_recalculation(due_name_entry)
+        self.bind_live_recalculation(due_amount_entry)
+        self.schedule_recalculation()
 
-            fee_name_entry = ttk.Entry(fee_frame)
-            fee_name_entry.pack(side=LEFT, padx=5, pady=5, fill=X, expand=True)
-            fee_name_entry.insert(0, "Название Fee")
+    def add_additional_fee(self, name="Название Fee", amount="Сумма"):
+        fee_frame = ttk.Frame(self.fees_frame)
+        fee_frame.pack(fill=X, pady=2)
 
-            fee_amount_entry = ttk.Entry(fee_frame, width=15)
-            fee_amount_entry.pack(side=LEFT, padx=5, pady=5)
-            fee_amount_entry.insert(0, "Сумма")
+        fee_name_entry = ttk.Entry(fee_frame)
+        fee_name_entry.pack(side=LEFT, padx=5, pady=5, fill=X, expand=True)
+        fee_name_entry.insert(0, name)
 
-            remove_button = ttk.Button(fee_frame, text="Удалить", command=lambda: self.remove_additional_fee(fee_frame))
-            remove_button.pack(side=LEFT, padx=5, pady=5)
+        fee_amount_entry = ttk.Entry(fee_frame, width=15)
+        fee_amount_entry.pack(side=LEFT, padx=5, pady=5)
+        fee_amount_entry.insert(0, amount)
 
-            self.additional_fees.append((fee_name_entry, fee_amount_entry))
+        remove_button = ttk.Button(fee_frame, text="Удалить", command=lambda: self.remove_additional_fee(fee_frame))
+        remove_button.pack(side=LEFT, padx=5, pady=5)
 
-        add_fee_button = ttk.Button(fees_frame, text="Добавить Fee", command=add_additional_fee, bootstyle='success')
-        add_fee_button.pack(anchor='w', padx=5, pady=5)
+        self.additional_fees.append((fee_name_entry, fee_amount_entry))
+        self.bind_live_recalculation(fee_name_entry)
+        self.bind_live_recalculation(fee_amount_entry)
+        self.schedule_recalculation()
+
+    def set_input_values(self, inputs):
+        """Заполняет форму значениями inputs (в том же виде, что возвращает get_input_values)."""
+        for key, widget in self.entries.items():
+            value = str(inputs.get(key, ''))
+            if isinstance(widget, ttk.Combobox):
+                widget.set(value)
+            else:
+                widget.delete(0, tk.END)
+                widget.insert(0, value)
+
+        for name_entry, _ in self.additional_dues + self.additional_fees:
+            name_entry.master.destroy()
+        self.additional_dues = []
+        self.additional_fees = []
+        for line in inputs.get('additional_dues', []):
+            self.add_additional_due(line['name'], str(line['amount']))
+        for line in inputs.get('additional_fees', []):
+            self.add_additional_fee(line['name'], str(line['amount']))
+
+    def load_case(self, case_id):
+        """Загружает сохранённый случай в форму и пересчитывает его по текущему тарифу."""
+        try:
+            inputs = get_case_store().load_inputs(case_id)
+        except Exception as e:
+            logger.error(f"Не удалось загрузить расчёт {case_id}: {e}")
+            messagebox.showerror("Ошибка", f"Не удалось загрузить расчёт: {e}")
+            return
+        self.set_input_values(inputs)
+        self.calculate(record=False)
+        self.case_id = case_id
+        try:
+            self.fda_tab.set_fda_values(get_case_store().load_fda(case_id), replace=True)
+        except Exception as e:
+            logger.warning(f"Не удалось загрузить FDA расчёта {case_id}: {e}")
+
+    def save_fda_actuals(self, fda_data):
+        """
+        Сохраняет фактические суммы сформированной FDA к текущему расчёту.
+
+        Если расчёт на экране уже не совпадает с сохранённым случаем (поля изменены после расчёта
+        или случай из истории пересчитан по текущему тарифу), он сохраняется новым случаем:
+        суммы PDA в истории отклонений берутся из строк того случая, к которому записана FDA.
+        """
+        from fda_batch import record_actuals
+
+        try:
+            store = get_case_store()
+            if self.case_id is None or not store.matches(self.case_id, self.calculation):
+                self.case_id = store.add_case(self.calculation)
+                self.history_tab.search()
+            record_actuals(store, self.case_id, fda_data)
+        except Exception as e:
+            logger.exception(f"Не удалось сохранить FDA в историю: {e}")
 
     def calculate_cv_and_agency_fee(self):
         """Метод для расчёта CV и Agency Fee при нажатии кнопки."""
@@ -392,10 +483,12 @@ class ProformaApp:
     def remove_additional_due(self, due_frame):
         due_frame.destroy()
         self.additional_dues = [due for due in self.additional_dues if due[0].winfo_exists()]
+        self.schedule_recalculation()
 
     def remove_additional_fee(self, fee_frame):
         fee_frame.destroy()
         self.additional_fees = [fee for fee in self.additional_fees if fee[0].winfo_exists()]
+        self.schedule_recalculation()
 
     def create_result_widgets(self):
         # Информационные метки
@@ -426,6 +519,8 @@ class ProformaApp:
         table_frame.pack(fill=BOTH, expand=True, pady=10)
 
         columns = ("Fee", "VAT", "Amount")
+        self.fee_items = {}  # индекс строки ведомости -> строка таблицы
+        self.fixed_total_items = {}  # ключ итога -> строка таблицы итогов
         self.tree = ttk.Treeview(table_frame, columns=columns, show="headings")
         self.tree.heading("Fee", text="Наименование сбора")
         self.tree.heading("VAT", text="VAT")
@@ -452,6 +547,19 @@ class ProformaApp:
         self.total_label = ttk.Label(totals_frame, text="Total: ")
         self.total_label.pack(anchor='w')
 
+        # Сравнение всех портов: итоги бок о бок, пересчитываются вместе с расчётом
+        comparison_frame = ttk.Labelframe(self.result_frame, text="Сравнение портов")
+        comparison_frame.pack(fill=X, padx=10, pady=5)
+        comparison_controls = ttk.Frame(comparison_frame)
+        comparison_controls.pack(fill=X, padx=5, pady=2)
+        self.comparison_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(comparison_controls, text="Сравнить все порты", variable=self.comparison_var,
+                        command=self.update_comparison).pack(side=LEFT)
+        ttk.Button(comparison_controls, text="PDF сравнения", command=self.save_comparison_pdf,
+                   bootstyle='secondary').pack(side=RIGHT)
+        # Таблица показывается только в режиме сравнения
+        self.comparison_tree = ttk.Treeview(comparison_frame, show="headings")
+
         # Кнопки действий
         action_frame = ttk.Frame(self.result_frame)
         action_frame.pack(pady=10)
@@ -461,17 +569,11 @@ class ProformaApp:
         display_icon = None
 
         try:
-            save_image = Image.open('icons/save_icon.png')
-            save_image = save_image.resize((24, 24), Image.LANCZOS)
-            save_icon = ImageTk.PhotoImage(save_image)
+            save_icon = load_photo(resource_path(os.path.join('icons', 'save_icon.png')), (24, 24))
 
-            print_image = Image.open('icons/print_icon.png')
-            print_image = print_image.resize((24, 24), Image.LANCZOS)
-            print_icon = ImageTk.PhotoImage(print_image)
+            print_icon = load_photo(resource_path(os.path.join('icons', 'print_icon.png')), (24, 24))
 
-            display_image = Image.open('icons/display_icon.png')
-            display_image = display_image.resize((24, 24), Image.LANCZOS)
-            display_icon = ImageTk.PhotoImage(display_image)
+            display_icon = load_photo(resource_path(os.path.join('icons', 'display_icon.png')), (24, 24))
         except Exception as e:
             logger.exception("Необработанное исключение")
             print(f"Ошибка при загрузке иконок: {e}")
@@ -512,6 +614,24 @@ class ProformaApp:
             display_button.image = display_icon
         display_button.pack(side=LEFT, padx=5)
 
+        # Состояние заданий на формирование документов
+        jobs_frame = ttk.Labelframe(self.result_frame, text="Документы")
+        jobs_frame.pack(fill=X, padx=10, pady=5)
+
+        self.jobs_tree = ttk.Treeview(jobs_frame, columns=("Document", "Status"), show="headings", height=4)
+        self.jobs_tree.heading("Document", text="Документ")
+        self.jobs_tree.heading("Status", text="Состояние")
+        self.jobs_tree.column("Document", width=300, anchor="w")
+        self.jobs_tree.column("Status", width=300, anchor="w")
+        self.jobs_tree.pack(side='left', fill=X, expand=True, padx=5, pady=5)
+
+        jobs_buttons = ttk.Frame(jobs_frame)
+        jobs_buttons.pack(side='left', padx=5)
+        ttk.Button(jobs_buttons, text="Отменить", command=self.cancel_selected_jobs,
+                   bootstyle='danger').pack(fill=X, pady=2)
+        ttk.Button(jobs_buttons, text="Очистить", command=self.clear_finished_jobs,
+                   bootstyle='secondary').pack(fill=X, pady=2)
+
         # Создаём фрейм для итогов по фиксированным ставкам овертайма
         fixed_totals_frame = ttk.Frame(self.result_frame)
         fixed_totals_frame.pack(fill=BOTH, expand=True, pady=10)
@@ -541,11 +661,6 @@ class ProformaApp:
         inputs = {}
         for key, entry in self.entries.items():
             inputs[key] = entry.get()
-        return inputs
-
-    def calculate(self):
-        logger.info("Начало расчета")
-        inputs = self.get_input_values()
         # Собираем дополнительные Dues и Fees
         inputs['additional_dues'] = []
         for due_name_entry, due_amount_entry in self.additional_dues:
@@ -558,84 +673,181 @@ class ProformaApp:
             fee_name = fee_name_entry.get()
             fee_amount = fee_amount_entry.get()
             inputs['additional_fees'].append({'name': fee_name, 'amount': fee_amount})
+        return inputs
+
+    def bind_live_recalculation(self, widget):
+        if isinstance(widget, ttk.Combobox):
+            widget.bind("<<ComboboxSelected>>", self.schedule_recalculation, add='+')
+        else:
+            widget.bind("<KeyRelease>", self.schedule_recalculation, add='+')
+
+    def schedule_recalculation(self, event=None):
+        """Откладывает пересчёт до паузы во вводе: при быстром наборе считается только последнее значение."""
+        if self.recalc_after_id is not None:
+            self.root.after_cancel(self.recalc_after_id)
+        self.recalc_after_id = self.root.after(LIVE_RECALC_DELAY_MS, self.live_recalculate)
+
+    def live_recalculate(self):
+        self.recalc_after_id = None
+        if not hasattr(self, 'calculation'):
+            # До первого расчёта кнопкой живой пересчёт не показывает результатов
+            return
+        try:
+            with span("calc.live_recalculate"):
+                calculation, changed = fee_calculator.recalculate(self.calculation, self.get_input_values())
+        except Exception as e:
+            # Незаконченный ввод — не ошибка, результаты остаются от последнего корректного расчёта
+            self.live_status_label.config(text=f"Ошибка ввода: {e}")
+            return
+        self.live_status_label.config(text="")
+
+        self.calculation = calculation
+        self.update_results(changed)
+        # Пустое changed — суммы не изменились; иначе таблица FDA перерисует только изменившиеся строки
+        if changed is None or changed:
+            self.fda_tab.update_pda_data(calculation.get_fees_and_dues())
+        self.pda_data = calculation.get_fees_and_dues()
+
+    def calculate(self, record=True):
+        """:param record: Сохранять ли расчёт в историю (False — при загрузке случая из истории)."""
+        logger.info("Начало расчета")
+        if self.recalc_after_id is not None:
+            self.root.after_cancel(self.recalc_after_id)
+            self.recalc_after_id = None
+        inputs = self.get_input_values()
 
         try:
-            self.calculator = FeeCalculator(inputs)
-            self.calculator.calculate_fees()
-            self.calculator.calculate_totals()
-            # Вызов нового метода для расчёта фиксированных ставок овертайма
-            self.calculator.calculate_fixed_overtime_totals()
+            # Расчёт включает итоги по фиксированным ставкам овертайма
+            self.calculation = calculate_proforma(inputs)
             self.update_results()
+            self.live_status_label.config(text="")
             logger.info("Расчет успешно завершен")
         except Exception as e:
             logger.error(f"Ошибка при расчете: {e}")
             messagebox.showerror("Ошибка", str(e))
+            return
+
+        # Каждый расчёт кнопкой сохраняется в историю; ошибка хранилища не мешает работе с расчётом
+        if record:
+            try:
+                self.case_id = get_case_store().add_case(self.calculation)
+                self.history_tab.search()
+            except Exception as e:
+                self.case_id = None
+                logger.exception(f"Не удалось сохранить расчёт в историю: {e}")
 
         # После успешного расчёта сохраняем данные PDA
-        self.pda_data = self.calculator.get_fees_and_dues()
-        logger.info(f"PDA Data: {self.pda_data}")  # Добавляем логирование для проверки данных
+        self.pda_data = self.calculation.get_fees_and_dues()
+        logger.debug("PDA Data: %s", self.pda_data)  # Полный список строк — только при уровне DEBUG
         # Обновляем вкладку FDA с новыми данными
         if hasattr(self, 'fda_tab'):
             self.fda_tab.update_pda_data(self.pda_data)
             logger.info("FDA tab updated with new PDA data")
 
-    def update_results(self):
-        # Очистка предыдущих результатов
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+    @staticmethod
+    def set_label(label, text):
+        if label.cget('text') != text:
+            label.config(text=text)
 
-        # Обновление информационных меток
-        self.port_label.config(text=f"Port: {self.entries['port'].get()}")
-        self.vessel_name_label.config(text=f"Vessel name: {self.entries['vessel_name'].get()}")
-        self.vessel_flag_label.config(text=f"Vessel flag: {self.entries['vessel_flag'].get()}")
-        self.cargo_loaded_label.config(text=f"Cargo loaded: {self.entries['cargo_loaded'].get()}")
-        self.cargo_qtty_label.config(text=f"Quantity of cargo, mts: {self.entries['cargo_qtty'].get()}")
-        self.acc_name_label.config(text=f"Acc name: {self.entries['acc_name'].get()}")
+    @staticmethod
+    def set_row(tree, item_id, values):
+        if tuple(str(value) for value in tree.item(item_id, 'values')) != tuple(str(value) for value in values):
+            tree.item(item_id, values=values)
 
-        # Обновление меток "Agency fee" и "Bank charges"
-        try:
-            agency_fee_value = parse_input(self.entries['agency_fee'].get())
-            bank_charges_value = parse_input(self.entries['bank_charges'].get())
-            self.agency_fee_label.config(text=f"Agency fee: {format_amount(agency_fee_value)}")
-            self.bank_charges_label.config(text=f"Bank charges: {format_amount(bank_charges_value)}")
-        except ValueError as e:
-            messagebox.showerror("Ошибка ввода", str(e))
-            return
+    def update_results(self, changed=None):
+        """
+        Отображает self.calculation.
 
-        # Заполнение таблицы результатов (только Dues)
-        dues_data = self.calculator.get_fee_display_data()
-        for fee_data in dues_data:
-            if fee_data[0] not in ["Agency fee", "Bank charges"]:
-                self.tree.insert("", "end", values=fee_data)
+        :param changed: Индексы изменившихся строк ведомости: обновляются только их строки таблицы.
+            None — таблица строится заново.
+        """
+        calculation = self.calculation
+        inputs = calculation.inputs
+        ledger = calculation.ledger
 
-        # Добавление пустой строки для разделения
-        self.tree.insert("", "end", values=("", "", ""))
+        # Обновление информационных меток
+        self.set_label(self.port_label, f"Port: {inputs['port']}")
+        self.set_label(self.vessel_name_label, f"Vessel name: {inputs['vessel_name']}")
+        self.set_label(self.vessel_flag_label, f"Vessel flag: {inputs['vessel_flag']}")
+        self.set_label(self.cargo_loaded_label, f"Cargo loaded: {inputs['cargo_loaded']}")
+        self.set_label(self.cargo_qtty_label, f"Quantity of cargo, mts: {inputs['cargo_qtty']}")
+        self.set_label(self.acc_name_label, f"Acc name: {inputs['acc_name']}")
+
+        # Обновление меток "Agency fee" и "Bank charges"
+        agency_fee_text, bank_charges_text = agency_fee_labels(ledger)
+        self.set_label(self.agency_fee_label, agency_fee_text)
+        self.set_label(self.bank_charges_label, bank_charges_text)
+
+        if changed is None:
+            # Заполнение таблицы результатов (только Dues)
+            for item in self.tree.get_children():
+                self.tree.delete(item)
+            self.fee_items = {}  # индекс строки ведомости -> строка таблицы
+            for index in ledger.indexes(DUES):
+                self.fee_items[index] = self.tree.insert("", "end", values=ledger.display_row(index))
+
+            # Добавление пустой строки для разделения
+            self.tree.insert("", "end", values=("", "", ""))
+        else:
+            # Меняются только строки, которые затронул пересчёт
+            for index in changed:
+                if index in self.fee_items:
+                    self.set_row(self.tree, self.fee_items[index], ledger.display_row(index))
 
-        # Очистка предыдущих результатов в fixed_totals_tree
-        for item in self.fixed_totals_tree.get_children():
-            self.fixed_totals_tree.delete(item)
+        self.update_fixed_totals(rebuild=changed is None)
 
+        # Обновление итоговых сумм
+        self.set_label(self.subtotal_dues_label, f"Subtotal (Dues): {format_amount(calculation.subtotal_dues)}")
+        self.set_label(self.subtotal_agfee_label,
+                       f"Subtotal Agency Fees: {format_amount(calculation.subtotal_agency_fees)}")
+        self.set_label(self.total_label, f"Total: {format_amount(calculation.total_amount)}")
+
+        # Сравнение портов зависит от всех полей, кроме порта; без изменений — не пересчитывается
+        if changed != set():
+            self.update_comparison()
+
+    def fixed_totals_rows(self):
+        """Строки таблицы итогов по фиксированным ставкам: (ключ, описание, сумма); ключ None — разделитель."""
+        rows = []
         # Добавление итогов по фиксированным ставкам овертайма
-        for rate in sorted(self.calculator.fixed_totals.keys()):
-            totals = self.calculator.fixed_totals[rate]
+        for rate in sorted(self.calculation.fixed_totals.keys()):
+            totals = self.calculation.fixed_totals[rate]
             percentage = int(rate * 100)
-            self.fixed_totals_tree.insert("", "end", values=(
-                f"Total fee with {percentage}% overtime", format_amount(totals['total_fee'])))
-            self.fixed_totals_tree.insert("", "end", values=(
-                f"Total agency fee (Basis {percentage}% overtime)", format_amount(totals['total_agency_fee'])))
-            self.fixed_totals_tree.insert("", "end", values=(
-                f"Grand total basis {percentage}% overtime", format_amount(totals['grand_total'])))
+            rows.append(((rate, 'total_fee'), f"Total fee with {percentage}% overtime",
+                         format_amount(totals['total_fee'])))
+            rows.append(((rate, 'total_agency_fee'), f"Total agency fee (Basis {percentage}% overtime)",
+                         format_amount(totals['total_agency_fee'])))
+            rows.append(((rate, 'grand_total'), f"Grand total basis {percentage}% overtime",
+                         format_amount(totals['grand_total'])))
             # Добавляем пустую строку для разделения
-            self.fixed_totals_tree.insert("", "end", values=("", ""))
+            rows.append((None, "", ""))
+
+        # Сочетания с разным овертаймом на входе и выходе
+        for (rate_in, rate_out), totals in sorted(self.calculation.overtime_totals.items()):
+            if rate_in == rate_out:
+                continue
+            rows.append(((rate_in, rate_out), f"Grand total basis {int(rate_in * 100)}% in / {int(rate_out * 100)}% out overtime",
+                         format_amount(totals['grand_total'])))
+        return rows
+
+    def update_fixed_totals(self, rebuild):
+        rows = self.fixed_totals_rows()
+        if rebuild or set(key for key, _, _ in rows if key is not None) != set(self.fixed_total_items):
+            for item in self.fixed_totals_tree.get_children():
+                self.fixed_totals_tree.delete(item)
+            self.fixed_total_items = {}
+            for key, description, amount in rows:
+                item_id = self.fixed_totals_tree.insert("", "end", values=(description, amount))
+                if key is not None:
+                    self.fixed_total_items[key] = item_id
+            return
 
-        # Обновление итоговых сумм
-        self.subtotal_dues_label.config(text=f"Subtotal (Dues): {format_amount(self.calculator.subtotal_dues)}")
-        self.subtotal_agfee_label.config(
-            text=f"Subtotal Agency Fees: {format_amount(self.calculator.subtotal_agency_fees)}")
-        self.total_label.config(text=f"Total: {format_amount(self.calculator.total_amount)}")
+        for key, description, amount in rows:
+            if key is not None:
+                self.set_row(self.fixed_totals_tree, self.fixed_total_items[key], (description, amount))
 
     def save_pdf(self):
-        if not hasattr(self, 'calculator'):
+        if not hasattr(self, 'calculation'):
             messagebox.showwarning("Предупреждение", "Сначала выполните расчет.")
             return
 
@@ -644,214 +856,182 @@ class ProformaApp:
         if not file_path:
             return
 
-        try:
-            self.generate_pdf(file_path)
-            messagebox.showinfo("Успех", "Файл успешно сохранен.")
-        except Exception as e:
-            logger.exception("Необработанное исключение")
-            messagebox.showerror("Ошибка", f"Не удалось сохранить файл: {e}")
+        self.submit_pdf_job(
+            f"Сохранение {os.path.basename(file_path)}", lambda path: shutil.copyfile(path, file_path),
+            on_success=lambda path: messagebox.showinfo("Успех", "Файл успешно сохранен."),
+            on_error=lambda error: messagebox.showerror("Ошибка", f"Не удалось сохранить файл: {error}"),
+        )
 
-    def print_result(self):
-        if not hasattr(self, 'calculator'):
-            messagebox.showwarning("Предупреждение", "Сначала выполните расчет.")
+    COMPARISON_ROWS = (
+        ('subtotal_dues', "Subtotal (Dues)"),
+        ('subtotal_agency_fees', "Subtotal Agency Fees"),
+        ('total_vat', "VAT"),
+        ('total', "Total"),
+    )
+
+    def update_comparison(self):
+        """Таблица сравнения портов для текущего расчёта (если режим сравнения включён)."""
+        tree = self.comparison_tree
+        if not self.comparison_var.get() or not hasattr(self, 'calculation'):
+            tree.delete(*tree.get_children())
+            tree.pack_forget()
             return
-
         try:
-            tmp_dir = tempfile.gettempdir()
-            tmp_pdf_path = os.path.join(tmp_dir, next(tempfile._get_candidate_names()) + '.pdf')
-            self.generate_pdf(tmp_pdf_path)
-
-            if sys.platform.startswith('win'):
-                os.startfile(tmp_pdf_path, "print")
-            elif sys.platform.startswith('darwin') or sys.platform.startswith('linux'):
-                subprocess.run(['lp', tmp_pdf_path])
-            else:
-                messagebox.showwarning("Предупреждение",
-                                       "Неизвестная операционная система. Не удаётся отправить на печать автоматически.")
-                return
-
-            os.remove(tmp_pdf_path)
-            messagebox.showinfo("Успех", "Документ успешно отправлен на печать.")
+            comparison = compare_ports(self.calculation.inputs)
         except Exception as e:
-            logger.exception("Необработанное исключение")
-            messagebox.showerror("Ошибка", f"Не удалось напечатать файл: {e}")
-
-    def display_pdf(self):
-        if not hasattr(self, 'calculator'):
-            messagebox.showwarning("Предупреждение", "Сначала выполните расчет.")
+            logger.error(f"Ошибка сравнения портов: {e}")
+            tree.delete(*tree.get_children())
             return
 
-        try:
-            tmp_dir = tempfile.gettempdir()
-            tmp_pdf_path = os.path.join(tmp_dir, next(tempfile._get_candidate_names()) + '.pdf')
-            self.generate_pdf(tmp_pdf_path)
-
-            if sys.platform.startswith('darwin'):
-                subprocess.run(['open', tmp_pdf_path])
-            elif sys.platform.startswith('win'):
-                os.startfile(tmp_pdf_path)
-            elif sys.platform.startswith('linux'):
-                subprocess.run(['xdg-open', tmp_pdf_path])
+        columns = ('Description',) + comparison.ports
+        if tuple(tree['columns']) != columns:
+            tree.delete(*tree.get_children())
+            tree.configure(columns=columns)
+            tree.heading('Description', text="Итог")
+            tree.column('Description', width=260, anchor='w')
+            for port in comparison.ports:
+                tree.heading(port, text=port)
+                tree.column(port, width=130, anchor='e')
+
+        # Порты без сборов в тарифе показываются прочерком, а не нулевыми итогами
+        totals = [comparison.totals(port) for port in comparison.ports]
+        rows = [(key, label, [format_amount(total[key]) if total else "—" for total in totals])
+                for key, label in self.COMPARISON_ROWS]
+        rows += [(f"ot_{rate}", f"Grand total {rate:.0%} overtime",
+                  [format_amount(total['fixed_totals'][rate]) if total else "—" for total in totals])
+                 for rate in comparison.overtime_rates]
+        cheapest = comparison.cheapest_port()
+        rows.append(('cheapest', "Дешевле всего", ["✓" if port == cheapest else "" for port in comparison.ports]))
+        for key, label, values in rows:
+            if tree.exists(key):
+                self.set_row(tree, key, (label, *values))
             else:
-                messagebox.showwarning("Предупреждение",
-                                       "Неизвестная операционная система. Не удаётся открыть PDF автоматически.")
-                return
-
-            self.last_pdf_path = tmp_pdf_path
+                tree.insert("", "end", iid=key, values=(label, *values))
+        tree.configure(height=len(rows))
+        if not tree.winfo_manager():
+            tree.pack(fill=X, padx=5, pady=5)
 
-        except Exception as e:
-            logger.exception("Необработанное исключение")
-            messagebox.showerror("Ошибка", f"Не удалось открыть файл: {e}")
-
-    def generate_pdf(self, pdf_path):
-        logger.info(f"Начало генерации PDF по пути: {pdf_path}")
-        # Проверка наличия шаблона Excel
-        if not os.path.exists(TEMPLATE_PATH):
-            messagebox.showerror("Ошибка",
-                                 f"Шаблон Excel не найден. Убедитесь, что '{TEMPLATE_PATH}' находится в директории проекта.")
+    def save_comparison_pdf(self):
+        if not hasattr(self, 'calculation'):
+            messagebox.showwarning("Предупреждение", "Сначала выполните расчет.")
             return
-
-        # Загрузка шаблона Excel
-        try:
-            logger.debug("Загрузка шаблона Excel")
-            wb = openpyxl.load_workbook(TEMPLATE_PATH)
-            ws = wb.active
-        except Exception as e:
-            logger.error(f"Ошибка при загрузке шаблона Excel: {e}")
-            messagebox.showerror("Ошибка", f"Не удалось загрузить шаблон Excel: {e}")
+        file_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")],
+                                                 title="Сохранить сравнение портов")
+        if not file_path:
             return
+        inputs = self.calculation.inputs
+
+        def render(job):
+            from pdf_renderer import render_comparison_pdf
+            job.progress("Расчёт по всем портам", 10)
+            comparison = compare_ports(inputs)
+            job.progress("Формирование PDF", 50)
+            render_comparison_pdf(comparison, file_path)
+            return file_path
+
+        self.jobs.submit(
+            "Сравнение портов", render,
+            on_success=lambda path: messagebox.showinfo("Успех", f"Сравнение портов сохранено: {path}"),
+            on_error=lambda error: messagebox.showerror("Ошибка", f"Не удалось сохранить сравнение: {error}"),
+        )
 
-        # Подготовка данных для замены
-        replacements = {
-            '{{cv}}': format_amount(self.calculator.cv),
-            '{{port}}': self.entries['port'].get(),
-            '{{vessel_name}}': self.entries['vessel_name'].get(),
-            '{{vessel_flag}}': self.entries['vessel_flag'].get(),
-            '{{cargo_loaded}}': self.entries['cargo_loaded'].get(),
-            '{{cargo_qtty}}': self.entries['cargo_qtty'].get(),
-            '{{lbp}}': format_amount(parse_input(self.entries['lbp'].get())),
-            '{{beam}}': format_amount(parse_input(self.entries['beam'].get())),
-            '{{rdm}}': format_amount(parse_input(self.entries['rdm'].get())),
-            '{{Account_name}}': self.entries['acc_name'].get(),
-            '{{subtotal_dues}}': format_amount(self.calculator.subtotal_dues),
-            '{{subtotal_agfee}}': format_amount(self.calculator.subtotal_agency_fees),
-            '{{total}}': format_amount(self.calculator.total_amount),
-            '{{total_vat}}': format_amount(self.calculator.total_vat),
-            # Добавление Agency fee и Bank charges
-            '{{agency_fee}}': format_amount(parse_input(self.entries['agency_fee'].get())),
-            '{{bank_charges}}': format_amount(parse_input(self.entries['bank_charges'].get())),
-            # Добавление новых плейсхолдеров для фиксированных ставок овертайма
-            '{{total_fee_25_ot}}': format_amount(self.calculator.fixed_totals[0.25]['total_fee']),
-            '{{total_agency_fee_25_ot}}': format_amount(self.calculator.fixed_totals[0.25]['total_agency_fee']),
-            '{{grand_total_25_ot}}': format_amount(self.calculator.fixed_totals[0.25]['grand_total']),
-            '{{total_fee_50_ot}}': format_amount(self.calculator.fixed_totals[0.50]['total_fee']),
-            '{{total_agency_fee_50_ot}}': format_amount(self.calculator.fixed_totals[0.50]['total_agency_fee']),
-            '{{grand_total_50_ot}}': format_amount(self.calculator.fixed_totals[0.50]['grand_total']),
-            '{{total_fee_100_ot}}': format_amount(self.calculator.fixed_totals[1.00]['total_fee']),
-            '{{total_agency_fee_100_ot}}': format_amount(self.calculator.fixed_totals[1.00]['total_agency_fee']),
-            '{{grand_total_100_ot}}': format_amount(self.calculator.fixed_totals[1.00]['grand_total']),
-        }
-
-        # Замена плейсхолдеров в шаблоне
-        for row in ws.iter_rows():
-            for cell in row:
-                if cell.value and isinstance(cell.value, str):
-                    for key, value in replacements.items():
-                        if key in cell.value:
-                            cell.value = cell.value.replace(key, value)
-
-        # Добавление таблицы сборов
-        start_row = START_ROW_FEES  # Начальная строка для вывода сборов
-        current_row = start_row
-
-        # Заполнение таблицы сборов (только Dues)
-        for fee in self.calculator.fees:
-            if fee.name not in ["Agency fee", "Bank charges"]:
-                ws.cell(row=current_row, column=1).value = fee.name
-                ws.cell(row=current_row, column=5).value = format_amount(fee.vat_amount) if fee.vat_amount > 0 else "-"
-                ws.cell(row=current_row, column=7).value = format_amount(fee.total_amount)
-                current_row += 1
-
-        # Устанавливаем фиксированную строку для Agency fee и Bank charges
-        agency_start_row = START_ROW_AGENCY_FEES  # Укажите нужный номер строки
-        ws.cell(row=agency_start_row, column=1).value = "Agency fee"
-        ws.cell(row=agency_start_row, column=7).value = format_amount(parse_input(self.entries['agency_fee'].get()))
-        agency_start_row += 1
-
-        ws.cell(row=agency_start_row, column=1).value = "Bank charges"
-        ws.cell(row=agency_start_row, column=7).value = format_amount(parse_input(self.entries['bank_charges'].get()))
-        agency_start_row += 1
-
-        # Добавление дополнительных Fees после Agency fee и Bank charges
-        for fee in self.calculator.additional_fees:
-            ws.cell(row=agency_start_row, column=1).value = fee['name']
-            ws.cell(row=agency_start_row, column=7).value = format_amount(fee['amount'])
-            agency_start_row += 1
-
-        # Сохранение заполненного Excel во временный файл
-        tmp_dir = tempfile.gettempdir()
-        tmp_name = next(tempfile._get_candidate_names()) + '.xlsx'
-        tmp_path = os.path.join(tmp_dir, tmp_name)
-        wb.save(tmp_path)
-
-        # Конвертация Excel в PDF
-        soffice_path = self.get_soffice_path()
-        if not soffice_path:
+    def print_result(self):
+        if not hasattr(self, 'calculation'):
+            messagebox.showwarning("Предупреждение", "Сначала выполните расчет.")
             return
 
-        conversion_command = [
-            soffice_path,
-            '--headless',
-            '--convert-to',
-            'pdf',
-            '--outdir',
-            tmp_dir,
-            tmp_path
-        ]
+        self.submit_pdf_job(
+            "Печать", send_to_printer,
+            on_success=lambda path: messagebox.showinfo("Успех", "Документ успешно отправлен на печать."),
+            on_error=lambda error: messagebox.showerror("Ошибка", f"Не удалось напечатать файл: {error}"),
+        )
 
-        conversion_result = subprocess.run(conversion_command, capture_output=True, text=True)
-        if conversion_result.returncode != 0:
-            messagebox.showerror("Ошибка", f"Ошибка при конвертации Excel в PDF:\n{conversion_result.stderr}")
+    def display_pdf(self):
+        if not hasattr(self, 'calculation'):
+            messagebox.showwarning("Предупреждение", "Сначала выполните расчет.")
             return
 
-        # Получение пути к сгенерированному PDF
-        base_name = os.path.splitext(tmp_name)[0]
-        pdf_tmp_name = base_name + '.pdf'
-        pdf_tmp_path = os.path.join(tmp_dir, pdf_tmp_name)
+        def on_success(path):
+            self.last_pdf_path = path
 
-        if not os.path.exists(pdf_tmp_path):
-            messagebox.showerror("Ошибка", "Сгенерированный PDF-файл не найден.")
-            return
+        self.submit_pdf_job(
+            "Просмотр", open_in_viewer,
+            on_success=on_success,
+            on_error=lambda error: messagebox.showerror("Ошибка", f"Не удалось открыть файл: {error}"),
+        )
 
-        shutil.copy(pdf_tmp_path, pdf_path)
-
-        # Удаление временных файлов
-        os.remove(tmp_path)
-        os.remove(pdf_tmp_path)
-
-    def get_soffice_path(self):
-        soffice_path = ""
-        if sys.platform.startswith('darwin'):
-            soffice_path = "/Applications/LibreOffice.app/Contents/MacOS/soffice"
-        elif sys.platform.startswith('win'):
-            soffice_path = os.path.join(os.environ.get("PROGRAMFILES", "C:\\Program Files"), "LibreOffice", "program",
-                                        "soffice.exe")
-            if not os.path.exists(soffice_path):
-                soffice_path = os.path.join(os.environ.get("PROGRAMFILES(X86)", "C:\\Program Files (x86)"),
-                                            "LibreOffice", "program", "soffice.exe")
-        elif sys.platform.startswith('linux'):
-            soffice_path = "/usr/bin/soffice"
+    def submit_pdf_job(self, title, action, on_success, on_error):
+        """
+        Ставит получение PDF в очередь рабочих потоков.
+        Расчёт фиксируется сейчас: новый расчёт во время формирования не меняет уже поставленный документ.
+        """
+        calculation = self.calculation
+        vessel_name = calculation.inputs.get('vessel_name')
+        if vessel_name:
+            title = f"{title} ({vessel_name})"
+        self.jobs.submit(title, self.generate_pdf, calculation, action,
+                         on_success=on_success, on_error=on_error)
+
+    def generate_pdf(self, job, calculation, action):
+        """
+        Выполняется в рабочем потоке: обращаться к виджетам Tk здесь нельзя.
+        PDF берётся из кэша документов (document_cache.py) и формируется, только если его там нет,
+        поэтому просмотр, печать и сохранение одного расчёта формируют документ один раз.
+        """
+        with span("pdf.total"):
+            pdf_path = get_pdf(calculation, converter=self.converter, progress=job.progress)
+        job.progress("Открытие документа", 95)
+        with span("pdf.open"):
+            action(pdf_path)
+        return pdf_path
+
+    def update_job_row(self, job):
+        item_id = str(job.id)
+        values = (job.title, job.describe())
+        if self.jobs_tree.exists(item_id):
+            self.jobs_tree.item(item_id, values=values)
         else:
-            messagebox.showerror("Ошибка",
-                                 "Неизвестная операционная система. Необходимо вручную указать путь к 'soffice'.")
-            return None
-
-        if not os.path.exists(soffice_path):
-            messagebox.showerror("Ошибка", f"Не удалось найти soffice по пути: {soffice_path}")
-            return None
-
-        return soffice_path
+            self.jobs_tree.insert("", "end", iid=item_id, values=values)
+            self.jobs_tree.see(item_id)
 
+    def cancel_selected_jobs(self):
+        selection = self.jobs_tree.selection()
+        if not selection:
+            messagebox.showwarning("Предупреждение", "Выберите документ в списке.")
+            return
+        for item_id in selection:
+            self.jobs.cancel(int(item_id))
+
+    def clear_finished_jobs(self):
+        self.jobs.clear_finished()
+        for item_id in self.jobs_tree.get_children():
+            if int(item_id) not in self.jobs.jobs:
+                self.jobs_tree.delete(item_id)
+
+    def on_close(self):
+        self.jobs.shutdown()
+        self.root.destroy()
+
+
+def send_to_printer(pdf_path):
+    # Файл из кэша документов не удаляется после печати: он нужен для повторной печати и просмотра
+    if sys.platform.startswith('win'):
+        os.startfile(pdf_path, "print")
+    elif sys.platform.startswith('darwin') or sys.platform.startswith('linux'):
+        subprocess.run(['lp', pdf_path], check=True)
+    else:
+        raise RuntimeError("Неизвестная операционная система. Не удаётся отправить на печать автоматически.")
+
+
+def open_in_viewer(pdf_path):
+    if sys.platform.startswith('darwin'):
+        subprocess.run(['open', pdf_path])
+    elif sys.platform.startswith('win'):
+        os.startfile(pdf_path)
+    elif sys.platform.startswith('linux'):
+        subprocess.run(['xdg-open', pdf_path])
+    else:
+        raise RuntimeError("Неизвестная операционная система. Не удаётся открыть PDF автоматически.")
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,188 @@
+# history_tab.py
+
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+import sqlite3
+import logging
+
+from case_store import get_case_store, DEFAULT_PAGE_SIZE
+from variance_history import get_variance_history, write_report_csv, GROUPINGS
+from utils import format_amount
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryTab:
+    """Вкладка истории расчётов: поиск по судну, порту, клиенту и датам, постранично; загрузка случая в форму."""
+
+    COLUMNS = (
+        ('created_at', "Дата", 150, 'w'),
+        ('vessel_name', "Судно", 200, 'w'),
+        ('port', "Порт", 120, 'w'),
+        ('account_name', "Клиент", 180, 'w'),
+        ('cv', "CV", 80, 'e'),
+        ('total', "Итого", 120, 'e'),
+    )
+
+    def __init__(self, parent, on_load_case, get_ports):
+        """
+        :param on_load_case: Вызывается с id случая, который нужно загрузить в форму.
+        :param get_ports: Функция, возвращающая список портов для фильтра.
+        """
+        self.parent = parent
+        self.on_load_case = on_load_case
+        self.get_ports = get_ports
+        self.last_row = None  # (created_at, id) последней показанной строки — начало следующей страницы
+        self.create_widgets()
+
+    def create_widgets(self):
+        self.frame = ttk.Frame(self.parent)
+        self.frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        title_label = ttk.Label(self.frame, text="История расчётов", font=('Helvetica', 16, 'bold'))
+        title_label.pack(pady=10)
+
+        filters = ttk.Frame(self.frame)
+        filters.pack(fill=tk.X, pady=5)
+        self.filter_entries = {}
+        for column, (label_text, key) in enumerate([("Судно:", 'vessel'), ("Клиент:", 'account'),
+                                                     ("С (ГГГГ-ММ-ДД):", 'date_from'), ("По:", 'date_to')]):
+            ttk.Label(filters, text=label_text).grid(row=0, column=column * 2, padx=5, sticky='e')
+            entry = ttk.Entry(filters, width=18)
+            entry.grid(row=0, column=column * 2 + 1, padx=5)
+            entry.bind("<Return>", lambda event: self.search())
+            self.filter_entries[key] = entry
+        ttk.Label(filters, text="Порт:").grid(row=1, column=0, padx=5, pady=5, sticky='e')
+        self.port_filter = ttk.Combobox(filters, values=[''] + list(self.get_ports()), state="readonly", width=16)
+        self.port_filter.configure(postcommand=lambda: self.port_filter.configure(values=[''] + list(self.get_ports())))
+        self.port_filter.grid(row=1, column=1, padx=5, pady=5)
+        ttk.Button(filters, text="Найти", command=self.search).grid(row=1, column=3, padx=5, pady=5)
+
+        self.tree = ttk.Treeview(self.frame, columns=[column[0] for column in self.COLUMNS],
+                                 show='headings', height=18)
+        for key, heading, width, anchor in self.COLUMNS:
+            self.tree.heading(key, text=heading)
+            self.tree.column(key, width=width, anchor=anchor)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+        self.tree.bind("<Double-1>", lambda event: self.load_selected())
+
+        buttons = ttk.Frame(self.frame)
+        buttons.pack(fill=tk.X, pady=5)
+        ttk.Button(buttons, text="Загрузить в форму", command=self.load_selected).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Отклонения PDA/FDA", command=lambda: VarianceReportWindow(self.frame)).pack(
+            side=tk.LEFT, padx=5)
+        self.more_button = ttk.Button(buttons, text="Показать ещё", command=self.load_more, state=tk.DISABLED)
+        self.more_button.pack(side=tk.RIGHT, padx=5)
+
+    def filters(self):
+        values = {key: entry.get().strip() or None for key, entry in self.filter_entries.items()}
+        values['port'] = self.port_filter.get() or None
+        return values
+
+    def search(self):
+        """Новый поиск: первая страница."""
+        for item_id in self.tree.get_children():
+            self.tree.delete(item_id)
+        self.last_row = None
+        self.load_more()
+
+    def load_more(self):
+        """Следующая страница результатов текущего поиска."""
+        try:
+            rows = get_case_store().search(**self.filters(), after=self.last_row, limit=DEFAULT_PAGE_SIZE)
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка поиска в истории расчётов: {e}")
+            messagebox.showerror("Ошибка", f"Не удалось выполнить поиск: {e}")
+            return
+        for row in rows:
+            self.tree.insert("", "end", iid=str(row.id), values=(
+                row.created_at.replace('T', ' '), row.vessel_name, row.port, row.account_name,
+                row.cv, format_amount(row.total)))
+        if rows:
+            self.last_row = (rows[-1].created_at, rows[-1].id)
+        self.more_button.config(state=tk.NORMAL if len(rows) == DEFAULT_PAGE_SIZE else tk.DISABLED)
+
+    def load_selected(self):
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("Предупреждение", "Выберите расчёт в списке.")
+            return
+        self.on_load_case(int(selection[0]))
+
+
+class VarianceReportWindow:
+    """Окно отчёта об отклонениях фактических сумм (FDA) от оценки (PDA) по портам и сборам."""
+
+    GROUP_LABELS = {'port': "По портам", 'fee': "По сборам", 'port,fee': "По портам и сборам"}
+    COLUMNS = (
+        ('lines', "Строк", 70),
+        ('pda', "PDA", 120),
+        ('fda', "FDA", 120),
+        ('variance', "Отклонение", 110),
+        ('bias_percent', "Смещение, %", 90),
+        ('mean_abs_variance', "Ср. |откл.|", 100),
+        ('p5_percent', "P5, %", 70),
+        ('p50_percent', "P50, %", 70),
+        ('p95_percent', "P95, %", 70),
+    )
+
+    def __init__(self, parent):
+        self.window = tk.Toplevel(parent)
+        self.window.title("Отклонения FDA от PDA")
+        self.rows = []
+
+        controls = ttk.Frame(self.window)
+        controls.pack(fill=tk.X, padx=10, pady=5)
+        self.grouping = ttk.Combobox(controls, values=[self.GROUP_LABELS[key] for key in GROUPINGS],
+                                     state="readonly", width=22)
+        self.grouping.set(self.GROUP_LABELS['port'])
+        self.grouping.bind("<<ComboboxSelected>>", lambda event: self.refresh())
+        self.grouping.pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="Обновить", command=self.refresh).pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="Экспорт CSV", command=self.export).pack(side=tk.RIGHT, padx=5)
+
+        self.tree = ttk.Treeview(self.window, columns=['group'] + [column[0] for column in self.COLUMNS],
+                                 show='headings', height=20)
+        self.tree.heading('group', text="Группа")
+        self.tree.column('group', width=260, anchor='w')
+        for key, heading, width in self.COLUMNS:
+            self.tree.heading(key, text=heading)
+            self.tree.column(key, width=width, anchor='e')
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.refresh()
+
+    def selected_grouping(self):
+        label = self.grouping.get()
+        return next(key for key, text in self.GROUP_LABELS.items() if text == label)
+
+    def refresh(self):
+        by = self.selected_grouping()
+        try:
+            self.rows = get_variance_history().report(by)
+        except (OSError, ValueError) as e:
+            logger.error(f"Ошибка построения отчёта об отклонениях: {e}")
+            messagebox.showerror("Ошибка", f"Не удалось построить отчёт: {e}", parent=self.window)
+            return
+        for item_id in self.tree.get_children():
+            self.tree.delete(item_id)
+        for row in self.rows:
+            values = [' / '.join(row[key] for key in GROUPINGS[by])]
+            for key, _, _ in self.COLUMNS:
+                value = row[key]
+                if key == 'lines':
+                    values.append(value)
+                elif key.endswith('_percent'):
+                    values.append('-' if value != value else f"{value:.2f}")
+                else:
+                    values.append(format_amount(value))
+            self.tree.insert("", "end", values=values)
+
+    def export(self):
+        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV", "*.csv")],
+                                            parent=self.window)
+        if not path:
+            return
+        try:
+            write_report_csv(self.rows, self.selected_grouping(), path)
+        except OSError as e:
+            messagebox.showerror("Ошибка", f"Не удалось сохранить отчёт: {e}", parent=self.window)
@@ -0,0 +1,42 @@
+# images.py
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Плагины PIL для форматов, которые поставляются с приложением (icons/*.png, icons/*.icns).
+# Image.open сначала пробует уже зарегистрированные форматы, поэтому для своих файлов не нужен
+# импорт всех плагинов PIL (Image.init); остальные форматы по-прежнему доступны — openpyxl читает
+# ими картинки шаблонов.
+SHIPPED_IMAGE_PLUGINS = ('PngImagePlugin', 'IcnsImagePlugin')
+
+
+def pil_image():
+    """Модуль PIL.Image с зарегистрированными плагинами поставляемых форматов (импортируется при первом обращении)."""
+    import importlib
+    from PIL import Image
+
+    # preinit() регистрирует частые форматы (BMP, GIF, JPEG, PPM, PNG), глобальное состояние PIL не меняется
+    Image.preinit()
+    for plugin in SHIPPED_IMAGE_PLUGINS:
+        importlib.import_module(f"PIL.{plugin}")
+    return Image
+
+
+def load_photo(path, size=None):
+    """
+    Загружает изображение для Tk. PNG без масштабирования читается самим Tk, без PIL;
+    для масштабирования и других форматов PIL подключается при первом вызове.
+
+    :param size: (ширина, высота) или None — исходный размер.
+    """
+    if size is None and path.lower().endswith('.png'):
+        import tkinter as tk
+        return tk.PhotoImage(file=path)
+
+    from PIL import ImageTk
+
+    image = pil_image().open(path)
+    if size is not None:
+        image = image.resize(size, pil_image().LANCZOS)
+    return ImageTk.PhotoImage(image)
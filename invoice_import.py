@@ -0,0 +1,233 @@
+# invoice_import.py
+"""
+Импорт фактических сумм FDA из счетов поставщиков (CSV и XLSX).
+
+Файлы читаются потоково (CSV построчно, XLSX — openpyxl в режиме read_only), строки счёта сопоставляются
+с названиями строк PDA по нормализованному названию, а если точного совпадения нет — по вхождению слов
+одного названия в другое и затем по ближайшему (difflib). Несколько строк счёта с одним сбором суммируются.
+"""
+
+import os
+import re
+import csv
+import difflib
+import logging
+from collections import namedtuple
+
+from utils import parse_input
+from perf import span
+
+logger = logging.getLogger(__name__)
+
+# Минимальное сходство названий для нечёткого сопоставления (0..1)
+FUZZY_CUTOFF = 0.8
+CSV_SNIFF_BYTES = 64 * 1024
+
+# Заголовки колонок счёта (после normalize_fee_name)
+DESCRIPTION_HEADERS = ('description', 'name', 'item', 'service', 'fee', 'наименование', 'описание', 'услуга', 'сбор')
+AMOUNT_HEADERS = ('amount', 'total', 'sum', 'value', 'сумма', 'итого', 'стоимость')
+
+# Строка счёта: номер строки файла, описание, сумма (None, если суммы нет)
+InvoiceLine = namedtuple('InvoiceLine', ['line_no', 'description', 'amount'])
+# Результат импорта: {строка PDA: сумма}, {описание в счёте: строка PDA} для нечётких совпадений,
+# строки счёта без пары (InvoiceLine), число строк без суммы
+ImportResult = namedtuple('ImportResult', ['amounts', 'fuzzy', 'unmatched', 'skipped'])
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize_fee_name(text):
+    """Название для сопоставления: без регистра, знаков препинания и лишних пробелов."""
+    return ' '.join(_NON_WORD.sub(' ', str(text)).split()).casefold()
+
+
+def parse_invoice_amount(value):
+    """
+    Сумма из ячейки счёта: число или текст в любом из форматов "1 234,56", "1,234.56", "1.234,56".
+
+    :raises ValueError: Если значение не является суммой.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    text = str(value).replace('\xa0', '').replace(' ', '').strip()
+    if ',' in text and '.' in text:
+        # Десятичный разделитель — последний из двух, другой разделяет тысячи
+        thousands = ',' if text.rfind('.') > text.rfind(',') else '.'
+        text = text.replace(thousands, '')
+    return parse_input(text)
+
+
+class FeeNameIndex:
+    """
+    Индекс названий строк PDA: точный поиск по нормализованному названию, затем по вхождению слов,
+    затем нечёткий (difflib).
+    """
+
+    def __init__(self, names, cutoff=FUZZY_CUTOFF):
+        self.cutoff = cutoff
+        self._exact = {}
+        for name in names:
+            self._exact.setdefault(normalize_fee_name(name), name)
+        self._keys = list(self._exact)
+        self._tokens = {key: frozenset(key.split()) for key in self._keys}
+        self._fuzzy_cache = {}
+
+    def _contained(self, key):
+        """
+        Сопоставление по словам: название строки PDA целиком входит в описание ("Mooring in 25% OT" ->
+        "Mooring in"; из нескольких — самое длинное) или описание — в название ("Tonnage dues" ->
+        "Tonnage dues (In/out)"). Неоднозначное вхождение ("Tugs" -> "Tugs in"/"Tugs out") не сопоставляется.
+        """
+        tokens = frozenset(key.split())
+        for candidates in (
+            [candidate for candidate in self._keys if self._tokens[candidate] <= tokens],
+            [candidate for candidate in self._keys if tokens <= self._tokens[candidate]],
+        ):
+            if not candidates:
+                continue
+            longest = max(len(self._tokens[candidate]) for candidate in candidates)
+            best = [candidate for candidate in candidates if len(self._tokens[candidate]) == longest]
+            return best[0] if len(best) == 1 else None
+        return None
+
+    def match(self, description):
+        """
+        :return: Пара (название строки PDA или None, признак нечёткого совпадения).
+        """
+        key = normalize_fee_name(description)
+        name = self._exact.get(key)
+        if name is not None:
+            return name, False
+        if not key:
+            return None, False
+        # В счетах одни и те же описания повторяются: результат неточного поиска запоминается
+        if key not in self._fuzzy_cache:
+            match = self._contained(key)
+            if match is None:
+                close = difflib.get_close_matches(key, self._keys, n=1, cutoff=self.cutoff)
+                match = close[0] if close else None
+            self._fuzzy_cache[key] = self._exact[match] if match is not None else None
+        name = self._fuzzy_cache[key]
+        return name, name is not None
+
+
+def _find_columns(row):
+    """Номера колонок описания и суммы по строке заголовков или None, если это не заголовок."""
+    description = amount = None
+    for column, value in enumerate(row):
+        key = normalize_fee_name(value) if value is not None else ''
+        if description is None and any(header in key.split() for header in DESCRIPTION_HEADERS):
+            description = column
+        elif amount is None and any(header in key.split() for header in AMOUNT_HEADERS):
+            amount = column
+    if description is None or amount is None:
+        return None
+    return description, amount
+
+
+def _guess_line(row):
+    """Строка без известных колонок: описание — первая текстовая ячейка, сумма — последняя числовая."""
+    description = amount = None
+    for value in row:
+        if value is None or str(value).strip() == '':
+            continue
+        try:
+            amount = parse_invoice_amount(value)
+        except ValueError:
+            if description is None:
+                description = str(value).strip()
+    return description, amount
+
+
+def iter_invoice_lines(rows):
+    """
+    Строки счёта из последовательности строк таблицы. Колонки определяются по строке заголовков,
+    если она встречается до первой строки с данными; иначе каждая строка разбирается по содержимому.
+    Строки без описания или суммы (итоги, пустые) пропускаются и возвращаются с amount=None.
+    """
+    columns = None
+    header_possible = True
+    for line_no, row in enumerate(rows, start=1):
+        if header_possible:
+            columns = _find_columns(row)
+            if columns is not None:
+                header_possible = False
+                continue
+        if columns is not None:
+            description_column, amount_column = columns
+            description = row[description_column] if description_column < len(row) else None
+            try:
+                amount = parse_invoice_amount(row[amount_column]) if amount_column < len(row) else None
+            except ValueError:
+                amount = None
+            description = str(description).strip() if description is not None else None
+        else:
+            description, amount = _guess_line(row)
+            header_possible = header_possible and amount is None
+        if description:
+            yield InvoiceLine(line_no, description, amount)
+
+
+def read_csv_rows(path):
+    """Строки CSV потоком; разделитель определяется по началу файла."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        sample = f.read(CSV_SNIFF_BYTES)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=';,\t|')
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def read_xlsx_rows(path):
+    """Строки первого листа XLSX потоком (read_only: лист не загружается в память целиком)."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from wb.worksheets[0].iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+INVOICE_READERS = {
+    '.csv': read_csv_rows,
+    '.txt': read_csv_rows,
+    '.xlsx': read_xlsx_rows,
+    '.xlsm': read_xlsx_rows,
+}
+
+
+def import_invoice(path, fee_names, cutoff=FUZZY_CUTOFF):
+    """
+    Читает счёт и сопоставляет его строки со строками PDA.
+
+    :param fee_names: Названия строк PDA.
+    :return: ImportResult.
+    :raises ValueError: Если формат файла не поддерживается.
+    """
+    reader = INVOICE_READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ValueError(f"Неподдерживаемый формат счёта: {os.path.basename(path)}")
+
+    index = FeeNameIndex(fee_names, cutoff)
+    amounts = {}
+    fuzzy = {}
+    unmatched = []
+    skipped = 0
+    with span("fda.import_invoice"):
+        for line in iter_invoice_lines(reader(path)):
+            if line.amount is None:
+                skipped += 1
+                continue
+            name, is_fuzzy = index.match(line.description)
+            if name is None:
+                unmatched.append(line)
+                continue
+            if is_fuzzy:
+                fuzzy[line.description] = name
+            amounts[name] = amounts.get(name, 0.0) + line.amount
+    logger.info(f"Импорт счёта {os.path.basename(path)}: сопоставлено строк PDA {len(amounts)}, "
+                f"нечётко {len(fuzzy)}, без пары {len(unmatched)}, пропущено {skipped}")
+    return ImportResult(amounts, fuzzy, unmatched, skipped)
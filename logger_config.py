@@ -1,11 +1,115 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
 
-def setup_logging():
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
-        handlers=[
-            logging.FileHandler("app.log", encoding='utf-8'),
-            logging.StreamHandler()
-        ]
-    )
+from constants import LOG_DIR, LOG_FILE_NAME, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_FORMAT, LOG_LEVELS
+
+TEXT_FORMAT = '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
+
+# Слушатель очереди журнала: пишет в файл и консоль в своём потоке
+_listener = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON. Время — и абсолютное, и от старта процесса (elapsed_ms)."""
+
+    # Поля, которые можно передать через extra=, например logger.info("...", extra={'duration_ms': 12.5})
+    EXTRA_FIELDS = ('duration_ms', 'job_id', 'phase')
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'created': record.created,
+            'elapsed_ms': round(record.relativeCreated, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for field in self.EXTRA_FIELDS:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def parse_levels(text):
+    """Разбирает "gui=DEBUG,PIL=WARNING" (пустое имя или 'root' — корневой логгер)."""
+    levels = {}
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        name, _, level = item.partition('=')
+        name = name.strip()
+        levels['' if name == 'root' else name] = level.strip().upper()
+    return levels
+
+
+def _file_handler(formatter):
+    try:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            os.path.join(LOG_DIR, LOG_FILE_NAME),
+            maxBytes=LOG_MAX_BYTES,
+            backupCount=LOG_BACKUP_COUNT,
+            encoding='utf-8',
+            delay=True,
+        )
+    except OSError as e:
+        logging.getLogger(__name__).warning(f"Журнал в файл недоступен ({LOG_DIR}): {e}")
+        return None
+    handler.setFormatter(formatter)
+    return handler
+
+
+def setup_logging(levels=None, log_format=None):
+    """
+    Настраивает журнал: логгеры отдают записи в очередь (QueueHandler), а запись в файл
+    с ротацией по размеру и в консоль выполняет отдельный поток (QueueListener).
+
+    :param levels: Уровни по именам логгеров; по умолчанию LOG_LEVELS и PROFORMA_LOG_LEVELS.
+    :param log_format: 'text' или 'json'; по умолчанию PROFORMA_LOG_FORMAT или LOG_FORMAT.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    if levels is None:
+        levels = dict(LOG_LEVELS)
+        levels.update(parse_levels(os.environ.get('PROFORMA_LOG_LEVELS', '')))
+    log_format = log_format or os.environ.get('PROFORMA_LOG_FORMAT') or LOG_FORMAT
+    if log_format == 'json':
+        formatter = JsonLinesFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    handlers = [console_handler]
+    file_handler = _file_handler(formatter)
+    if file_handler is not None:
+        handlers.append(file_handler)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    for name, level in levels.items():
+        logging.getLogger(name or None).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Дописывает оставшиеся в очереди записи и останавливает поток журнала."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,14 +1,67 @@
 # main.py
+import startup_trace  # первым: трассировка импорта при --trace-startup / --startup-check
+startup_trace.start()
+
+import sys
 import logging
-import ttkbootstrap as ttk
-from gui import ProformaApp
+import multiprocessing
 from logger_config import setup_logging
 
+
+def run_gui(startup_check=False):
+    # Tk и GUI импортируются только для оконного режима
+    import ttkbootstrap as ttk
+    startup_trace.mark("ttkbootstrap импортирован")
+    from gui import ProformaApp
+    from constants import STARTUP_BUDGET_SECONDS
+    startup_trace.mark("gui импортирован")
+
+    # Тема задаётся сразу той, что использует приложение, чтобы не строить лишнюю
+    root = ttk.Window(themename='cosmo')
+    startup_trace.mark("окно создано")
+    app = ProformaApp(root)
+    startup_trace.mark("виджеты созданы")
+
+    status = []
+
+    def first_frame():
+        root.update_idletasks()
+        within_budget = startup_trace.finish(STARTUP_BUDGET_SECONDS)
+        logging.getLogger(__name__).info(f"Старт до первого кадра: {startup_trace.elapsed():.3f} с")
+        if startup_check:
+            status.append(0 if within_budget else 1)
+            root.destroy()
+
+    root.after_idle(first_frame)
+    root.mainloop()
+    return status[0] if status else 0
+
+
 if __name__ == "__main__":
+    # Процессы пакетного формирования FDA в упакованном приложении
+    multiprocessing.freeze_support()
+
+    if len(sys.argv) > 1 and sys.argv[1] == '--conversion-worker':
+        # Воркер ConversionService в упакованном приложении
+        from conversion_service import run_worker
+        run_worker(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+
     setup_logging()
     logger = logging.getLogger(__name__)
-    logger.info("Запуск приложения")
 
-    root = ttk.Window(themename='aqua')
-    app = ProformaApp(root)
-    root.mainloop()
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        # Пакетный режим: python main.py batch records.jsonl -o output
+        from cli import main as batch_main
+        logger.info("Запуск пакетного режима")
+        sys.exit(batch_main(sys.argv[2:]))
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'fda-batch':
+        # Пакетное формирование FDA: python main.py fda-batch manifest.jsonl -o fda_output
+        from fda_batch import main as fda_batch_main
+        logger.info("Запуск пакетного формирования FDA")
+        sys.exit(fda_batch_main(sys.argv[2:]))
+
+    logger.info("Запуск приложения")
+    # --startup-check: замер холодного старта, выход с кодом 1 при превышении бюджета
+    sys.exit(run_gui(startup_check='--startup-check' in sys.argv))
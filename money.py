@@ -0,0 +1,76 @@
+# money.py
+"""
+Денежные суммы в целых минорных единицах (центах): строки ведомости округляются по явным правилам,
+а подытоги — точные целые суммы строк, поэтому итог всегда совпадает с суммой напечатанных строк.
+
+Функции есть в скалярном виде и для массивов NumPy (int64) — пакетный расчёт даёт те же центы.
+"""
+
+import math
+
+MINOR_UNITS = 100  # центов в единице валюты
+# Поправка округления: 2.675 в float — это 2.67499999..., а должно округлиться как 2.675
+ROUNDING_EPSILON = 1e-7
+
+
+def round_half_up(value):
+    """Округляет величину в минорных единицах до целого: половина — от нуля."""
+    if value < 0:
+        return -math.floor(-value + 0.5 + ROUNDING_EPSILON)
+    return math.floor(value + 0.5 + ROUNDING_EPSILON)
+
+
+def to_minor(amount):
+    """Сумма в валюте -> целые центы."""
+    return round_half_up(amount * MINOR_UNITS)
+
+
+def from_minor(minor):
+    """Целые центы -> сумма в валюте (float, для отображения и обратной совместимости)."""
+    return minor / MINOR_UNITS
+
+
+def vat_on(net_minor, vat_rate):
+    """VAT сверх суммы без VAT, в центах."""
+    return round_half_up(net_minor * vat_rate)
+
+
+def vat_included_in(gross_minor, vat_rate):
+    """VAT, уже включённый в сумму, в центах: сумма минус округлённая сумма без VAT."""
+    return gross_minor - round_half_up(gross_minor / (1 + vat_rate))
+
+
+def format_minor(minor):
+    """Форматирует центы как format_amount (пробел между тысячами, запятая), без перехода через float."""
+    sign = '-' if minor < 0 else ''
+    units, cents = divmod(abs(int(minor)), MINOR_UNITS)
+    return f"{sign}{units:,}".replace(",", " ") + f",{cents:02d}"
+
+
+# --- Массивы NumPy ------------------------------------------------------------
+
+def round_half_up_array(values):
+    """round_half_up для массива величин в минорных единицах; результат int64."""
+    import numpy as np
+
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.floor(np.abs(values) + 0.5 + ROUNDING_EPSILON)
+    return np.where(values < 0, -rounded, rounded).astype(np.int64)
+
+
+def to_minor_array(amounts):
+    import numpy as np
+    return round_half_up_array(np.asarray(amounts, dtype=np.float64) * MINOR_UNITS)
+
+
+def from_minor_array(minor):
+    import numpy as np
+    return np.asarray(minor, dtype=np.int64) / MINOR_UNITS
+
+
+def vat_on_array(net_minor, vat_rate):
+    return round_half_up_array(net_minor * vat_rate)
+
+
+def vat_included_in_array(gross_minor, vat_rate):
+    return gross_minor - round_half_up_array(gross_minor / (1 + vat_rate))
@@ -0,0 +1,639 @@
+# pdf_renderer.py
+
+import os
+import zlib
+import struct
+import zipfile
+import datetime
+import logging
+
+from constants import START_ROW_FEES, START_ROW_AGENCY_FEES, TEMPLATE_PATH, PDF_UNICODE_FONTS
+from utils import format_amount
+from money import from_minor
+
+logger = logging.getLogger(__name__)
+
+# Геометрия страницы (A4, поля как в template.xlsx)
+PAGE_WIDTH = 595.28
+PAGE_HEIGHT = 841.89
+MARGIN_LEFT = MARGIN_RIGHT = 0.7 * 72
+MARGIN_TOP = MARGIN_BOTTOM = 0.75 * 72
+
+# Ширины колонок и высоты строк берутся из template.xlsx (template_index.py); эти значения — для колонок
+# и строк без явного размера в шаблоне (ширина в символах Excel — как у openpyxl, высота в пунктах)
+TEMPLATE_COLUMNS = 'ABCDEFGHIJKL'
+DEFAULT_COLUMN_WIDTH = 13.0
+DEFAULT_ROW_HEIGHT = 16.0
+DEFAULT_FONT = (12.0, False)
+
+# Строк в шаблоне под Dues (до "Subtotal dues" и заголовка Agency Fees) и под Agency Fees
+FEE_ROWS = START_ROW_AGENCY_FEES - START_ROW_FEES - 2
+AGENCY_ROWS = 7
+
+# Группы объединённых колонок таблиц (номера колонок с 1)
+FEE_TABLE_SPANS = [(1, 4), (5, 6), (7, 8), (9, 12)]
+OVERTIME_TABLE_SPANS = [(1, 6), (7, 8), (9, 10), (11, 12)]
+
+# Ширины глифов Helvetica / Helvetica-Bold (1/1000 em) для символов 32..126
+HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+HELVETICA_BOLD_WIDTHS = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+
+
+def _pdf_string(data):
+    """Экранирует байтовую строку для литерала PDF (...)."""
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+class StandardFont:
+    """Встроенный шрифт PDF (Helvetica) в кодировке WinAnsi — без встраивания файла шрифта."""
+
+    def __init__(self, resource_name, base_font, widths):
+        self.resource_name = resource_name
+        self.base_font = base_font
+        self.widths = widths
+
+    @staticmethod
+    def supports(text):
+        try:
+            text.encode('cp1252')
+            return True
+        except UnicodeEncodeError:
+            return False
+
+    def text_width(self, text, size):
+        total = 0
+        for char in text:
+            code = ord(char)
+            total += self.widths[code - 32] if 32 <= code <= 126 else 556
+        return total * size / 1000.0
+
+    def encode(self, text):
+        return _pdf_string(text.encode('cp1252', errors='replace'))
+
+    def write_objects(self, writer):
+        return writer.add_object(
+            f"<< /Type /Font /Subtype /Type1 /BaseFont /{self.base_font} /Encoding /WinAnsiEncoding >>".encode())
+
+
+class TrueTypeFont:
+    """
+    TrueType-шрифт, встраиваемый целиком как CIDFontType2 (Identity-H).
+    Используется, когда в тексте есть символы вне WinAnsi (например, кириллица в названии судна).
+    """
+
+    def __init__(self, resource_name, path):
+        self.resource_name = resource_name
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        self._parse()
+        self.used_glyphs = {}
+
+    def _table(self, tag):
+        num_tables = struct.unpack('>H', self.data[4:6])[0]
+        for i in range(num_tables):
+            entry = self.data[12 + 16 * i:28 + 16 * i]
+            if entry[:4] == tag:
+                offset, length = struct.unpack('>II', entry[8:16])
+                return offset, length
+        raise ValueError(f"В шрифте {self.path} нет таблицы {tag.decode()}")
+
+    def _parse(self):
+        data = self.data
+        head, _ = self._table(b'head')
+        self.units_per_em = struct.unpack('>H', data[head + 18:head + 20])[0]
+        self.bbox = struct.unpack('>hhhh', data[head + 36:head + 44])
+
+        hhea, _ = self._table(b'hhea')
+        self.ascent, self.descent = struct.unpack('>hh', data[hhea + 4:hhea + 8])
+        number_of_metrics = struct.unpack('>H', data[hhea + 34:hhea + 36])[0]
+
+        hmtx, _ = self._table(b'hmtx')
+        self.advances = [struct.unpack('>H', data[hmtx + 4 * i:hmtx + 4 * i + 2])[0]
+                         for i in range(number_of_metrics)]
+
+        self.cmap = self._parse_cmap()
+
+    def _parse_cmap(self):
+        data = self.data
+        cmap, _ = self._table(b'cmap')
+        num_subtables = struct.unpack('>H', data[cmap + 2:cmap + 4])[0]
+        subtables = {}
+        for i in range(num_subtables):
+            platform, encoding, offset = struct.unpack('>HHI', data[cmap + 4 + 8 * i:cmap + 12 + 8 * i])
+            subtables[(platform, encoding)] = cmap + offset
+
+        mapping = {}
+        for key in [(3, 10), (0, 4)]:
+            if key in subtables and struct.unpack('>H', data[subtables[key]:subtables[key] + 2])[0] == 12:
+                offset = subtables[key]
+                num_groups = struct.unpack('>I', data[offset + 12:offset + 16])[0]
+                for g in range(num_groups):
+                    start, end, glyph = struct.unpack('>III', data[offset + 16 + 12 * g:offset + 28 + 12 * g])
+                    for code in range(start, end + 1):
+                        mapping[code] = glyph + code - start
+                return mapping
+
+        for key in [(3, 1), (0, 3)]:
+            if key in subtables and struct.unpack('>H', data[subtables[key]:subtables[key] + 2])[0] == 4:
+                offset = subtables[key]
+                seg_count = struct.unpack('>H', data[offset + 6:offset + 8])[0] // 2
+                ends = offset + 14
+                starts = ends + 2 * seg_count + 2
+                deltas = starts + 2 * seg_count
+                range_offsets = deltas + 2 * seg_count
+                for s in range(seg_count):
+                    end = struct.unpack('>H', data[ends + 2 * s:ends + 2 * s + 2])[0]
+                    start = struct.unpack('>H', data[starts + 2 * s:starts + 2 * s + 2])[0]
+                    delta = struct.unpack('>h', data[deltas + 2 * s:deltas + 2 * s + 2])[0]
+                    range_offset = struct.unpack('>H', data[range_offsets + 2 * s:range_offsets + 2 * s + 2])[0]
+                    for code in range(start, min(end, 0xFFFE) + 1):
+                        if range_offset == 0:
+                            glyph = (code + delta) & 0xFFFF
+                        else:
+                            address = range_offsets + 2 * s + range_offset + 2 * (code - start)
+                            glyph = struct.unpack('>H', data[address:address + 2])[0]
+                            if glyph:
+                                glyph = (glyph + delta) & 0xFFFF
+                        if glyph:
+                            mapping[code] = glyph
+                return mapping
+        raise ValueError(f"В шрифте {self.path} нет поддерживаемой таблицы cmap")
+
+    @staticmethod
+    def supports(text):
+        return True
+
+    def _advance(self, glyph):
+        return self.advances[min(glyph, len(self.advances) - 1)]
+
+    def text_width(self, text, size):
+        total = sum(self._advance(self.cmap.get(ord(char), 0)) for char in text)
+        return total * size / self.units_per_em
+
+    def encode(self, text):
+        glyphs = []
+        for char in text:
+            glyph = self.cmap.get(ord(char), 0)
+            self.used_glyphs[glyph] = char
+            glyphs.append(glyph)
+        return b'<' + ''.join(f'{glyph:04X}' for glyph in glyphs).encode() + b'>'
+
+    def _scale(self, value):
+        return int(round(value * 1000 / self.units_per_em))
+
+    def write_objects(self, writer):
+        font_file = writer.add_stream(self.data, extra=f"/Length1 {len(self.data)}")
+        descriptor = writer.add_object((
+            f"<< /Type /FontDescriptor /FontName /{self.resource_name} /Flags 32 "
+            f"/FontBBox [{' '.join(str(self._scale(v)) for v in self.bbox)}] /ItalicAngle 0 "
+            f"/Ascent {self._scale(self.ascent)} /Descent {self._scale(self.descent)} "
+            f"/CapHeight {self._scale(self.ascent)} /StemV 80 /FontFile2 {font_file} 0 R >>").encode())
+        widths = ' '.join(f"{glyph} [{self._scale(self._advance(glyph))}]" for glyph in sorted(self.used_glyphs))
+        cid_font = writer.add_object((
+            f"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{self.resource_name} "
+            f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+            f"/FontDescriptor {descriptor} 0 R /CIDToGIDMap /Identity /W [{widths}] >>").encode())
+
+        # ToUnicode, чтобы текст из PDF можно было копировать и искать
+        mappings = '\n'.join(f"<{glyph:04X}> <{ord(char):04X}>" for glyph, char in sorted(self.used_glyphs.items())
+                             if ord(char) <= 0xFFFF)
+        to_unicode = writer.add_stream((
+            "/CIDInit /ProcSet findresource begin 12 dict begin begincmap\n"
+            "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def\n"
+            "/CMapName /Adobe-Identity-UCS def /CMapType 2 def\n"
+            "1 begincodespacerange <0000> <FFFF> endcodespacerange\n"
+            f"{len(self.used_glyphs)} beginbfchar\n{mappings}\nendbfchar\n"
+            "endcmap CMapName currentdict /CMap defineresource pop end end").encode())
+        return writer.add_object((
+            f"<< /Type /Font /Subtype /Type0 /BaseFont /{self.resource_name} /Encoding /Identity-H "
+            f"/DescendantFonts [{cid_font} 0 R] /ToUnicode {to_unicode} 0 R >>").encode())
+
+
+class PdfWriter:
+    """Минимальный писатель PDF: нумерованные объекты, таблица xref и трейлер."""
+
+    def __init__(self):
+        self.objects = []
+
+    def add_object(self, body):
+        self.objects.append(body)
+        return len(self.objects)
+
+    def add_stream(self, data, extra=''):
+        compressed = zlib.compress(data)
+        return self.add_object(
+            f"<< /Length {len(compressed)} /Filter /FlateDecode {extra} >>\nstream\n".encode()
+            + compressed + b"\nendstream")
+
+    def add_raw_stream(self, data, dictionary):
+        return self.add_object(f"<< /Length {len(data)} {dictionary} >>\nstream\n".encode() + data + b"\nendstream")
+
+    def save(self, path, root):
+        output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(self.objects, start=1):
+            offsets.append(len(output))
+            output += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+        xref_offset = len(output)
+        output += f"xref\n0 {len(self.objects) + 1}\n0000000000 65535 f \n".encode()
+        for offset in offsets:
+            output += f"{offset:010d} 00000 n \n".encode()
+        output += (f"trailer\n<< /Size {len(self.objects) + 1} /Root {root} 0 R >>\n"
+                   f"startxref\n{xref_offset}\n%%EOF\n").encode()
+        with open(path, 'wb') as f:
+            f.write(output)
+
+
+def _jpeg_size(data):
+    """Ширина, высота и число цветовых компонент JPEG из маркера SOF."""
+    index = 2
+    while index + 9 < len(data) and data[index] == 0xFF:
+        marker = data[index + 1]
+        length = struct.unpack('>H', data[index + 2:index + 4])[0]
+        if marker in (0xC0, 0xC1, 0xC2):
+            height, width = struct.unpack('>HH', data[index + 5:index + 9])
+            return width, height, data[index + 9]
+        index += 2 + length
+    raise ValueError("Не удалось определить размер JPEG")
+
+
+def load_template_logo(template_path=TEMPLATE_PATH):
+    """Берёт логотип (JPEG) прямо из архива template.xlsx, без openpyxl."""
+    try:
+        with zipfile.ZipFile(template_path) as archive:
+            for name in archive.namelist():
+                if name.startswith('xl/media/') and name.lower().endswith(('.jpeg', '.jpg')):
+                    return archive.read(name)
+    except (OSError, zipfile.BadZipFile) as e:
+        logger.warning(f"Не удалось прочитать логотип из шаблона: {e}")
+    return None
+
+
+def find_unicode_font():
+    for path in PDF_UNICODE_FONTS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class ProformaCanvas:
+    """Раскладка листа template.xlsx на странице: колонки и строки шаблона, масштаб "вписать в страницу"."""
+
+    def __init__(self, row_heights, fonts, column_widths):
+        self.fonts = fonts
+        self.operations = []
+        self.images = []
+
+        column_points = [(width * 7 + 5) * 0.75 for width in column_widths]
+        total_height = sum(height for _, height in row_heights)
+        self.scale = min(
+            (PAGE_WIDTH - MARGIN_LEFT - MARGIN_RIGHT) / sum(column_points),
+            (PAGE_HEIGHT - MARGIN_TOP - MARGIN_BOTTOM) / total_height,
+        )
+
+        self.column_x = [MARGIN_LEFT]
+        for width in column_points:
+            self.column_x.append(self.column_x[-1] + width * self.scale)
+
+        # y верхней границы каждой строки (ось PDF направлена вверх)
+        self.row_top = {}
+        self.row_height = {}
+        y = PAGE_HEIGHT - MARGIN_TOP
+        for key, height in row_heights:
+            self.row_top[key] = y
+            self.row_height[key] = height * self.scale
+            y -= height * self.scale
+
+    def _font_for(self, text, bold):
+        standard = self.fonts['bold' if bold else 'regular']
+        if standard.supports(text) or 'unicode' not in self.fonts:
+            return standard, False
+        # У встроенного TrueType нет жирного начертания — имитируем обводкой
+        return self.fonts['unicode'], bold
+
+    def text(self, row, first_col, last_col, text, size=12.0, bold=False, align='left', valign='bottom'):
+        if text is None or text == '':
+            return
+        text = str(text)
+        size *= self.scale
+        font, fake_bold = self._font_for(text, bold)
+        left = self.column_x[first_col - 1]
+        right = self.column_x[last_col]
+        padding = 2 * self.scale
+        width = font.text_width(text, size)
+        if align == 'center':
+            x = (left + right - width) / 2
+        elif align == 'right':
+            x = right - padding - width
+        else:
+            x = left + padding
+
+        top = self.row_top[row]
+        height = self.row_height[row]
+        if valign == 'center':
+            y = top - height / 2 - size * 0.35
+        elif valign == 'top':
+            y = top - size
+        else:
+            y = top - height + size * 0.25
+
+        render = f"2 Tr {size * 0.03:.3f} w" if fake_bold else "0 Tr"
+        self.operations.append(
+            f"q BT /{font.resource_name} {size:.2f} Tf {render} {x:.2f} {y:.2f} Td ".encode()
+            + font.encode(text) + b" Tj ET Q")
+
+    def grid(self, rows, spans):
+        """Рамки ячеек таблицы для строк rows с объединёнными колонками spans."""
+        for row in rows:
+            top = self.row_top[row]
+            bottom = top - self.row_height[row]
+            for first_col, last_col in spans:
+                left = self.column_x[first_col - 1]
+                right = self.column_x[last_col]
+                self.operations.append(f"{left:.2f} {bottom:.2f} {right - left:.2f} {top - bottom:.2f} re S".encode())
+
+    def hline(self, row, first_col, last_col):
+        y = self.row_top[row] - self.row_height[row]
+        self.operations.append(
+            f"{self.column_x[first_col - 1]:.2f} {y:.2f} m {self.column_x[last_col]:.2f} {y:.2f} l S".encode())
+
+    def image(self, data, first_row, last_row, first_col, last_col):
+        """JPEG, вписанный с сохранением пропорций в область ячеек."""
+        width, height, components = _jpeg_size(data)
+        box_left = self.column_x[first_col - 1]
+        box_top = self.row_top[first_row]
+        box_width = self.column_x[last_col] - box_left
+        box_height = box_top - (self.row_top[last_row] - self.row_height[last_row])
+        ratio = min(box_width / width, box_height / height)
+        name = f"Im{len(self.images) + 1}"
+        self.images.append((name, data, width, height, components))
+        self.operations.append(
+            f"q {width * ratio:.2f} 0 0 {height * ratio:.2f} {box_left:.2f} {box_top - height * ratio:.2f} cm "
+            f"/{name} Do Q".encode())
+
+    def save(self, path):
+        writer = PdfWriter()
+        # Текст уже закодирован, поэтому набор глифов TrueType-шрифта известен
+        font_refs = ' '.join(f"/{font.resource_name} {font.write_objects(writer)} 0 R" for font in self.fonts.values())
+        content = b"0.5 w\n" + b"\n".join(self.operations)
+        content_ref = writer.add_stream(content)
+
+        image_refs = []
+        for name, data, width, height, components in self.images:
+            color_space = '/DeviceGray' if components == 1 else '/DeviceCMYK' if components == 4 else '/DeviceRGB'
+            ref = writer.add_raw_stream(data, (
+                f"/Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                f"/ColorSpace {color_space} /BitsPerComponent 8 /Filter /DCTDecode"))
+            image_refs.append(f"/{name} {ref} 0 R")
+
+        resources = f"<< /Font << {font_refs} >> /XObject << {' '.join(image_refs)} >> >>"
+
+        pages_ref = len(writer.objects) + 2
+        page_ref = writer.add_object((
+            f"<< /Type /Page /Parent {pages_ref} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources {resources} /Contents {content_ref} 0 R >>").encode())
+        writer.add_object(f"<< /Type /Pages /Kids [{page_ref} 0 R] /Count 1 >>".encode())
+        root = writer.add_object(f"<< /Type /Catalog /Pages {pages_ref} 0 R >>".encode())
+        writer.save(path, root)
+
+
+def document_fonts(texts):
+    """Шрифты документа: стандартные Helvetica и, если текст их не покрывает, встроенный TrueType."""
+    fonts = {
+        'regular': StandardFont('F1', 'Helvetica', HELVETICA_WIDTHS),
+        'bold': StandardFont('F2', 'Helvetica-Bold', HELVETICA_BOLD_WIDTHS),
+    }
+    if not StandardFont.supports(' '.join(texts)):
+        font_path = find_unicode_font()
+        if font_path:
+            fonts['unicode'] = TrueTypeFont('F3', font_path)
+        else:
+            logger.warning("Не найден шрифт с поддержкой Unicode, часть символов будет заменена на '?'")
+    return fonts
+
+
+def _column_widths(index):
+    return [index.column_widths.get(letter, DEFAULT_COLUMN_WIDTH) for letter in TEMPLATE_COLUMNS]
+
+
+def _layout_rows(index, dues_count, agency_count):
+    """
+    Последовательность строк страницы: номера строк шаблона, а для таблиц — ключи ('fee', i) и ('agency', i).
+    Если сборов больше, чем строк в шаблоне, таблицы растягиваются, а масштаб уменьшается.
+    """
+    default_height = index.default_row_height or DEFAULT_ROW_HEIGHT
+
+    def template_rows(rows):
+        return [(row, index.row_heights.get(row, default_height)) for row in rows]
+
+    rows = template_rows(range(1, START_ROW_FEES))
+    rows += [(('fee', i), default_height) for i in range(max(FEE_ROWS, dues_count))]
+    rows += template_rows((START_ROW_AGENCY_FEES - 2, START_ROW_AGENCY_FEES - 1))
+    rows += [(('agency', i), default_height) for i in range(max(AGENCY_ROWS, agency_count))]
+    rows += template_rows(range(52, 61))
+    return rows
+
+
+def render_proforma_pdf(calculation, inputs, pdf_path, template_path=TEMPLATE_PATH):
+    """
+    Рисует проформу напрямую в PDF по раскладке template.xlsx — без openpyxl и LibreOffice.
+
+    Постоянный текст, шрифты ячеек, ширины колонок и высоты строк берутся из индекса шаблона
+    (template_index.py), поэтому правки этих ячеек в шаблоне попадают и в PDF. В коде остаются
+    положение блоков (какие ячейки объединены, выравнивание) и таблицы Dues/Agency Fees, которые
+    растягиваются под число строк. Отличия от PDF через LibreOffice: центрированные ячейки выводятся
+    без окружающих пробелов, формулы не вычисляются (дата — текущая), новые ячейки, добавленные
+    в шаблон вне известных блоков, и изменения объединений и выравнивания не учитываются.
+    """
+    from proforma_document import build_replacements
+    from template_index import load_template_index
+
+    logger.info(f"Генерация PDF встроенным рендерером: {pdf_path}")
+    replacements = build_replacements(calculation, inputs)
+    index = load_template_index(template_path)
+
+    dues = calculation.dues
+    # Agency fee, Bank charges и дополнительные Fees из центов ведомости — как и подытог Agency Fees
+    agency_lines = [(name, total_display) for name, _, total_display in calculation.get_agency_display_data()]
+
+    fonts = document_fonts([str(value) for value in inputs.values() if isinstance(value, str)]
+                           + [fee.name for fee in dues] + [name for name, _ in agency_lines]
+                           + list(index.static_texts.values()))
+
+    canvas = ProformaCanvas(_layout_rows(index, len(dues), len(agency_lines)), fonts, _column_widths(index))
+
+    def cell(row, first_col, last_col, text=None, **options):
+        """
+        Ячейка шаблона (строка row, колонки first_col..last_col) шрифтом шаблона.
+        Без text выводится постоянный текст ячейки из шаблона.
+        """
+        coordinate = f"{TEMPLATE_COLUMNS[first_col - 1]}{row}"
+        size, bold = index.fonts.get(coordinate, DEFAULT_FONT)
+        if text is None:
+            text = index.static_texts.get(coordinate, '')
+            if options.get('align') == 'center':
+                # Пробелы вокруг текста в шаблоне сдвинули бы его с центра объединённой ячейки
+                text = text.strip()
+        canvas.text(row, first_col, last_col, text, size, bold=bold, **options)
+
+    # Шапка
+    cell(1, 1, 1)
+    cell(1, 2, 4, replacements['Account_name'])
+    cell(1, 5, 6, align='right')
+    cell(1, 7, 8, align='center')
+    cell(1, 9, 9, align='right')
+    cell(1, 10, 12, replacements['port'])
+    cell(2, 1, 4, align='center')
+    cell(2, 5, 6, align='right')
+    cell(2, 7, 8, align='center')
+    cell(2, 9, 9, align='right')
+    cell(2, 10, 12, datetime.date.today().strftime('%d.%m.%Y'))
+
+    logo = load_template_logo(template_path)
+    if logo:
+        canvas.image(logo, 4, 9, 1, 3)
+    for row in range(5, 9):
+        cell(row, 4, 6, align='center', valign='center')
+    cell(4, 7, 12, valign='top')
+
+    # Блок судна: подпись (A:C) и значение (D:E), справа — подпись (F:G) и значение (H:L)
+    vessel_block = [
+        (12, 'vessel_name', None),
+        (13, 'vessel_flag', replacements['cargo_loaded']),
+        (14, 'lbp', replacements['cargo_qtty']),
+        (15, 'beam', None),
+        (16, 'rdm', None),
+    ]
+    for row, key, right_value in vessel_block:
+        cell(row, 1, 3, align='right')
+        cell(row, 4, 5, replacements[key])
+        cell(row, 6, 7, align='right')
+        cell(row, 8, 12, right_value)
+    cell(17, 1, 3, align='right', valign='center')
+    cell(17, 4, 5, replacements['cv'])
+    canvas.hline(20, 1, 12)
+
+    # Таблица Dues
+    header_row = START_ROW_FEES - 1
+    fee_rows = [('fee', i) for i in range(max(FEE_ROWS, len(dues)))]
+    canvas.grid([header_row] + fee_rows, FEE_TABLE_SPANS)
+    for first_col, last_col in FEE_TABLE_SPANS:
+        cell(header_row, first_col, last_col, align='center', valign='center')
+    for row, fee in zip(fee_rows, dues):
+        canvas.text(row, 1, 4, fee.name, valign='center')
+        canvas.text(row, 5, 6, format_amount(fee.vat_amount) if fee.vat_amount > 0 else "-", align='center')
+        canvas.text(row, 7, 8, format_amount(fee.total_amount), align='center')
+
+    subtotal_row = START_ROW_AGENCY_FEES - 2
+    canvas.grid([subtotal_row], [(1, 6), (7, 8)])
+    cell(subtotal_row, 1, 6, align='right', valign='center')
+    cell(subtotal_row, 7, 8, replacements['subtotal_dues'], align='center', valign='center')
+
+    # Блок Agency Fees
+    agency_header_row = START_ROW_AGENCY_FEES - 1
+    agency_rows = [('agency', i) for i in range(max(AGENCY_ROWS, len(agency_lines)))]
+    canvas.grid([agency_header_row] + agency_rows, FEE_TABLE_SPANS)
+    cell(agency_header_row, 1, 4, align='center', valign='center')
+    for row, (name, total_display) in zip(agency_rows, agency_lines):
+        canvas.text(row, 1, 4, name, valign='center')
+        canvas.text(row, 7, 8, total_display, align='center')
+
+    cell(52, 1, 6, align='right', valign='center')
+    cell(52, 7, 8, replacements['subtotal_agfee'], align='center', valign='center')
+    cell(54, 1, 6, align='right')
+    cell(54, 7, 8, replacements['total'], align='center', valign='center')
+
+    # Итоги по фиксированным ставкам овертайма 25/50/100%
+    cell(56, 1, 12, align='center', valign='center')
+    canvas.grid(range(57, 61), OVERTIME_TABLE_SPANS)
+    for first_col, last_col in OVERTIME_TABLE_SPANS:
+        cell(57, first_col, last_col, align='center', valign='center')
+    for row, key in [(58, 'total_fee'), (59, 'total_agency_fee'), (60, 'grand_total')]:
+        cell(row, 1, 6)
+        for (first_col, last_col), percentage in zip(OVERTIME_TABLE_SPANS[1:], [25, 50, 100]):
+            cell(row, first_col, last_col, replacements[f"{key}_{percentage}_ot"], align='center')
+
+    canvas.save(pdf_path)
+
+
+# Сравнение портов: колонка названий и по колонке на порт (в символах Excel)
+COMPARISON_NAME_WIDTH = 40.0
+COMPARISON_PORT_WIDTH = 16.0
+
+
+def render_comparison_pdf(comparison, pdf_path):
+    """
+    Документ сравнения портов (port_comparison.PortComparison): строки Dues и итоги бок о бок,
+    по колонке на порт. Страница одна, масштаб подбирается по числу строк и портов.
+    """
+    logger.info(f"Генерация PDF сравнения портов: {pdf_path}")
+    inputs = comparison.inputs
+    ports = comparison.ports
+    dues_table = comparison.dues_table()
+    totals = [comparison.totals(port) for port in ports]
+    columns = len(ports) + 1
+
+    # Порты без сборов в тарифе (totals() -> None) показываются прочерком
+    summary = [
+        ("Subtotal dues", [total and total['subtotal_dues'] for total in totals], False),
+        ("Subtotal (Agency Fees)", [total and total['subtotal_agency_fees'] for total in totals], False),
+        ("Total VAT", [total and total['total_vat'] for total in totals], False),
+        ("TOTAL WITH NO OVERTIME", [total and total['total'] for total in totals], True),
+    ]
+    summary += [(f"Grand total basis {rate:.0%} overtime",
+                 [total and total['fixed_totals'][rate] for total in totals], False)
+                for rate in comparison.overtime_rates]
+
+    rows = [('title', 24.0), ('vessel', 18.0), ('cv', 18.0), ('gap', 10.0), ('header', 20.0)]
+    rows += [(('fee', index), DEFAULT_ROW_HEIGHT) for index in range(len(dues_table))]
+    rows += [(('agency', index), DEFAULT_ROW_HEIGHT) for index in range(len(comparison.agency_lines))]
+    rows += [(('summary', index), 20.0) for index in range(len(summary))]
+
+    fonts = document_fonts([str(inputs.get('vessel_name', ''))] + list(ports)
+                           + [name for name, _ in dues_table] + [name for name, _ in comparison.agency_lines])
+    canvas = ProformaCanvas(rows, fonts, [COMPARISON_NAME_WIDTH] + [COMPARISON_PORT_WIDTH] * len(ports))
+
+    canvas.text('title', 1, columns, "PORT COMPARISON (PDA)", 16, bold=True, align='center', valign='center')
+    canvas.text('vessel', 1, 1, f"Vessel's name: {inputs.get('vessel_name', '')}")
+    canvas.text('vessel', 2, columns, datetime.date.today().strftime('%d.%m.%Y'), align='right')
+    canvas.text('cv', 1, 1, f"Volume, cbm: {comparison.cv}", bold=True)
+
+    table_rows = ['header'] + [key for key, _ in rows[5:]]
+    canvas.grid(table_rows, [(column, column) for column in range(1, columns + 1)])
+    canvas.text('header', 1, 1, "Dues / Fees", bold=True, align='center', valign='center')
+    cheapest = comparison.cheapest_port()
+    for column, port in enumerate(ports, start=2):
+        canvas.text('header', column, column, port, bold=True, align='center', valign='center')
+
+    for index, (name, amounts) in enumerate(dues_table):
+        canvas.text(('fee', index), 1, 1, name, valign='center')
+        for column, amount in enumerate(amounts, start=2):
+            canvas.text(('fee', index), column, column, "-" if amount is None else format_amount(amount),
+                        align='right', valign='center')
+    for index, (name, amount) in enumerate(comparison.agency_lines):
+        canvas.text(('agency', index), 1, 1, name, valign='center')
+        for column, priced in enumerate(comparison.priced, start=2):
+            canvas.text(('agency', index), column, column, format_amount(from_minor(amount)) if priced else "-",
+                        align='right', valign='center')
+    for index, (label, amounts, bold) in enumerate(summary):
+        canvas.text(('summary', index), 1, 1, label, bold=bold, valign='center')
+        for column, (port, amount) in enumerate(zip(ports, amounts), start=2):
+            canvas.text(('summary', index), column, column, "-" if amount is None else format_amount(amount),
+                        bold=bold or port == cheapest, align='right', valign='center')
+
+    canvas.save(pdf_path)
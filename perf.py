@@ -0,0 +1,123 @@
+# perf.py
+"""
+Замеры времени этапов: span("этап") вокруг участка кода, статистика p50/p95/max в памяти
+и выгрузка в файл метрик.
+
+Выключенные замеры стоят одну проверку флага: span() возвращает общий пустой контекст.
+Включаются PERF_ENABLED в constants, переменной окружения PROFORMA_PERF=1 или из вкладки «Диагностика».
+"""
+
+import os
+import csv
+import json
+import time
+import threading
+from collections import deque
+from contextlib import nullcontext
+
+from constants import PERF_ENABLED, PERF_MAX_SAMPLES
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ('recorder', 'name', 'start')
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.recorder.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def percentile(sorted_samples, fraction):
+    """Перцентиль по отсортированным замерам (ближайший ранг)."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(int(round(fraction * len(sorted_samples) + 0.5)) - 1, 0)
+    return sorted_samples[min(rank, len(sorted_samples) - 1)]
+
+
+class PerfRecorder:
+    """
+    Замеры по этапам. Для каждого этапа хранятся последние max_samples длительностей
+    (для перцентилей), а также общее число замеров, сумма и максимум за всё время.
+    Потокобезопасен: этапы формирования документов замеряются в рабочих потоках.
+    """
+
+    def __init__(self, enabled=False, max_samples=PERF_MAX_SAMPLES):
+        self.enabled = enabled
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._phases = {}  # этап -> [последние замеры, количество, сумма, максимум]
+
+    def span(self, name):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name, seconds):
+        with self._lock:
+            phase = self._phases.get(name)
+            if phase is None:
+                phase = self._phases[name] = [deque(maxlen=self.max_samples), 0, 0.0, 0.0]
+            phase[0].append(seconds)
+            phase[1] += 1
+            phase[2] += seconds
+            if seconds > phase[3]:
+                phase[3] = seconds
+
+    def reset(self):
+        with self._lock:
+            self._phases.clear()
+
+    def stats(self):
+        """
+        Статистика по этапам в порядке первого замера.
+
+        :return: Список словарей {'phase', 'count', 'p50_ms', 'p95_ms', 'max_ms', 'total_ms'}.
+        """
+        with self._lock:
+            phases = [(name, sorted(samples), count, total, maximum)
+                      for name, (samples, count, total, maximum) in self._phases.items()]
+        return [
+            {
+                'phase': name,
+                'count': count,
+                'p50_ms': percentile(samples, 0.50) * 1000,
+                'p95_ms': percentile(samples, 0.95) * 1000,
+                'max_ms': maximum * 1000,
+                'total_ms': total * 1000,
+            }
+            for name, samples, count, total, maximum in phases
+        ]
+
+    def export(self, path):
+        """Сохраняет статистику в файл метрик: .csv — таблица, иначе JSON."""
+        stats = self.stats()
+        if os.path.splitext(path)[1].lower() == '.csv':
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=['phase', 'count', 'p50_ms', 'p95_ms', 'max_ms', 'total_ms'])
+                writer.writeheader()
+                writer.writerows(stats)
+            return
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'exported_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'phases': stats},
+                      f, ensure_ascii=False, indent=2)
+
+
+# Общий регистратор приложения
+perf = PerfRecorder(enabled=PERF_ENABLED or bool(os.environ.get('PROFORMA_PERF')))
+
+
+def span(name):
+    """Замер участка кода: with span("pdf.convert"): ... — без затрат, если замеры выключены."""
+    if not perf.enabled:
+        return _NULL_SPAN
+    return _Span(perf, name)
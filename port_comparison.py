@@ -0,0 +1,163 @@
+# port_comparison.py
+"""
+Сравнение одного судна по тарифам всех портов за один векторный проход.
+
+Сборы всех тарифов складываются в общую матрицу коэффициентов (одна колонка на сбор любого порта,
+с признаками миль, направления и VAT), а строки матрицы сумм — сочетания овертайма: введённое в форме
+и фиксированные 25/50/100%. Подытоги портов получаются умножением на матрицу принадлежности сборов
+портам. Правила округления — как в fee_ledger.compute_fee, поэтому суммы совпадают с расчётом по каждому
+порту отдельно.
+
+NumPy импортируется в функциях: модуль загружается при старте GUI, а сравнение нужно только по флажку.
+"""
+
+from functools import lru_cache
+
+from calculations import FeeCalculator, FIXED_OVERTIME_RATES
+from tariff_registry import get_tariff, get_ports, MILES_KEYS, DIRECTIONS
+from money import to_minor, from_minor, to_minor_array, vat_on_array, vat_included_in_array
+from utils import parse_input, parse_overtime
+from perf import span
+
+
+class StackedTariffs:
+    """Сборы нескольких тарифов в виде параллельных массивов (колонка на сбор)."""
+
+    def __init__(self, tariffs):
+        import numpy as np
+
+        self.tariffs = tuple(tariffs)
+        self.ports = tuple(tariff.port for tariff in self.tariffs)
+        fees = [(port_index, tariff, fee) for port_index, tariff in enumerate(self.tariffs) for fee in tariff.fees]
+        self.names = tuple(fee.name for _, _, fee in fees)
+        self.port_index = np.array([port_index for port_index, _, _ in fees], dtype=np.intp)
+        self.coefficients = np.array([fee.coefficient for _, _, fee in fees], dtype=np.float64)
+        # Индекс в векторе миль; последний элемент вектора — 1 для сборов без миль
+        self.miles_index = np.array([MILES_KEYS.index(fee.miles_key) if fee.miles_key else len(MILES_KEYS)
+                                     for _, _, fee in fees], dtype=np.intp)
+        # Индекс в строке овертайма: 0 — без направления (овертайм 0), далее по DIRECTIONS
+        self.direction_index = np.array([DIRECTIONS.index(fee.direction) + 1 if fee.direction else 0
+                                         for _, _, fee in fees], dtype=np.intp)
+        self.vat_rates = np.array([tariff.vat_rate for _, tariff, _ in fees], dtype=np.float64)
+        self.vat_added = np.array([fee.vat_applicable and not fee.vat_included for _, _, fee in fees], dtype=bool)
+        self.vat_included = np.array([fee.vat_applicable and fee.vat_included for _, _, fee in fees], dtype=bool)
+        # Принадлежность сборов портам: (сборы, порты), для подытогов матричным умножением
+        self.membership = np.zeros((len(fees), len(self.tariffs)), dtype=np.int64)
+        self.membership[np.arange(len(fees)), self.port_index] = 1
+
+
+@lru_cache(maxsize=8)
+def stack_tariffs(tariffs):
+    """
+    Сводная матрица тарифов. Кэшируется по объектам Tariff: изменённый файл тарифа даёт новый объект,
+    и матрица строится заново.
+    """
+    return StackedTariffs(tariffs)
+
+
+class PortComparison:
+    """
+    Результат сравнения портов. Матрицы сумм (int64, центы) имеют форму (сочетания овертайма, сборы),
+    подытоги — (сочетания овертайма, порты); строка 0 — овертайм из формы, далее — overtime_rates.
+    """
+
+    def __init__(self, inputs, cv, stacked, overtime_rates, amount_minor, vat_minor, total_minor,
+                 dues_minor, vat_total_minor, additional_dues, agency_lines):
+        self.inputs = inputs
+        self.cv = cv
+        self.stacked = stacked
+        self.ports = stacked.ports
+        # Порты, тариф которых ещё не заполнен (нет сборов): их итоги не показываются и не сравниваются
+        self.priced = tuple(bool(tariff.fees) for tariff in stacked.tariffs)
+        self.overtime_rates = tuple(overtime_rates)
+        self.amount_minor = amount_minor
+        self.vat_minor = vat_minor
+        self.total_minor = total_minor
+        self.dues_minor = dues_minor
+        self.vat_total_minor = vat_total_minor
+        self.additional_dues = tuple(additional_dues)  # (название, центы) — одинаковы для всех портов
+        self.agency_lines = tuple(agency_lines)
+        self.agency_fees_minor = sum(amount for _, amount in self.agency_lines)
+
+    def totals(self, port):
+        """
+        Итоги порта в валюте: подытоги, VAT, итог и итоги по фиксированным ставкам овертайма.
+        None — у порта нет сборов в тарифе.
+        """
+        index = self.ports.index(port)
+        if not self.priced[index]:
+            return None
+        subtotal_dues = int(self.dues_minor[0, index])
+        return {
+            'subtotal_dues': from_minor(subtotal_dues),
+            'subtotal_agency_fees': from_minor(self.agency_fees_minor),
+            'total_vat': from_minor(int(self.vat_total_minor[0, index])),
+            'total': from_minor(subtotal_dues + self.agency_fees_minor),
+            'fixed_totals': {
+                rate: from_minor(int(self.dues_minor[row, index]) + self.agency_fees_minor)
+                for row, rate in enumerate(self.overtime_rates, start=1)
+            },
+        }
+
+    def cheapest_port(self):
+        """Порт с наименьшими Dues среди портов со сборами в тарифе; None, если таких нет."""
+        import numpy as np
+
+        priced = [index for index, priced in enumerate(self.priced) if priced]
+        if not priced:
+            return None
+        return self.ports[priced[int(np.argmin(self.dues_minor[0, priced]))]]
+
+    def dues_table(self):
+        """
+        Строки Dues бок о бок: список (название, [итого в валюте или None по портам]) в порядке первого
+        появления названия; дополнительные Dues — в конце, одинаковые для всех портов со сборами.
+        """
+        rows = {}
+        for column, (name, port_index) in enumerate(zip(self.stacked.names, self.stacked.port_index)):
+            rows.setdefault(name, [None] * len(self.ports))[port_index] = from_minor(int(self.total_minor[0, column]))
+        table = list(rows.items())
+        table += [(name, [from_minor(amount) if priced else None for priced in self.priced])
+                  for name, amount in self.additional_dues]
+        return table
+
+
+def compare_ports(inputs, ports=None, overtime_rates=FIXED_OVERTIME_RATES, tariff_source=get_tariff):
+    """
+    Рассчитывает судно по тарифам всех портов (или перечисленных) одним проходом.
+
+    :param inputs: Значения полей формы, как для FeeCalculator.calculate (поле 'port' не используется).
+    :return: PortComparison.
+    """
+    import numpy as np
+
+    with span("calc.compare_ports"):
+        ports = get_ports() if ports is None else ports
+        stacked = stack_tariffs(tuple(tariff_source(port) for port in ports))
+        cv = FeeCalculator.calculate_cv(inputs)
+
+        miles = np.array([int(inputs[key]) for key in MILES_KEYS] + [1], dtype=np.float64)
+        pairs = [(parse_overtime(inputs['overtime_in']), parse_overtime(inputs['overtime_out']))]
+        pairs += [(rate, rate) for rate in overtime_rates]
+        overtime = np.array([(0.0, rate_in, rate_out) for rate_in, rate_out in pairs], dtype=np.float64)
+
+        # Тот же порядок операций, что и в скалярном расчёте: (CV * коэффициент) * мили * (1 + овертайм)
+        base = cv * stacked.coefficients
+        base = np.where(stacked.miles_index < len(MILES_KEYS), base * miles[stacked.miles_index], base)
+        amount = to_minor_array(base * (1 + overtime[:, stacked.direction_index]))
+        vat = np.where(stacked.vat_added, vat_on_array(amount, stacked.vat_rates),
+                       np.where(stacked.vat_included, vat_included_in_array(amount, stacked.vat_rates), 0))
+        total = np.where(stacked.vat_added, amount + vat, amount)
+
+        # Строки с суммой из формы одинаковы для всех портов
+        additional_dues = [(due['name'], to_minor(parse_input(due['amount'])))
+                           for due in inputs.get('additional_dues', [])]
+        agency_lines = [('Agency fee', to_minor(parse_input(inputs['agency_fee']))),
+                        ('Bank charges', to_minor(parse_input(inputs['bank_charges'])))]
+        agency_lines += [(fee['name'], to_minor(parse_input(fee['amount'])))
+                         for fee in inputs.get('additional_fees', [])]
+
+        dues = total @ stacked.membership + sum(amount for _, amount in additional_dues)
+        vat_total = vat @ stacked.membership
+    return PortComparison(inputs, cv, stacked, overtime_rates, amount, vat, total, dues, vat_total,
+                          additional_dues, agency_lines)
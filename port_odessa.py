@@ -1,19 +0,0 @@
-# port_odessa.py
-
-FEES_WITHOUT_VAT = {
-    # Специфичные для Одессы сборы без VAT
-}
-
-FEES_WITH_VAT_WITH_MILES = {
-    # Специфичные для Одессы сборы с VAT и милями
-}
-
-FEES_WITH_VAT_WITHOUT_MILES = {
-    # Специфичные для Одессы сборы с VAT без миль
-}
-
-FEES_WITH_INCLUDED_VAT = {
-    # Сборы с включенным VAT для Одессы
-}
-
-VAT_RATE = 0.20  # Предположим, что ставка VAT та же
@@ -1,19 +0,0 @@
-# port_yuzhny.py
-
-FEES_WITHOUT_VAT = {
-    # Специфичные для Южного сборы без VAT
-}
-
-FEES_WITH_VAT_WITH_MILES = {
-    # Специфичные для Южного сборы с VAT и милями
-}
-
-FEES_WITH_VAT_WITHOUT_MILES = {
-    # Специфичные для Южного сборы с VAT без миль
-}
-
-FEES_WITH_INCLUDED_VAT = {
-    # Сборы с включенным VAT для Южного
-}
-
-VAT_RATE = 0.20  # Предположим, что ставка VAT та же
@@ -0,0 +1,201 @@
+# proforma_document.py
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import logging
+
+from constants import START_ROW_FEES, START_ROW_AGENCY_FEES, TEMPLATE_PATH, PDF_ENGINE
+from conversion_service import CONVERSION_TIMEOUT
+from template_index import load_template_index, report_placeholders
+from template_cache import load_template
+from utils import format_amount, parse_input
+from perf import span
+
+logger = logging.getLogger(__name__)
+
+# Плейсхолдеры строки-образца таблицы сборов в template.xlsx
+FEE_TABLE_MARKERS = ('fee.name', 'fee.vat', 'fee.amount')
+
+
+def build_replacements(calculation, inputs):
+    """Готовит значения плейсхолдеров шаблона проформы: имя плейсхолдера без скобок -> текст."""
+    agency_rows = calculation.get_agency_display_data()
+    return {
+        'cv': format_amount(calculation.cv),
+        'port': inputs['port'],
+        'enter_port': inputs['port'],
+        'vessel_name': inputs.get('vessel_name', ''),
+        'vessel_flag': inputs.get('vessel_flag', ''),
+        'cargo_loaded': inputs.get('cargo_loaded', ''),
+        'cargo_qtty': inputs.get('cargo_qtty', ''),
+        'lbp': format_amount(parse_input(inputs['lbp'])),
+        'beam': format_amount(parse_input(inputs['beam'])),
+        'rdm': format_amount(parse_input(inputs['rdm'])),
+        'Account_name': inputs.get('acc_name', ''),
+        'subtotal_dues': format_amount(calculation.subtotal_dues),
+        'subtotal_agfee': format_amount(calculation.subtotal_agency_fees),
+        'total': format_amount(calculation.total_amount),
+        'total_vat': format_amount(calculation.total_vat),
+        # Agency fee и Bank charges — первые строки Agency Fees ведомости
+        'agency_fee': agency_rows[0][2],
+        'bank_charges': agency_rows[1][2],
+        # Плейсхолдеры для фиксированных ставок овертайма
+        'total_fee_25_ot': format_amount(calculation.fixed_totals[0.25]['total_fee']),
+        'total_agency_fee_25_ot': format_amount(calculation.fixed_totals[0.25]['total_agency_fee']),
+        'grand_total_25_ot': format_amount(calculation.fixed_totals[0.25]['grand_total']),
+        'total_fee_50_ot': format_amount(calculation.fixed_totals[0.50]['total_fee']),
+        'total_agency_fee_50_ot': format_amount(calculation.fixed_totals[0.50]['total_agency_fee']),
+        'grand_total_50_ot': format_amount(calculation.fixed_totals[0.50]['grand_total']),
+        'total_fee_100_ot': format_amount(calculation.fixed_totals[1.00]['total_fee']),
+        'total_agency_fee_100_ot': format_amount(calculation.fixed_totals[1.00]['total_agency_fee']),
+        'grand_total_100_ot': format_amount(calculation.fixed_totals[1.00]['grand_total']),
+    }
+
+
+def fill_proforma(ws, calculation, inputs):
+    """Заполняет лист шаблона данными расчёта."""
+    values = build_replacements(calculation, inputs)
+    # Маркеры строки таблицы сборов очищаются, строки заполняются ниже
+    values.update({marker: '' for marker in FEE_TABLE_MARKERS})
+
+    # Замена плейсхолдеров только в ячейках из индекса шаблона
+    index = load_template_index(TEMPLATE_PATH)
+    report_placeholders(index, values, os.path.basename(TEMPLATE_PATH))
+    index.fill(ws, values)
+
+    # Заполнение таблицы сборов (только Dues)
+    current_row = START_ROW_FEES
+    for name, vat_display, total_display in calculation.get_fee_display_data():
+        ws.cell(row=current_row, column=1).value = name
+        ws.cell(row=current_row, column=5).value = vat_display
+        ws.cell(row=current_row, column=7).value = total_display
+        current_row += 1
+
+    # Agency fee, Bank charges и дополнительные Fees — строки ведомости, чтобы сумма совпала с подытогом
+    current_row = START_ROW_AGENCY_FEES
+    for name, _, total_display in calculation.get_agency_display_data():
+        ws.cell(row=current_row, column=1).value = name
+        ws.cell(row=current_row, column=7).value = total_display
+        current_row += 1
+
+
+def render_xlsx(calculation, inputs, xlsx_path):
+    """Заполняет шаблон проформы и сохраняет его в xlsx_path."""
+    if not os.path.exists(TEMPLATE_PATH):
+        raise FileNotFoundError(
+            f"Шаблон Excel не найден. Убедитесь, что '{TEMPLATE_PATH}' находится в директории проекта.")
+
+    with span("pdf.load_template"):
+        wb = load_template(TEMPLATE_PATH)
+    with span("pdf.fill_template"):
+        fill_proforma(wb.active, calculation, inputs)
+    with span("pdf.save_xlsx"):
+        wb.save(xlsx_path)
+
+
+def get_soffice_path():
+    """Возвращает путь к soffice или None, если LibreOffice не найден."""
+    if sys.platform.startswith('darwin'):
+        soffice_path = "/Applications/LibreOffice.app/Contents/MacOS/soffice"
+    elif sys.platform.startswith('win'):
+        soffice_path = os.path.join(os.environ.get("PROGRAMFILES", "C:\\Program Files"), "LibreOffice", "program",
+                                    "soffice.exe")
+        if not os.path.exists(soffice_path):
+            soffice_path = os.path.join(os.environ.get("PROGRAMFILES(X86)", "C:\\Program Files (x86)"),
+                                        "LibreOffice", "program", "soffice.exe")
+    elif sys.platform.startswith('linux'):
+        soffice_path = "/usr/bin/soffice"
+    else:
+        logger.error("Неизвестная операционная система. Необходимо вручную указать путь к 'soffice'.")
+        return None
+
+    if not os.path.exists(soffice_path):
+        logger.error(f"Не удалось найти soffice по пути: {soffice_path}")
+        return None
+
+    return soffice_path
+
+
+def convert_to_pdf(xlsx_path, outdir, soffice_path=None, timeout=CONVERSION_TIMEOUT):
+    """
+    Конвертирует xlsx в PDF отдельным запуском LibreOffice.
+    В GUI вместо этого используется постоянно запущенный ConversionService.
+
+    :return: Путь к сгенерированному PDF в outdir.
+    :raises RuntimeError: Если soffice не найден или конвертация не удалась.
+    """
+    soffice_path = soffice_path or get_soffice_path()
+    if not soffice_path:
+        raise RuntimeError("LibreOffice (soffice) не найден.")
+
+    conversion_command = [
+        soffice_path,
+        '--headless',
+        '--convert-to',
+        'pdf',
+        '--outdir',
+        outdir,
+        xlsx_path
+    ]
+
+    try:
+        conversion_result = subprocess.run(conversion_command, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"Конвертация Excel в PDF не завершилась за {timeout} с.")
+    if conversion_result.returncode != 0:
+        raise RuntimeError(f"Ошибка при конвертации Excel в PDF:\n{conversion_result.stderr}")
+
+    base_name = os.path.splitext(os.path.basename(xlsx_path))[0]
+    pdf_path = os.path.join(outdir, base_name + '.pdf')
+    if not os.path.exists(pdf_path):
+        raise RuntimeError("Сгенерированный PDF-файл не найден.")
+    return pdf_path
+
+
+def render_pdf(calculation, inputs, pdf_path, converter=None, engine=PDF_ENGINE, progress=None, xlsx_path=None):
+    """
+    Формирует PDF проформы.
+
+    :param engine: 'native' — встроенный рендерер без LibreOffice; 'libreoffice' — заполнение template.xlsx
+        и конвертация через soffice (если LibreOffice не найден, используется встроенный рендерер).
+    :param converter: ConversionService; если не задан, soffice запускается для одного документа.
+    :param progress: Необязательная функция progress(этап, процент), вызывается между этапами
+        (исключение из неё прерывает формирование — так отменяются задания GUI).
+    :param xlsx_path: Если задан, заполненный шаблон (для LibreOffice) сохраняется и туда.
+    """
+    if progress is None:
+        progress = lambda phase, percent: None
+
+    if engine == 'libreoffice' and converter is None and not get_soffice_path():
+        logger.warning("LibreOffice не найден, PDF формируется встроенным рендерером")
+        engine = 'native'
+
+    if engine == 'native':
+        from pdf_renderer import render_proforma_pdf
+        progress("Формирование PDF", 10)
+        with span("pdf.native_render"):
+            render_proforma_pdf(calculation, inputs, pdf_path)
+        return
+
+    logger.info(f"Начало генерации PDF по пути: {pdf_path}")
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        tmp_path = os.path.join(tmp_dir, 'proforma.xlsx')
+        progress("Заполнение шаблона", 10)
+        render_xlsx(calculation, inputs, tmp_path)
+        if xlsx_path is not None:
+            shutil.copyfile(tmp_path, xlsx_path)
+        progress("Конвертация в PDF", 40)
+        with span("pdf.convert"):
+            if converter is not None:
+                pdf_tmp_path = converter.convert(tmp_path, tmp_dir)
+            else:
+                pdf_tmp_path = convert_to_pdf(tmp_path, tmp_dir)
+        progress("Сохранение", 90)
+        with span("pdf.copy"):
+            shutil.copy(pdf_tmp_path, pdf_path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
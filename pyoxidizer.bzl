@@ -20,6 +20,11 @@ def make_dist():
                 dest="templates",
                 is_excluded=False,
             ),
+            Resource(
+                path="tariffs",
+                dest="tariffs",
+                is_excluded=False,
+            ),
         ],
         macos_app=MacOSApp(
             app_name="ProformaApp",
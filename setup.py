@@ -5,7 +5,7 @@ from cx_Freeze import setup, Executable
 
 build_exe_options = {
     "packages": ["os", "tkinter", "openpyxl", "ttkbootstrap", "PIL"],
-    "include_files": ["icons/", "templates/"],
+    "include_files": ["icons/", "templates/", "tariffs/", "conversion_service.py"],
 }
 
 base = None
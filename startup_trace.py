@@ -0,0 +1,147 @@
+# startup_trace.py
+"""
+Трассировка холодного старта: время импорта модулей и этапы до первого интерактивного кадра.
+
+Модуль импортируется первым в main.py и использует только стандартную библиотеку.
+Включается флагом --trace-startup или переменной окружения PROFORMA_TRACE_STARTUP=1.
+"""
+
+import os
+import sys
+import time
+
+# Момент, с которого считается старт, если время запуска процесса узнать нельзя
+_MODULE_LOADED = time.perf_counter()
+
+
+def _process_start():
+    """Время запуска процесса в шкале time.perf_counter() (Linux — из /proc, иначе — загрузка модуля)."""
+    try:
+        with open('/proc/self/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        started_ago = uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK')
+        return _MODULE_LOADED - max(started_ago, 0.0)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return _MODULE_LOADED
+
+
+PROCESS_START = _process_start()
+
+
+class _TimedLoader:
+    """Обёртка загрузчика, измеряющая выполнение модуля (с вложенными импортами)."""
+
+    def __init__(self, loader, name, tracer):
+        self._loader = loader
+        self._name = name
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        tracer = self._tracer
+        tracer._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = tracer._stack.pop()
+            if tracer._stack:
+                tracer._stack[-1] += elapsed
+            tracer.imports.append((self._name, elapsed - nested, elapsed))
+
+
+class StartupTracer:
+    """Перехватчик импорта (sys.meta_path) и отметки этапов старта."""
+
+    def __init__(self):
+        self.imports = []  # (модуль, собственное время, время с вложенными импортами)
+        self.phases = []  # (этап, секунды от старта процесса)
+        self._stack = []
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                spec.loader = _TimedLoader(spec.loader, name, self)
+            return spec
+        return None
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def mark(self, phase):
+        self.phases.append((phase, time.perf_counter() - PROCESS_START))
+
+    def report(self, top=20):
+        lines = ["Этапы старта (секунды от запуска процесса):"]
+        lines += [f"  {seconds:8.3f}  {phase}" for phase, seconds in self.phases]
+        total_imports = sum(self_time for _, self_time, _ in self.imports)
+        lines.append(f"Импортировано модулей: {len(self.imports)}, всего {total_imports:.3f} с")
+        lines.append(f"Самые медленные импорты (собственное / с вложенными, мс), первые {top}:")
+        for name, self_time, cumulative in sorted(self.imports, key=lambda item: item[1], reverse=True)[:top]:
+            lines.append(f"  {self_time * 1000:8.1f} {cumulative * 1000:9.1f}  {name}")
+        return '\n'.join(lines)
+
+
+_tracer = None
+
+
+def enabled():
+    return _tracer is not None
+
+
+def start(argv=None):
+    """Включает трассировку, если задан флаг --trace-startup / --startup-check или переменная окружения."""
+    global _tracer
+    argv = sys.argv if argv is None else argv
+    if not ('--trace-startup' in argv or '--startup-check' in argv or os.environ.get('PROFORMA_TRACE_STARTUP')):
+        return None
+    _tracer = StartupTracer()
+    _tracer.install()
+    _tracer.mark("интерпретатор запущен")
+    return _tracer
+
+
+def mark(phase):
+    """Отметка этапа старта; без трассировки ничего не делает."""
+    if _tracer is not None:
+        _tracer.mark(phase)
+
+
+def elapsed():
+    """Секунды от запуска процесса."""
+    return time.perf_counter() - PROCESS_START
+
+
+def finish(budget_seconds):
+    """
+    Завершает трассировку на первом интерактивном кадре: печатает отчёт в stderr
+    и сравнивает время старта с бюджетом.
+
+    :return: True, если старт уложился в бюджет.
+    """
+    seconds = elapsed()
+    within_budget = seconds <= budget_seconds
+    if _tracer is not None:
+        _tracer.mark("первый интерактивный кадр")
+        _tracer.uninstall()
+        verdict = "в пределах бюджета" if within_budget else "ПРЕВЫШЕН бюджет"
+        print(_tracer.report(), file=sys.stderr)
+        print(f"Старт до первого кадра: {seconds:.3f} с ({verdict} {budget_seconds:.3f} с)", file=sys.stderr)
+    return within_budget
@@ -0,0 +1,184 @@
+# tariff_registry.py
+
+import os
+import json
+import hashlib
+import threading
+import logging
+from collections import namedtuple
+
+from constants import TARIFFS_DIR
+
+logger = logging.getLogger(__name__)
+
+MILES_KEYS = ('miles_inward_in', 'miles_inward_out', 'miles_outward_in', 'miles_outward_out')
+DIRECTIONS = ('in', 'out')
+VAT_MODES = ('none', 'added', 'included')
+
+# Строка тарифа с явными признаками вместо разбора названия сбора
+TariffFee = namedtuple('TariffFee', ['name', 'coefficient', 'vat_applicable', 'vat_included', 'miles_key', 'direction'])
+
+
+class Tariff:
+    """
+    Скомпилированный тариф порта. Неизменяем: при изменении файла создаётся новый объект,
+    поэтому расчёты, уже получившие тариф, продолжают работать со своей версией.
+    """
+
+    __slots__ = ('port', 'vat_rate', 'fees', 'coefficients', 'version')
+
+    def __init__(self, port, vat_rate, fees, version):
+        object.__setattr__(self, 'port', port)
+        object.__setattr__(self, 'vat_rate', vat_rate)
+        object.__setattr__(self, 'fees', tuple(fees))
+        object.__setattr__(self, 'coefficients', tuple(fee.coefficient for fee in self.fees))
+        object.__setattr__(self, 'version', version)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Тариф нельзя изменять")
+
+    def __repr__(self):
+        return f"Tariff({self.port!r}, fees={len(self.fees)}, version={self.version[:12]})"
+
+
+def _compile_fee(port, item):
+    name = item.get('name')
+    if not name:
+        raise ValueError(f"Тариф порта {port}: у сбора не указано название")
+    vat = item.get('vat', 'none')
+    if vat not in VAT_MODES:
+        raise ValueError(f"Тариф порта {port}, сбор '{name}': недопустимый признак VAT '{vat}'")
+    miles_key = item.get('miles')
+    if miles_key is not None and miles_key not in MILES_KEYS:
+        raise ValueError(f"Тариф порта {port}, сбор '{name}': неизвестное поле миль '{miles_key}'")
+    direction = item.get('direction')
+    if direction is not None and direction not in DIRECTIONS:
+        raise ValueError(f"Тариф порта {port}, сбор '{name}': недопустимое направление '{direction}'")
+    if miles_key is not None and direction is None:
+        raise ValueError(f"Тариф порта {port}, сбор '{name}': для сбора с милями нужно направление")
+    return TariffFee(
+        name=name,
+        coefficient=float(item['coefficient']),
+        vat_applicable=vat != 'none',
+        vat_included=vat == 'included',
+        miles_key=miles_key,
+        direction=direction,
+    )
+
+
+def compile_tariff(data, version=''):
+    """Собирает Tariff из содержимого файла тарифа."""
+    port = data['port']
+    fees = [_compile_fee(port, item) for item in data.get('fees', [])]
+    names = [fee.name for fee in fees]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Тариф порта {port}: названия сборов повторяются")
+    return Tariff(port, float(data['vat_rate']), fees, version)
+
+
+def load_tariff_file(path):
+    with open(path, 'rb') as f:
+        content = f.read()
+    data = json.loads(content.decode('utf-8'))
+    return compile_tariff(data, hashlib.sha256(content).hexdigest())
+
+
+class _Entry:
+    __slots__ = ('stamp', 'tariff')
+
+    def __init__(self, stamp, tariff):
+        self.stamp = stamp
+        self.tariff = tariff
+
+
+class TariffRegistry:
+    """
+    Реестр тарифов портов: по одному файлу *.json на порт в каталоге tariffs.
+
+    Файлы читаются лениво, при первом расчёте по порту, и кэшируются; изменённый на диске файл
+    (mtime/размер) перечитывается при следующем обращении, так что новый порт или новые ставки
+    не требуют изменения кода и перезапуска.
+    """
+
+    def __init__(self, directory=TARIFFS_DIR):
+        self.directory = directory
+        self._paths = {}  # название порта -> путь к файлу
+        self._paths_stamp = None
+        self._entries = {}  # путь -> _Entry
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stamp(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _scan(self):
+        # Каталог пересканируется только при изменении его содержимого
+        stamp = self._stamp(self.directory)
+        if stamp == self._paths_stamp:
+            return
+        paths = {}
+        for file_name in sorted(os.listdir(self.directory)):
+            if not file_name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, file_name)
+            try:
+                with open(path, encoding='utf-8') as f:
+                    port = json.load(f)['port']
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Не удалось прочитать файл тарифа {path}: {e}")
+                continue
+            if port in paths:
+                logger.warning(f"Тариф порта {port} задан в нескольких файлах, используется {paths[port]}")
+                continue
+            paths[port] = path
+        self._paths = paths
+        self._paths_stamp = stamp
+
+    def ports(self):
+        """Названия портов, для которых есть тарифы."""
+        with self._lock:
+            self._scan()
+            return sorted(self._paths)
+
+    def get(self, port_name):
+        """Возвращает актуальный тариф порта."""
+        with self._lock:
+            path = self._paths.get(port_name)
+            if path is None or not os.path.exists(path):
+                self._scan()
+                path = self._paths.get(port_name)
+            if path is None:
+                raise ValueError("Unknown Port")
+
+            stamp = self._stamp(path)
+            entry = self._entries.get(path)
+            if entry is None or entry.stamp != stamp:
+                tariff = load_tariff_file(path)
+                if tariff.port != port_name:
+                    # Порт в файле переименовали — список портов нужно перестроить
+                    self._paths_stamp = None
+                    raise ValueError("Unknown Port")
+                if entry is not None:
+                    logger.info(f"Тариф порта {port_name} перечитан из {path}")
+                entry = _Entry(stamp, tariff)
+                self._entries[path] = entry
+            return entry.tariff
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._paths_stamp = None
+
+
+tariff_registry = TariffRegistry()
+
+
+def get_tariff(port_name):
+    """Тариф порта из общего реестра."""
+    return tariff_registry.get(port_name)
+
+
+def get_ports():
+    """Список портов для выбора в интерфейсе."""
+    return tariff_registry.ports()
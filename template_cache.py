@@ -0,0 +1,104 @@
+# template_cache.py
+
+import os
+import pickle
+import threading
+import logging
+from collections import OrderedDict
+
+from constants import TEMPLATE_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+class _CachedTemplate:
+    __slots__ = ('stamp', 'snapshot')
+
+    def __init__(self, stamp, snapshot):
+        self.stamp = stamp
+        self.snapshot = snapshot
+
+
+class TemplateCache:
+    """
+    Кэш разобранных шаблонов Excel.
+
+    Шаблон разбирается openpyxl один раз и хранится как снимок (pickle) уже разобранной книги:
+    восстановить из него независимую копию для документа на порядок дешевле, чем load_workbook.
+    Изменение файла на диске (mtime/размер) приводит к перезагрузке, а при превышении бюджета памяти
+    вытесняются давно не использовавшиеся шаблоны.
+    """
+
+    def __init__(self, max_bytes=TEMPLATE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # путь -> _CachedTemplate, от давно использованных к недавним
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stamp(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, path, stamp):
+        import openpyxl
+
+        logger.debug(f"Загрузка шаблона Excel {path}")
+        wb = openpyxl.load_workbook(path)
+        return _CachedTemplate(stamp, pickle.dumps(wb, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def _evict(self):
+        # Самый свежий шаблон остаётся, даже если он один больше бюджета
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            path, entry = self._entries.popitem(last=False)
+            self._size -= len(entry.snapshot)
+            logger.debug(f"Шаблон {path} вытеснен из кэша")
+
+    def get(self, path):
+        """Возвращает новую копию книги из шаблона path, которую можно свободно изменять."""
+        path = os.path.abspath(path)
+        stamp = self._stamp(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.stamp == stamp:
+                self._entries.move_to_end(path)
+                snapshot = entry.snapshot
+            else:
+                snapshot = None
+
+        if snapshot is None:
+            # Разбор шаблона — вне блокировки, чтобы не задерживать другие потоки
+            entry = self._load(path, stamp)
+            with self._lock:
+                previous = self._entries.pop(path, None)
+                if previous is not None:
+                    self._size -= len(previous.snapshot)
+                self._entries[path] = entry
+                self._size += len(entry.snapshot)
+                self._evict()
+            snapshot = entry.snapshot
+
+        return pickle.loads(snapshot)
+
+    def invalidate(self, path=None):
+        """Сбрасывает один шаблон или весь кэш."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._size = 0
+            else:
+                entry = self._entries.pop(os.path.abspath(path), None)
+                if entry is not None:
+                    self._size -= len(entry.snapshot)
+
+    @property
+    def size(self):
+        return self._size
+
+
+template_cache = TemplateCache()
+
+
+def load_template(path):
+    """Копия книги шаблона из общего кэша (замена openpyxl.load_workbook для шаблонов)."""
+    return template_cache.get(path)
@@ -0,0 +1,196 @@
+# template_index.py
+
+import os
+import re
+import json
+import hashlib
+import logging
+
+from constants import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 2
+PLACEHOLDER_PATTERN = re.compile(r'\{\{\s*([^{}]+?)\s*\}\}')
+
+
+def file_hash(path):
+    """SHA-256 содержимого файла."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TemplateIndex:
+    """
+    Скомпилированный шаблон: для каждого плейсхолдера {{name}} — координаты ячеек, где он встречается.
+    Заполнение трогает только эти ячейки вместо обхода всего листа.
+
+    Вместе с плейсхолдерами хранится раскладка листа для встроенного PDF-рендерера: постоянный текст
+    ячеек, их шрифт (размер, жирный), ширины колонок и высоты строк.
+    """
+
+    def __init__(self, template_hash, sheet_title, cells, layout=None):
+        self.template_hash = template_hash
+        self.sheet_title = sheet_title
+        self.cells = cells  # координата -> исходный текст ячейки
+        layout = layout or {}
+        self.static_texts = layout.get('static_texts', {})  # координата -> текст без плейсхолдеров
+        self.fonts = layout.get('fonts', {})  # координата -> [размер, жирный]
+        self.column_widths = layout.get('column_widths', {})  # буква колонки -> ширина в символах
+        self.row_heights = {int(row): height for row, height in layout.get('row_heights', {}).items()}
+        self.default_row_height = layout.get('default_row_height')
+        self.placeholders = {}  # имя плейсхолдера -> список координат
+        for coordinate, text in cells.items():
+            for name in PLACEHOLDER_PATTERN.findall(text):
+                coordinates = self.placeholders.setdefault(name, [])
+                if coordinate not in coordinates:
+                    coordinates.append(coordinate)
+
+    def to_dict(self):
+        return {
+            'version': INDEX_VERSION,
+            'template_hash': self.template_hash,
+            'sheet_title': self.sheet_title,
+            'cells': self.cells,
+            'layout': {
+                'static_texts': self.static_texts,
+                'fonts': self.fonts,
+                'column_widths': self.column_widths,
+                'row_heights': {str(row): height for row, height in self.row_heights.items()},
+                'default_row_height': self.default_row_height,
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['template_hash'], data['sheet_title'], data['cells'], data.get('layout'))
+
+    def check(self, expected_names):
+        """
+        Сверяет плейсхолдеры шаблона с теми, что умеет заполнять код.
+
+        :return: Кортеж (неизвестные — есть в шаблоне, но не заполняются; отсутствующие — заполняются, но их нет в шаблоне).
+        """
+        expected_names = set(expected_names)
+        unknown = sorted(set(self.placeholders) - expected_names)
+        missing = sorted(expected_names - set(self.placeholders))
+        return unknown, missing
+
+    def fill(self, ws, values):
+        """
+        Подставляет значения в ячейки с плейсхолдерами.
+        Плейсхолдеры, для которых нет значения, остаются в тексте как есть.
+        """
+        def substitute(match):
+            name = match.group(1)
+            return str(values[name]) if name in values else match.group(0)
+
+        for coordinate, text in self.cells.items():
+            ws[coordinate].value = PLACEHOLDER_PATTERN.sub(substitute, text)
+
+
+def compile_template(path, template_hash=None):
+    """
+    Сканирует активный лист шаблона один раз и собирает индекс плейсхолдеров и раскладку листа.
+    Лист загружается полностью (размеры строк и колонок недоступны в режиме read_only), но только
+    при изменении шаблона — дальше индекс берётся из кэша.
+    """
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path)
+    try:
+        ws = wb.active
+        cells = {}
+        static_texts = {}
+        fonts = {}
+        for row in ws.iter_rows():
+            for cell in row:
+                value = cell.value
+                if value is None or (isinstance(value, str) and not value.strip()):
+                    continue
+                fonts[cell.coordinate] = [float(cell.font.sz or 11), bool(cell.font.b)]
+                if isinstance(value, str) and PLACEHOLDER_PATTERN.search(value):
+                    cells[cell.coordinate] = value
+                elif not (isinstance(value, str) and value.startswith('=')):
+                    # Формулы (например, =TODAY()) вычисляет сам рендерер
+                    static_texts[cell.coordinate] = str(value)
+        layout = {
+            'static_texts': static_texts,
+            'fonts': fonts,
+            'column_widths': {letter: dimension.width for letter, dimension in ws.column_dimensions.items()
+                              if dimension.width},
+            'row_heights': {row: dimension.height for row, dimension in ws.row_dimensions.items()
+                            if dimension.height},
+            'default_row_height': ws.sheet_format.defaultRowHeight,
+        }
+        sheet_title = ws.title
+    finally:
+        wb.close()
+    return TemplateIndex(template_hash or file_hash(path), sheet_title, cells, layout)
+
+
+def _cache_path(path, template_hash, cache_dir):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, 'template_index', f"{name}-{template_hash[:16]}.json")
+
+
+_memory_cache = {}
+
+
+def load_template_index(path, cache_dir=CACHE_DIR):
+    """
+    Возвращает индекс шаблона. Индекс хранится на диске и в памяти и считается устаревшим,
+    как только меняется хэш файла шаблона.
+    """
+    template_hash = file_hash(path)
+    cached = _memory_cache.get(path)
+    if cached is not None and cached.template_hash == template_hash:
+        return cached
+
+    cache_path = _cache_path(path, template_hash, cache_dir)
+    index = None
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') == INDEX_VERSION and data.get('template_hash') == template_hash:
+            index = TemplateIndex.from_dict(data)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if index is None:
+        logger.info(f"Компиляция индекса плейсхолдеров шаблона {path}")
+        index = compile_template(path, template_hash)
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = cache_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(index.to_dict(), f, ensure_ascii=False)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить индекс шаблона в кэш: {e}")
+
+    _memory_cache[path] = index
+    return index
+
+
+_reported = set()
+
+
+def report_placeholders(index, expected_names, template_name):
+    """
+    Пишет в лог расхождения между плейсхолдерами шаблона и данными, которые заполняет код
+    (каждое расхождение — один раз, а не при каждом документе).
+    """
+    unknown, missing = index.check(expected_names)
+    key = (index.template_hash, tuple(unknown), tuple(missing))
+    if key in _reported:
+        return unknown, missing
+    _reported.add(key)
+    if unknown:
+        logger.warning(f"В шаблоне {template_name} есть неизвестные плейсхолдеры: {', '.join(unknown)}")
+    if missing:
+        logger.info(f"В шаблоне {template_name} нет плейсхолдеров: {', '.join(missing)}")
+    return unknown, missing
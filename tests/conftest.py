@@ -0,0 +1,12 @@
+# conftest.py
+
+import os
+import sys
+import tempfile
+
+# Модули приложения лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Кэши и данные тестов не должны смешиваться с пользовательскими
+os.environ.setdefault('PROFORMA_CACHE_DIR', tempfile.mkdtemp(prefix='proforma-test-cache-'))
+os.environ.setdefault('PROFORMA_DATA_DIR', tempfile.mkdtemp(prefix='proforma-test-data-'))
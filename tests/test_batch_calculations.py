@@ -0,0 +1,60 @@
+# test_batch_calculations.py
+
+import numpy as np
+
+from batch_calculations import calculate_fees_batch
+from calculations import calculate_proforma
+from constants import DEFAULT_INPUTS
+from fee_ledger import DUES, AGENCY_FEES
+from money import round_half_up, round_half_up_array
+from tariff_registry import get_ports, MILES_KEYS
+
+
+def random_fleet(size, seed=17):
+    rng = np.random.default_rng(seed)
+    columns = {
+        'lbp': np.round(rng.uniform(80, 300, size), 2),
+        'beam': np.round(rng.uniform(12, 50, size), 2),
+        'rdm': np.round(rng.uniform(5, 25, size), 2),
+        'overtime_in': rng.choice(['0%', '25%', '50%', '100%'], size),
+        'overtime_out': rng.choice(['0%', '25%', '50%', '100%'], size),
+        # Суммы на границе полуцента проверяют одинаковое округление в обоих расчётах
+        'agency_fee': np.round(rng.uniform(0, 3000, size), 2) + 0.005,
+        'bank_charges': rng.choice([0.125, 2.675, 190.0, 45.5], size),
+    }
+    for key in MILES_KEYS:
+        columns[key] = rng.integers(0, 30, size)
+    return columns
+
+
+def record_inputs(port, columns, row):
+    inputs = dict(DEFAULT_INPUTS, port=port, additional_dues=[], additional_fees=[])
+    for key, values in columns.items():
+        inputs[key] = str(values[row])
+    return inputs
+
+
+def test_batch_matches_scalar_calculator():
+    columns = random_fleet(40)
+    for port in get_ports():
+        result = calculate_fees_batch(port, columns)
+        for row in range(len(result)):
+            calculation = calculate_proforma(record_inputs(port, columns, row))
+            ledger = calculation.ledger
+            assert result.fee_names == ledger.names
+            assert result.cv[row] == calculation.cv
+            assert list(result.amount_minor[row]) == list(ledger.amounts)
+            assert list(result.vat_amount_minor[row]) == list(ledger.vat_amounts)
+            assert list(result.total_amount_minor[row]) == list(ledger.totals)
+            assert result.subtotal_dues_minor[row] == ledger.subtotals[DUES]
+            assert result.subtotal_agency_fees_minor[row] == ledger.subtotals[AGENCY_FEES]
+            assert result.total_vat_minor[row] == calculation.total_vat_minor
+            assert result.grand_total_minor[row] == calculation.total_amount_minor
+
+
+def test_array_rounding_matches_scalar():
+    values = np.array([0.5, 1.5, 2.5, -0.5, -2.5, 267.5, 267.49999999, 0.4999, 12.5 * 3, 1e9 + 0.5])
+    values = np.concatenate([values, np.array([0.125, 2.675, 1000.005, 0.285]) * 100])
+    assert list(round_half_up_array(values)) == [round_half_up(value) for value in values]
+    assert round_half_up(2.675 * 100) == 268
+    assert round_half_up(-0.5) == -1
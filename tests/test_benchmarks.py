@@ -0,0 +1,32 @@
+# test_benchmarks.py
+
+import os
+
+import pytest
+
+import benchmarks
+
+
+def results(**medians):
+    return {'results': {name: {'median_s': median} for name, median in medians.items()}}
+
+
+def test_compare_flags_regressions_over_threshold():
+    rows = benchmarks.compare(results(fast=1.0, slow=1.3, new=0.5), results(fast=1.0, slow=1.0), threshold=0.2)
+    assert [(name, regression) for name, _, _, _, regression in rows] == [
+        ('fast', False), ('slow', True), ('new', False)]
+    assert rows[2][1] is None and rows[2][3] is None
+
+
+@pytest.mark.parametrize('previous', [None, 'uno'])
+def test_libreoffice_cases_restore_converter_environment(monkeypatch, previous):
+    if previous is None:
+        monkeypatch.delenv('PROFORMA_CONVERTER', raising=False)
+    else:
+        monkeypatch.setenv('PROFORMA_CONVERTER', previous)
+    monkeypatch.setattr(benchmarks, 'POOL_DOCUMENTS', 4)
+    monkeypatch.setattr(benchmarks, 'POOL_INSTANCES', 2)
+
+    measured = benchmarks.run_benchmarks(['pdf.libreoffice'], repeat=1)
+    assert set(measured['results']) == {'pdf.libreoffice_stub', 'pdf.libreoffice_pool'}
+    assert os.environ.get('PROFORMA_CONVERTER') == previous
@@ -0,0 +1,96 @@
+# test_calculations.py
+
+import pytest
+
+from calculations import calculate_proforma, fee_calculator, FIXED_OVERTIME_RATES
+from calculations import changed_fields, fee_dependencies, CV_FIELDS
+from constants import DEFAULT_INPUTS
+
+
+def proforma_inputs(**overrides):
+    inputs = dict(DEFAULT_INPUTS, lbp='199.9', beam='32.26', rdm='12.5', agency_fee='1000.005',
+                  additional_dues=[{'name': 'Extra due', 'amount': '100.125'}],
+                  additional_fees=[{'name': 'Courier', 'amount': '2.675'}])
+    inputs.update(overrides)
+    return inputs
+
+
+@pytest.mark.parametrize('overtime_in, overtime_out', [('0%', '0%'), ('50%', '25%')])
+def test_overtime_grid_matches_full_calculation(overtime_in, overtime_out):
+    calculation = calculate_proforma(proforma_inputs(overtime_in=overtime_in, overtime_out=overtime_out))
+    for rate_in in FIXED_OVERTIME_RATES:
+        for rate_out in FIXED_OVERTIME_RATES:
+            full = calculate_proforma(proforma_inputs(overtime_in=f"{rate_in:.0%}", overtime_out=f"{rate_out:.0%}"))
+            totals = calculation.overtime_totals[(rate_in, rate_out)]
+            assert totals['total_fee'] == full.subtotal_dues
+            assert totals['total_agency_fee'] == full.subtotal_agency_fees
+            assert totals['grand_total'] == full.total_amount
+    for rate in FIXED_OVERTIME_RATES:
+        assert calculation.fixed_totals[rate] == calculation.overtime_totals[(rate, rate)]
+
+
+def assert_same_calculation(calculation, expected):
+    assert calculation.cv == expected.cv
+    assert calculation.ledger.names == expected.ledger.names
+    assert list(calculation.ledger.amounts) == list(expected.ledger.amounts)
+    assert list(calculation.ledger.vat_amounts) == list(expected.ledger.vat_amounts)
+    assert list(calculation.ledger.totals) == list(expected.ledger.totals)
+    assert calculation.ledger.subtotals == expected.ledger.subtotals
+    assert calculation.total_vat_minor == expected.total_vat_minor
+    assert calculation.total_amount_minor == expected.total_amount_minor
+    assert dict(calculation.overtime_totals) == dict(expected.overtime_totals)
+    assert calculation.additional_dues == expected.additional_dues
+    assert calculation.additional_fees == expected.additional_fees
+
+
+# Изменения формы по одному полю графа зависимостей
+EDITS = [
+    {'lbp': '210.35'},
+    {'beam': '30'},
+    {'rdm': '11.005'},
+    {'miles_inward_in': '3'},
+    {'miles_outward_out': '0'},
+    {'overtime_in': '25%'},
+    {'overtime_out': '100%'},
+    {'agency_fee': '1500.125'},
+    {'bank_charges': '0.285'},
+    {'vat': '0'},
+    {'vessel_name': 'OCEAN'},
+    {'additional_dues': [{'name': 'Extra due', 'amount': '2.675'}]},
+    {'additional_dues': [{'name': 'Renamed due', 'amount': '100.125'}]},
+    {'additional_fees': [{'name': 'Courier', 'amount': '0.125'}]},
+]
+
+
+@pytest.mark.parametrize('edit', EDITS)
+def test_recalculate_matches_full_calculation(edit):
+    previous = calculate_proforma(proforma_inputs())
+    inputs = proforma_inputs(**edit)
+    calculation, changed = fee_calculator.recalculate(previous, inputs)
+    assert_same_calculation(calculation, calculate_proforma(inputs))
+
+    graph = fee_dependencies(previous.tariff, len(previous.additional_dues), len(previous.additional_fees))
+    affected = set()
+    for field in changed_fields(previous.inputs, inputs):
+        affected.update(graph.get(field, ()))
+        if field in CV_FIELDS:
+            affected.update(graph['cv'])
+    assert changed <= affected
+
+
+def test_recalculate_chain_matches_full_calculation():
+    calculation = calculate_proforma(proforma_inputs())
+    inputs = proforma_inputs()
+    for edit in EDITS:
+        inputs = dict(inputs, **edit)
+        calculation, _ = fee_calculator.recalculate(calculation, inputs)
+        assert_same_calculation(calculation, calculate_proforma(inputs))
+
+
+def test_recalculate_falls_back_when_structure_changes():
+    previous = calculate_proforma(proforma_inputs())
+    for edit in [{'port': 'Odesa'}, {'additional_fees': []}]:
+        inputs = proforma_inputs(**edit)
+        calculation, changed = fee_calculator.recalculate(previous, inputs)
+        assert changed is None
+        assert_same_calculation(calculation, calculate_proforma(inputs))
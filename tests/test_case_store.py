@@ -0,0 +1,41 @@
+# test_case_store.py
+
+from calculations import calculate_proforma, fee_calculator
+from case_store import CaseStore
+from constants import DEFAULT_INPUTS
+from variance_history import VarianceHistory
+import fda_batch
+import variance_history
+
+
+def proforma_inputs(**values):
+    inputs = dict(DEFAULT_INPUTS, lbp='199.9', beam='32.26', rdm='12.5', additional_dues=[], additional_fees=[])
+    inputs.update(values)
+    return inputs
+
+
+def test_matches_only_the_stored_calculation():
+    store = CaseStore(':memory:')
+    calculation = calculate_proforma(proforma_inputs())
+    case_id = store.add_case(calculation)
+    assert store.matches(case_id, calculation)
+
+    recalculated, _ = fee_calculator.recalculate(calculation, proforma_inputs(rdm='13.5'))
+    assert not store.matches(case_id, recalculated)
+    assert not store.matches(case_id + 1, calculation)
+
+
+def test_record_actuals_uses_stored_pda_lines(tmp_path, monkeypatch):
+    store = CaseStore(':memory:')
+    history = VarianceHistory(str(tmp_path))
+    monkeypatch.setattr(variance_history, '_history', history)
+    calculation = calculate_proforma(proforma_inputs())
+    case_id = store.add_case(calculation)
+    line = calculation.get_fees_and_dues()[0]
+
+    fda_batch.record_actuals(store, case_id, {line.name: line.total_amount + 10})
+
+    assert store.load_fda(case_id) == {line.name: line.total_amount + 10}
+    row, = history.report('fee')
+    assert row['pda'] == line.total_amount
+    assert row['variance'] == 10
@@ -0,0 +1,79 @@
+# test_cli.py
+
+import os
+import csv
+import json
+
+from calculations import calculate_proforma
+from cli import normalize_record, run_batch
+from constants import DEFAULT_INPUTS
+
+RECORDS = [
+    {'id': 'MV-OCEAN', 'vessel_name': 'OCEAN', 'port': 'Chornomorsk', 'lbp': '199,9', 'beam': 32.26, 'rdm': 12.5,
+     'overtime_in': '25%', 'agency_fee': '1000.005',
+     'additional_dues': [{'name': 'Extra due', 'amount': 100.125}]},
+    {'id': 'MV-BROKEN', 'port': 'Chornomorsk', 'lbp': 'abc', 'beam': 32, 'rdm': 12},
+    {'id': 'MV-RIVER', 'vessel_name': 'RIVER', 'port': 'Pivdenniy', 'lbp': 120, 'beam': 20, 'rdm': 8.4,
+     'overtime_out': '100%', 'additional_fees': [{'name': 'Courier', 'amount': '2.675'}]},
+]
+
+
+def read_totals(output_dir):
+    with open(output_dir / 'totals.csv', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def assert_totals_match(rows):
+    assert [row['record'] for row in rows] == [record['id'] for record in RECORDS]
+    for row, record in zip(rows, RECORDS):
+        if record['id'] == 'MV-BROKEN':
+            assert row['error'] and not row['total']
+            continue
+        calculation = calculate_proforma(normalize_record(record))
+        assert not row['error']
+        assert float(row['cv']) == calculation.cv
+        assert row['subtotal_dues'] == f"{calculation.subtotal_dues:.2f}"
+        assert row['subtotal_agency_fees'] == f"{calculation.subtotal_agency_fees:.2f}"
+        assert row['total'] == f"{calculation.total_amount:.2f}"
+        assert row['grand_total_100_ot'] == f"{calculation.fixed_totals[1.00]['grand_total']:.2f}"
+
+
+def test_normalize_record_fills_form_defaults():
+    inputs = normalize_record({'lbp': 199.9, 'agency_fee': '', 'additional_fees': '[{"name": "X", "amount": 5}]'})
+    assert inputs['lbp'] == '199.9'
+    assert inputs['agency_fee'] == DEFAULT_INPUTS['agency_fee']
+    assert inputs['additional_dues'] == []
+    assert inputs['additional_fees'] == [{'name': 'X', 'amount': '5'}]
+
+
+def test_jsonl_batch_matches_calculator(tmp_path):
+    input_path = tmp_path / 'records.jsonl'
+    input_path.write_text('\n'.join(json.dumps(record) for record in RECORDS), encoding='utf-8')
+
+    assert run_batch(str(input_path), str(tmp_path / 'out')) == (2, 1)
+    assert_totals_match(read_totals(tmp_path / 'out'))
+
+
+def test_csv_batch_matches_calculator(tmp_path):
+    input_path = tmp_path / 'records.csv'
+    columns = sorted({key for record in RECORDS for key in record})
+    with open(input_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for record in RECORDS:
+            writer.writerow({key: json.dumps(value) if isinstance(value, list) else value
+                             for key, value in record.items()})
+
+    assert run_batch(str(input_path), str(tmp_path / 'out')) == (2, 1)
+    assert_totals_match(read_totals(tmp_path / 'out'))
+
+
+def test_batch_writes_native_pdf_documents(tmp_path):
+    input_path = tmp_path / 'records.jsonl'
+    input_path.write_text('\n'.join(json.dumps(record) for record in RECORDS), encoding='utf-8')
+
+    run_batch(str(input_path), str(tmp_path / 'out'), document_format='pdf', engine='native')
+    rows = read_totals(tmp_path / 'out')
+    assert [os.path.basename(row['document']) for row in rows] == ['MV-OCEAN_OCEAN.pdf', '', 'MV-RIVER_RIVER.pdf']
+    with open(rows[0]['document'], 'rb') as f:
+        assert f.read(5) == b'%PDF-'
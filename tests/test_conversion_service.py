@@ -0,0 +1,198 @@
+# test_conversion_service.py
+
+import os
+import sys
+import json
+import threading
+import subprocess
+
+import pytest
+
+import conversion_service
+from conversion_service import (ConversionService, ConversionPool, ConversionError, ConversionTimeout,
+                                WORKER_FLAG)
+
+# Заглушка soffice: "конвертирует" файлы копированием; имена с fail — ошибка, с hang — зависание
+STUB_SOFFICE = '''#!{python}
+import os, shutil, sys, time
+args = sys.argv[1:]
+position = args.index('--outdir')
+outdir = args[position + 1]
+for src in args[position + 2:]:
+    name = os.path.basename(src)
+    if 'hang' in name:
+        time.sleep(60)
+    if 'fail' in name:
+        sys.stderr.write('cannot convert ' + name)
+        continue
+    shutil.copy(src, os.path.join(outdir, os.path.splitext(name)[0] + '.pdf'))
+'''
+
+
+@pytest.fixture
+def stub_soffice(tmp_path, monkeypatch):
+    monkeypatch.setenv('PROFORMA_CONVERTER', 'command')
+    path = tmp_path / 'soffice'
+    path.write_text(STUB_SOFFICE.format(python=sys.executable), encoding='utf-8')
+    path.chmod(0o755)
+    return str(path)
+
+
+def source_file(directory, name):
+    path = os.path.join(directory, name)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(name)
+    return path
+
+
+def test_worker_json_lines_protocol(stub_soffice, tmp_path):
+    ok_path = source_file(tmp_path, 'ok.xlsx')
+    fail_path = source_file(tmp_path, 'fail.xlsx')
+    requests = [
+        {'op': 'ping', 'id': 1},
+        {'op': 'convert', 'id': 2, 'src': ok_path, 'outdir': str(tmp_path)},
+        {'op': 'convert', 'id': 3, 'src': fail_path, 'outdir': str(tmp_path)},
+        {'op': 'convert_many', 'id': 4, 'srcs': [ok_path, fail_path], 'outdir': str(tmp_path)},
+        {'op': 'unknown', 'id': 5},
+        {'op': 'shutdown'},
+    ]
+    result = subprocess.run(
+        [sys.executable, conversion_service.__file__, WORKER_FLAG, stub_soffice, str(tmp_path / 'profile')],
+        input=''.join(json.dumps(request) + '\n' for request in requests),
+        capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0
+    ready, ping, converted, failed, many, unknown = [json.loads(line) for line in result.stdout.splitlines()]
+
+    assert ready['op'] == 'ready' and ready['mode'] == 'command' and ready['fallback_reason'] is None
+    assert ping == {'id': 1, 'ok': True}
+    assert converted == {'id': 2, 'ok': True, 'pdf': str(tmp_path / 'ok.pdf')}
+    assert failed['id'] == 3 and not failed['ok']
+    assert many['id'] == 4 and [item['ok'] for item in many['results']] == [True, False]
+    assert unknown['id'] == 5 and not unknown['ok']
+
+
+def test_service_restarts_after_worker_crash(stub_soffice, tmp_path):
+    service = ConversionService(stub_soffice, str(tmp_path / 'profile'), timeout=20)
+    try:
+        assert service.convert(source_file(tmp_path, 'first.xlsx'), str(tmp_path)) == str(tmp_path / 'first.pdf')
+        first_pid = service._process.pid
+        service._process.kill()
+        service._process.wait()
+
+        assert service.convert(source_file(tmp_path, 'second.xlsx'), str(tmp_path)) == str(tmp_path / 'second.pdf')
+        assert service._process.pid != first_pid
+    finally:
+        service.stop()
+
+
+def test_service_restarts_after_timeout(stub_soffice, tmp_path):
+    service = ConversionService(stub_soffice, str(tmp_path / 'profile'), timeout=20)
+    try:
+        assert service.ping()
+        with pytest.raises(ConversionTimeout):
+            service.convert(source_file(tmp_path, 'hang.xlsx'), str(tmp_path), timeout=1)
+        assert service._process is None
+        assert service.convert(source_file(tmp_path, 'after.xlsx'), str(tmp_path)) == str(tmp_path / 'after.pdf')
+    finally:
+        service.stop()
+
+
+def test_service_reports_fallback_without_uno(tmp_path, monkeypatch, stub_soffice):
+    monkeypatch.delenv('PROFORMA_CONVERTER')
+    if conversion_service._uno_importable():
+        pytest.skip("python-uno установлен")
+    service = ConversionService(stub_soffice, str(tmp_path / 'profile'), timeout=20)
+    try:
+        assert service.status() == "не запущен"
+        assert service.ping()
+        assert service.mode == 'command'
+        assert 'python-uno' in service.fallback_reason
+        assert 'python-uno' in service.status()
+    finally:
+        service.stop()
+
+
+def test_pool_converts_batches_and_stops(stub_soffice, tmp_path):
+    outdir = tmp_path / 'out'
+    outdir.mkdir()
+    pool = ConversionPool(stub_soffice, instances=2, profile_dir=str(tmp_path / 'profile'), batch_size=4)
+    futures = [pool.submit(source_file(tmp_path, f"{index}.xlsx"), str(outdir)) for index in range(10)]
+    failing = pool.submit(source_file(tmp_path, 'fail.xlsx'), str(outdir))
+    pool.stop()
+
+    assert [future.result(0) for future in futures] == [str(outdir / f"{index}.pdf") for index in range(10)]
+    with pytest.raises(ConversionError):
+        failing.result(0)
+    assert all(service._process is None for service in pool.services)
+    assert not any(thread.is_alive() for thread in pool._threads)
+    with pytest.raises(ConversionError):
+        pool.submit(source_file(tmp_path, 'late.xlsx'), str(outdir))
+
+
+def test_pool_completes_every_job_submitted_during_stop(stub_soffice, tmp_path):
+    outdir = tmp_path / 'out'
+    outdir.mkdir()
+    pool = ConversionPool(stub_soffice, instances=2, profile_dir=str(tmp_path / 'profile'), batch_size=2)
+    futures = []
+    rejected = []
+
+    def submit_many(prefix):
+        for index in range(20):
+            try:
+                futures.append(pool.submit(source_file(tmp_path, f"{prefix}-{index}.xlsx"), str(outdir)))
+            except ConversionError:
+                rejected.append(index)
+
+    submitters = [threading.Thread(target=submit_many, args=(prefix,)) for prefix in 'ab']
+    for thread in submitters:
+        thread.start()
+    pool.stop()
+    for thread in submitters:
+        thread.join()
+
+    assert len(futures) + len(rejected) == 40
+    for future in futures:
+        assert future.result(timeout=10).endswith('.pdf')
+
+
+def test_pool_fails_jobs_left_after_stop(tmp_path):
+    pool = ConversionPool('soffice', instances=1, profile_dir=str(tmp_path / 'profile'))
+    pool._queue.put(None)
+    pool._threads[0].join()
+    future = pool.submit(str(tmp_path / 'orphan.xlsx'), str(tmp_path))
+    pool.stop()
+    with pytest.raises(ConversionError):
+        future.result(timeout=1)
+
+
+def test_pool_splits_same_names_across_invocations(tmp_path):
+    batch = [('/a/1.xlsx', '/out', None), ('/b/1.xlsx', '/out', None), ('/a/2.xlsx', '/other', None)]
+    invocations = ConversionPool._invocations(batch)
+    assert [(outdir, [job[0] for job in jobs]) for outdir, jobs in invocations] == [
+        ('/out', ['/a/1.xlsx']), ('/out', ['/b/1.xlsx']), ('/other', ['/a/2.xlsx'])]
+
+
+def test_office_python_is_found_next_to_soffice(tmp_path):
+    program_dir = tmp_path / 'program'
+    program_dir.mkdir()
+    (program_dir / 'soffice').write_text('')
+    assert conversion_service.find_office_python(str(program_dir / 'soffice')) is None
+    python = program_dir / 'python'
+    python.write_text('')
+    python.chmod(0o755)
+    assert conversion_service.find_office_python(str(program_dir / 'soffice')) == str(python)
+
+
+def test_worker_runs_on_office_python_without_uno(tmp_path, monkeypatch):
+    monkeypatch.delenv('PROFORMA_CONVERTER', raising=False)
+    monkeypatch.setattr(conversion_service, '_uno_importable', lambda: False)
+    program_dir = tmp_path / 'program'
+    program_dir.mkdir()
+    soffice = str(program_dir / 'soffice')
+    assert conversion_service._worker_command(soffice, 'profile')[0] == sys.executable
+
+    python = program_dir / 'python'
+    python.write_text('')
+    python.chmod(0o755)
+    assert conversion_service._worker_command(soffice, 'profile') == [
+        str(python), os.path.abspath(conversion_service.__file__), WORKER_FLAG, soffice, 'profile']
@@ -0,0 +1,48 @@
+# test_document_cache.py
+
+import datetime
+import hashlib
+
+import document_cache
+from calculations import calculate_proforma
+from constants import DEFAULT_INPUTS
+from document_cache import DocumentCache, KEY_LOCK_STRIPES, document_key
+
+
+def proforma_calculation():
+    return calculate_proforma(dict(DEFAULT_INPUTS, lbp='199.9', beam='32.26', rdm='12.5',
+                                   additional_dues=[], additional_fees=[]))
+
+
+class FixedDate(datetime.date):
+    day_offset = 0
+
+    @classmethod
+    def today(cls):
+        return datetime.date(2026, 10, 17) + datetime.timedelta(days=cls.day_offset)
+
+
+def test_key_changes_with_template_for_every_engine(monkeypatch):
+    calculation = proforma_calculation()
+    for engine in ('native', 'libreoffice'):
+        monkeypatch.setattr(document_cache, 'template_hash', lambda: 'old')
+        old_key = document_key(calculation, engine)
+        monkeypatch.setattr(document_cache, 'template_hash', lambda: 'new')
+        assert document_key(calculation, engine) != old_key
+
+
+def test_key_changes_with_document_date(monkeypatch):
+    calculation = proforma_calculation()
+    monkeypatch.setattr(document_cache.datetime, 'date', FixedDate)
+    today_key = document_key(calculation, 'native')
+    assert document_key(calculation, 'native') == today_key
+    monkeypatch.setattr(FixedDate, 'day_offset', 1)
+    assert document_key(calculation, 'native') != today_key
+
+
+def test_key_locks_are_bounded(tmp_path):
+    cache = DocumentCache(str(tmp_path))
+    keys = [hashlib.sha256(str(number).encode()).hexdigest() for number in range(100 * KEY_LOCK_STRIPES)]
+    locks = {id(cache.key_lock(key)) for key in keys}
+    assert len(locks) == KEY_LOCK_STRIPES
+    assert cache.key_lock(keys[0]) is cache.key_lock(keys[0])
@@ -0,0 +1,27 @@
+# test_fda_batch.py
+
+import csv
+import json
+
+from fda_batch import run_fda_batch
+
+
+def test_duplicate_record_id_is_a_line_error(tmp_path):
+    manifest_path = tmp_path / 'manifest.jsonl'
+    records = [
+        {'id': 'MV-OCEAN', 'actuals': {'Agency fee': 1500}},
+        {'id': 'MV-OCEAN', 'actuals': {'Agency fee': 1600}},
+        {'id': 'MV-RIVER', 'actuals': {'Bank charges': 45}},
+    ]
+    manifest_path.write_text('\n'.join(json.dumps(record) for record in records), encoding='utf-8')
+    output_dir = tmp_path / 'out'
+
+    assert run_fda_batch(str(manifest_path), str(output_dir), jobs=2, record=False) == (2, 1)
+
+    with open(output_dir / 'fda_summary.csv', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [(row['line'], row['record']) for row in rows] == [('1', 'MV-OCEAN'), ('2', 'MV-OCEAN'), ('3', 'MV-RIVER')]
+    assert rows[0]['document'] and not rows[0]['error']
+    assert not rows[1]['document'] and 'строке 1' in rows[1]['error']
+    assert sorted(path.name for path in output_dir.iterdir()) == ['FDA_MV-OCEAN.xlsx', 'FDA_MV-RIVER.xlsx',
+                                                                   'fda_summary.csv']
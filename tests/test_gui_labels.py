@@ -0,0 +1,20 @@
+# test_gui_labels.py
+
+from calculations import calculate_proforma
+from constants import DEFAULT_INPUTS
+from fee_ledger import AGENCY_FEES
+from gui import agency_fee_labels
+from utils import format_amount
+
+
+def test_agency_fee_labels_match_subtotal():
+    inputs = dict(DEFAULT_INPUTS, lbp='199.9', beam='32.26', rdm='12.5', agency_fee='1500',
+                  additional_dues=[], additional_fees=[])
+    calculation = calculate_proforma(inputs)
+    agency_fee_text, bank_charges_text = agency_fee_labels(calculation.ledger)
+
+    agency_fee, bank_charges = calculation.ledger.lines(AGENCY_FEES)[:2]
+    assert agency_fee_text == f"Agency fee: {format_amount(agency_fee.total_amount)}"
+    assert bank_charges_text == f"Bank charges: {format_amount(bank_charges.total_amount)}"
+    assert agency_fee.total_amount + bank_charges.total_amount == calculation.subtotal_agency_fees
+    assert bank_charges_text == "Bank charges: 190,00"
@@ -0,0 +1,12 @@
+# test_images.py
+
+from images import pil_image
+from proforma_document import TEMPLATE_PATH
+
+
+def test_pil_image_keeps_other_formats_for_templates():
+    from openpyxl import load_workbook
+
+    pil_image()
+    wb = load_workbook(TEMPLATE_PATH)
+    assert len(wb.active._images) == 1
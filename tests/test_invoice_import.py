@@ -0,0 +1,56 @@
+# test_invoice_import.py
+
+import pytest
+
+from invoice_import import FeeNameIndex, import_invoice, parse_invoice_amount
+
+FEE_NAMES = [
+    'Tonnage dues (In/out)', 'Canal dues (in/out)', 'Lighthouse dues', 'Berth dues', 'Sanitary dues',
+    'Administrative dues', 'Port information fee', 'Inward pilotage in', 'Inward pilotage out',
+    'Outward pilotage in', 'Outward pilotage out', 'Services of VTCS', 'Tugs in', 'Tugs out', 'Mooring in',
+    'Mooring out', 'Agency fee', 'Bank charges',
+]
+
+
+@pytest.mark.parametrize('description, expected, fuzzy', [
+    ("TONNAGE DUES IN/OUT", 'Tonnage dues (In/out)', False),
+    ("Berth dues", 'Berth dues', False),
+    ("Tonnage dues", 'Tonnage dues (In/out)', True),
+    ("Canal dues", 'Canal dues (in/out)', True),
+    ("Lighthouse dues for m/v OCEAN", 'Lighthouse dues', True),
+    ("Mooring in (25% overtime)", 'Mooring in', True),
+    ("Pilotage inward - in", 'Inward pilotage in', True),
+    ("VTCS services", 'Services of VTCS', True),
+    ("Sanitary due", 'Sanitary dues', True),
+    ("Bank charge", 'Bank charges', True),
+])
+def test_match_realistic_descriptions(description, expected, fuzzy):
+    assert FeeNameIndex(FEE_NAMES).match(description) == (expected, fuzzy)
+
+
+@pytest.mark.parametrize('description', ["Tugs", "Pilotage", "Dues", "Garbage removal", ""])
+def test_ambiguous_or_unknown_descriptions_stay_unmatched(description):
+    assert FeeNameIndex(FEE_NAMES).match(description) == (None, False)
+
+
+@pytest.mark.parametrize('text, amount', [
+    ("1 234,56", 1234.56), ("1,234.56", 1234.56), ("1.234,56", 1234.56), ("\xa0190,00", 190.0), (45, 45.0),
+])
+def test_parse_invoice_amount(text, amount):
+    assert parse_invoice_amount(text) == amount
+
+
+def test_import_csv_invoice(tmp_path):
+    path = tmp_path / 'invoice.csv'
+    path.write_text(
+        "No;Description;Qty;Amount\n"
+        "1;Tonnage dues;1;22 441,82\n"
+        "2;Mooring in (25% overtime);1;1 378,75\n"
+        "3;Mooring in (25% overtime);1;100,00\n"
+        "4;Tugs;2;5 000,00\n"
+        "5;Total;;28 920,57\n",
+        encoding='utf-8')
+    result = import_invoice(str(path), FEE_NAMES)
+    assert result.amounts == {'Tonnage dues (In/out)': 22441.82, 'Mooring in': 1478.75}
+    assert result.fuzzy == {'Tonnage dues': 'Tonnage dues (In/out)', 'Mooring in (25% overtime)': 'Mooring in'}
+    assert [line.description for line in result.unmatched] == ['Tugs', 'Total']
@@ -0,0 +1,41 @@
+# test_pdf_renderer.py
+
+import re
+import zlib
+
+from calculations import calculate_proforma
+from constants import DEFAULT_INPUTS, TEMPLATE_PATH
+from pdf_renderer import render_proforma_pdf
+
+
+def proforma_inputs():
+    return dict(DEFAULT_INPUTS, lbp='199.9', beam='32.26', rdm='12.5', vessel_name='OCEAN',
+                additional_dues=[], additional_fees=[])
+
+
+def page_content(pdf_path):
+    """Распакованные потоки PDF (содержимое страницы, шрифты)."""
+    with open(pdf_path, 'rb') as f:
+        data = f.read()
+    streams = re.findall(rb'/FlateDecode[^>]*>>\nstream\n(.*?)\nendstream', data, re.S)
+    return b'\n'.join(zlib.decompress(stream) for stream in streams)
+
+
+def test_static_text_follows_template(tmp_path):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(TEMPLATE_PATH)
+    wb.active['G1'] = 'NEW TERMINAL'
+    wb.active['D6'] = 'Odesa, Ukraine'
+    template_path = str(tmp_path / 'template.xlsx')
+    wb.save(template_path)
+
+    inputs = proforma_inputs()
+    pdf_path = str(tmp_path / 'proforma.pdf')
+    render_proforma_pdf(calculate_proforma(inputs), inputs, pdf_path, template_path=template_path)
+
+    content = page_content(pdf_path)
+    assert b'(NEW TERMINAL)' in content
+    assert b'(Odesa, Ukraine)' in content
+    assert b'(OLIR)' not in content
+    assert b'(OCEAN)' in content
@@ -0,0 +1,39 @@
+# test_port_comparison.py
+
+from calculations import calculate_proforma
+from constants import DEFAULT_INPUTS
+from port_comparison import compare_ports
+from tariff_registry import get_ports, get_tariff
+
+
+def proforma_inputs():
+    return dict(DEFAULT_INPUTS, lbp='199.9', beam='32.26', rdm='12.5', overtime_in='25%', overtime_out='50%',
+                additional_dues=[{'name': 'Extra due', 'amount': '100'}], additional_fees=[])
+
+
+def test_totals_match_per_port_calculation():
+    inputs = proforma_inputs()
+    comparison = compare_ports(inputs)
+    for port in comparison.ports:
+        totals = comparison.totals(port)
+        if not get_tariff(port).fees:
+            assert totals is None
+            continue
+        calculation = calculate_proforma(dict(inputs, port=port))
+        assert totals['subtotal_dues'] == calculation.subtotal_dues
+        assert totals['total'] == calculation.total_amount
+
+
+def test_cheapest_port_skips_tariffs_without_fees():
+    comparison = compare_ports(proforma_inputs())
+    priced = [port for port in get_ports() if get_tariff(port).fees]
+    assert comparison.cheapest_port() in priced
+    assert compare_ports(proforma_inputs(), ports=[port for port in get_ports() if port not in priced]) \
+        .cheapest_port() is None
+
+
+def test_additional_dues_shown_only_for_priced_ports():
+    comparison = compare_ports(proforma_inputs())
+    name, amounts = comparison.dues_table()[-1]
+    assert name == 'Extra due'
+    assert [amount is not None for amount in amounts] == list(comparison.priced)
@@ -0,0 +1,51 @@
+# test_proforma_document.py
+
+import re
+
+from calculations import calculate_proforma
+from constants import DEFAULT_INPUTS, START_ROW_AGENCY_FEES, TEMPLATE_PATH
+from pdf_renderer import render_proforma_pdf
+from proforma_document import fill_proforma
+from template_index import load_template_index
+from utils import parse_input
+from test_pdf_renderer import page_content
+
+# Суммы на границе округления: как float они печатались бы 1 000,00 + 0,12 + 2,67 при подытоге 1 002,82
+AGENCY_NAMES = ['Agency fee', 'Bank charges', 'Courier']
+
+
+def proforma_inputs():
+    return dict(DEFAULT_INPUTS, lbp='199.9', beam='32.26', rdm='12.5', agency_fee='1000.005', bank_charges='0.125',
+                additional_dues=[], additional_fees=[{'name': 'Courier', 'amount': '2.675'}])
+
+
+def to_minor(text):
+    return round(parse_input(text) * 100)
+
+
+def test_xlsx_agency_lines_sum_to_subtotal():
+    from openpyxl import load_workbook
+
+    inputs = proforma_inputs()
+    ws = load_workbook(TEMPLATE_PATH).active
+    fill_proforma(ws, calculate_proforma(inputs), inputs)
+
+    rows = range(START_ROW_AGENCY_FEES, START_ROW_AGENCY_FEES + len(AGENCY_NAMES))
+    assert [ws.cell(row=row, column=1).value for row in rows] == AGENCY_NAMES
+    amounts = [ws.cell(row=row, column=7).value for row in rows]
+    assert amounts == ['1 000,01', '0,13', '2,68']
+    coordinate, = load_template_index(TEMPLATE_PATH).placeholders['subtotal_agfee']
+    subtotal = ws[coordinate].value
+    assert sum(to_minor(amount) for amount in amounts) == to_minor(subtotal)
+
+
+def test_pdf_agency_lines_sum_to_subtotal(tmp_path):
+    inputs = proforma_inputs()
+    pdf_path = str(tmp_path / 'proforma.pdf')
+    render_proforma_pdf(calculate_proforma(inputs), inputs, pdf_path)
+
+    texts = [text.decode('latin-1') for text in re.findall(rb'\((.*?)\) Tj', page_content(pdf_path))]
+    amounts = [texts[texts.index(name) + 1] for name in AGENCY_NAMES]
+    subtotal = texts[texts.index('Subtotal \\(Agency Fees\\): ') + 1]
+    assert amounts == ['1 000,01', '0,13', '2,68']
+    assert sum(to_minor(amount) for amount in amounts) == to_minor(subtotal)
@@ -0,0 +1,54 @@
+# test_template_cache.py
+
+import os
+import shutil
+
+from constants import FDA_TEMPLATE_PATH, TEMPLATE_PATH
+from template_cache import TemplateCache
+
+
+def copy_template(tmp_path, source, name):
+    path = str(tmp_path / name)
+    shutil.copyfile(source, path)
+    return path
+
+
+def test_copies_are_independent(tmp_path):
+    path = copy_template(tmp_path, TEMPLATE_PATH, 'template.xlsx')
+    cache = TemplateCache()
+    first = cache.get(path)
+    first.active['A1'] = 'changed'
+    second = cache.get(path)
+    assert second.active['A1'].value != 'changed'
+    assert second.active.title == first.active.title
+
+
+def test_reloads_when_file_changes(tmp_path):
+    path = copy_template(tmp_path, TEMPLATE_PATH, 'template.xlsx')
+    cache = TemplateCache()
+    wb = cache.get(path)
+    wb.active['A70'] = 'saved'
+    wb.save(path)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.get(path).active['A70'].value == 'saved'
+
+
+def test_eviction_and_invalidation(tmp_path):
+    proforma_path = copy_template(tmp_path, TEMPLATE_PATH, 'template.xlsx')
+    fda_path = copy_template(tmp_path, FDA_TEMPLATE_PATH, 'fda_template.xlsx')
+    cache = TemplateCache(max_bytes=0)
+    cache.get(proforma_path)
+    proforma_size = cache.size
+    cache.get(fda_path)
+    # Самый свежий шаблон остаётся, даже если он больше бюджета
+    assert 0 < cache.size != proforma_size
+    assert list(cache._entries) == [os.path.abspath(fda_path)]
+
+    cache = TemplateCache(max_bytes=10 ** 9)
+    cache.get(proforma_path)
+    cache.get(fda_path)
+    cache.invalidate(proforma_path)
+    assert list(cache._entries) == [os.path.abspath(fda_path)]
+    cache.invalidate()
+    assert cache.size == 0
@@ -0,0 +1,68 @@
+# test_template_index.py
+
+import shutil
+
+import pytest
+
+import template_index
+from calculations import calculate_proforma
+from constants import DEFAULT_INPUTS, FDA_TEMPLATE_PATH, TEMPLATE_PATH
+from proforma_document import build_replacements
+from template_index import load_template_index
+
+
+def fill_by_scan(ws, values):
+    """Заполнение обходом всего листа, как до индекса шаблона."""
+    for row in ws.iter_rows():
+        for cell in row:
+            if isinstance(cell.value, str):
+                for name, value in values.items():
+                    cell.value = cell.value.replace(f"{{{{{name}}}}}", str(value))
+
+
+def sheet_values(ws):
+    return {cell.coordinate: cell.value for row in ws.iter_rows() for cell in row}
+
+
+@pytest.mark.parametrize('path', [TEMPLATE_PATH, FDA_TEMPLATE_PATH])
+def test_index_fill_matches_full_scan(tmp_path, path):
+    from openpyxl import load_workbook
+
+    index = load_template_index(path, cache_dir=str(tmp_path))
+    if path == TEMPLATE_PATH:
+        inputs = dict(DEFAULT_INPUTS, lbp='199.9', beam='32.26', rdm='12.5', vessel_name='OCEAN',
+                      additional_dues=[], additional_fees=[])
+        values = build_replacements(calculate_proforma(inputs), inputs)
+    else:
+        values = {name: f"{position},50" for position, name in enumerate(index.placeholders)}
+
+    indexed = load_workbook(path).active
+    index.fill(indexed, values)
+    scanned = load_workbook(path).active
+    fill_by_scan(scanned, values)
+    assert sheet_values(indexed) == sheet_values(scanned)
+
+
+def test_index_is_reused_until_template_changes(tmp_path, monkeypatch):
+    from openpyxl import load_workbook
+
+    path = str(tmp_path / 'template.xlsx')
+    shutil.copyfile(TEMPLATE_PATH, path)
+    cache_dir = str(tmp_path / 'cache')
+    index = load_template_index(path, cache_dir=cache_dir)
+    assert 'vessel_name' in index.placeholders
+
+    # Из памяти и с диска — без повторной компиляции
+    monkeypatch.setattr(template_index, '_memory_cache', {})
+    compile_template = template_index.compile_template
+    monkeypatch.setattr(template_index, 'compile_template', lambda *args: pytest.fail("Шаблон компилируется заново"))
+    assert load_template_index(path, cache_dir=cache_dir).placeholders == index.placeholders
+
+    wb = load_workbook(path)
+    wb.active['A70'] = '{{new_field}}'
+    wb.save(path)
+    monkeypatch.setattr(template_index, 'compile_template', compile_template)
+    changed = load_template_index(path, cache_dir=cache_dir)
+    assert changed.template_hash != index.template_hash
+    assert changed.placeholders['new_field'] == ['A70']
+    assert changed.check(list(index.placeholders)) == (['new_field'], [])
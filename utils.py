@@ -3,7 +3,6 @@
 import sys
 import os  # Добавлен импорт os
 import math
-from tkinter import messagebox
 
 def parse_input(value, is_percentage=False):
     """
@@ -37,14 +36,15 @@ def parse_overtime(overtime_str):
     """
     Преобразует строковое значение овертайма в десятичную дробь.
     Например, "25%" -> 0.25
+
+    :raises ValueError: Если значение овертайма некорректно.
     """
     if overtime_str.endswith('%'):
         try:
             value = float(overtime_str.strip('%')) / 100
             return value
         except ValueError:
-            messagebox.showerror("Ошибка ввода", f"Некорректное значение овертайма: {overtime_str}")
-            return 0.0
+            raise ValueError(f"Некорректное значение овертайма: {overtime_str}")
     else:
         return 0.0
 
@@ -63,3 +63,46 @@ def resource_path(relative_path):
         base_path = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(base_path, relative_path)
 
+
+def _user_dir(override, windows, darwin, linux):
+    """Каталог приложения: из переменной окружения override, иначе путь для текущей платформы."""
+    if os.environ.get(override):
+        return os.environ[override]
+    if sys.platform.startswith('win'):
+        return windows
+    if sys.platform.startswith('darwin'):
+        return darwin
+    return linux
+
+
+def user_cache_dir(app_name="ProformaApp"):
+    """Каталог для кэшей приложения (можно переопределить переменной окружения PROFORMA_CACHE_DIR)."""
+    home = os.path.expanduser('~')
+    return _user_dir(
+        'PROFORMA_CACHE_DIR',
+        windows=os.path.join(os.environ.get('LOCALAPPDATA', home), app_name, 'Cache'),
+        darwin=os.path.join(home, 'Library', 'Caches', app_name),
+        linux=os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(home, '.cache')), app_name),
+    )
+
+
+def user_data_dir(app_name="ProformaApp"):
+    """Каталог для данных приложения (можно переопределить переменной окружения PROFORMA_DATA_DIR)."""
+    home = os.path.expanduser('~')
+    return _user_dir(
+        'PROFORMA_DATA_DIR',
+        windows=os.path.join(os.environ.get('APPDATA', home), app_name),
+        darwin=os.path.join(home, 'Library', 'Application Support', app_name),
+        linux=os.path.join(os.environ.get('XDG_DATA_HOME', os.path.join(home, '.local', 'share')), app_name),
+    )
+
+
+def user_log_dir(app_name="ProformaApp"):
+    """Каталог для журналов приложения (можно переопределить переменной окружения PROFORMA_LOG_DIR)."""
+    home = os.path.expanduser('~')
+    return _user_dir(
+        'PROFORMA_LOG_DIR',
+        windows=os.path.join(os.environ.get('LOCALAPPDATA', home), app_name, 'Logs'),
+        darwin=os.path.join(home, 'Library', 'Logs', app_name),
+        linux=os.path.join(os.environ.get('XDG_STATE_HOME', os.path.join(home, '.local', 'state')), app_name, 'logs'),
+    )
@@ -0,0 +1,267 @@
+# variance_history.py
+"""
+История «PDA против FDA» в колоночном виде: по файлу на колонку (фиксированная ширина, только дописывание)
+и справочники названий портов и сборов. Чтение — через np.memmap, отчёт считается векторно по всем строкам
+без создания объектов Python на строку.
+
+    python variance_history.py --by port
+    python variance_history.py --by port,fee --csv variance.csv
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import logging
+
+from constants import VARIANCE_HISTORY_DIR
+from money import to_minor, from_minor
+
+logger = logging.getLogger(__name__)
+
+# Колонки: имя -> тип NumPy. Суммы в центах, время — секунды Unix.
+# NumPy импортируется в методах: модуль загружается при старте GUI (вкладка истории), а numpy — нет
+COLUMNS = {
+    'case_id': 'int64',
+    'port': 'int32',
+    'fee': 'int32',
+    'pda': 'int64',
+    'fda': 'int64',
+    'recorded_at': 'int64',
+}
+GROUPINGS = {
+    'port': ('port',),
+    'fee': ('fee',),
+    'port,fee': ('port', 'fee'),
+}
+PERCENTILES = (5, 50, 95)
+
+
+class VarianceHistory:
+    """
+    Дописываемая история строк (случай, порт, сбор, сумма PDA, сумма FDA).
+
+    Названия портов и сборов хранятся кодами (индекс в справочнике). Повторная FDA по тому же случаю
+    дописывается новыми строками, а при чтении для каждой пары (случай, сбор) берётся последняя.
+    """
+
+    def __init__(self, directory=VARIANCE_HISTORY_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._dictionaries = None
+
+    def _column_path(self, name):
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def _dictionary_path(self, name):
+        return os.path.join(self.directory, f"{name}s.json")
+
+    def _load_dictionaries(self):
+        if self._dictionaries is None:
+            self._dictionaries = {}
+            for name in ('port', 'fee'):
+                try:
+                    with open(self._dictionary_path(name), encoding='utf-8') as f:
+                        values = json.load(f)
+                except (OSError, ValueError):
+                    values = []
+                self._dictionaries[name] = (values, {value: code for code, value in enumerate(values)})
+        return self._dictionaries
+
+    def _code(self, name, value):
+        values, codes = self._load_dictionaries()[name]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+            tmp_path = self._dictionary_path(name) + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(values, f, ensure_ascii=False)
+            os.replace(tmp_path, self._dictionary_path(name))
+        return code
+
+    def names(self, name):
+        """Справочник: список названий портов ('port') или сборов ('fee'), индекс — код."""
+        with self._lock:
+            return list(self._load_dictionaries()[name][0])
+
+    def _row_count(self):
+        """Число полных строк: по самой короткой колонке (недописанный хвост после сбоя игнорируется)."""
+        import numpy as np
+
+        counts = []
+        for name, dtype in COLUMNS.items():
+            try:
+                counts.append(os.path.getsize(self._column_path(name)) // np.dtype(dtype).itemsize)
+            except OSError:
+                return 0
+        return min(counts)
+
+    def append(self, case_id, port, lines, recorded_at=None):
+        """
+        Дописывает строки одного случая.
+
+        :param lines: Итерируемое (название сбора, сумма PDA, сумма FDA) в валюте.
+        """
+        import numpy as np
+
+        lines = list(lines)
+        if not lines:
+            return
+        recorded_at = int(recorded_at if recorded_at is not None else time.time())
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            port_code = self._code('port', port)
+            columns = {
+                'case_id': np.full(len(lines), case_id),
+                'port': np.full(len(lines), port_code),
+                'fee': np.array([self._code('fee', name) for name, _, _ in lines]),
+                'pda': np.array([to_minor(pda) for _, pda, _ in lines]),
+                'fda': np.array([to_minor(fda) for _, _, fda in lines]),
+                'recorded_at': np.full(len(lines), recorded_at),
+            }
+            # Колонки выравниваются по самой короткой, чтобы прерванная запись не сдвинула строки
+            rows = self._row_count()
+            for name, dtype in COLUMNS.items():
+                path = self._column_path(name)
+                with open(path, 'ab') as f:
+                    f.truncate(rows * np.dtype(dtype).itemsize)
+                    f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+        logger.debug(f"В историю отклонений добавлено строк: {len(lines)} (случай {case_id})")
+
+    def columns(self):
+        """Колонки истории как массивы, отображённые в память (только чтение)."""
+        import numpy as np
+
+        with self._lock:
+            rows = self._row_count()
+            if rows == 0:
+                return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+            return {name: np.memmap(self._column_path(name), dtype=dtype, mode='r', shape=(rows,))
+                    for name, dtype in COLUMNS.items()}
+
+    def latest_columns(self):
+        """Колонки без устаревших строк: для каждой пары (случай, сбор) — последняя записанная."""
+        import numpy as np
+
+        columns = self.columns()
+        size = columns['case_id'].shape[0]
+        if size == 0:
+            return columns
+        # Пара (случай, сбор) — одно целое; последнее вхождение пары = первое в обратном порядке
+        fee_count = int(columns['fee'].max()) + 1
+        pairs = np.asarray(columns['case_id'], dtype=np.int64) * fee_count + columns['fee']
+        reverse = np.arange(size - 1, -1, -1)
+        _, first = np.unique(pairs[reverse], return_index=True)
+        keep = np.sort(reverse[first])
+        if keep.size == size:
+            return columns
+        return {name: np.asarray(column)[keep] for name, column in columns.items()}
+
+    def report(self, by='port'):
+        """
+        Отклонения FDA от PDA по группам.
+
+        :param by: 'port', 'fee' или 'port,fee'.
+        :return: Список словарей по группам (по убыванию суммы PDA): количество строк, суммы PDA и FDA,
+            среднее отклонение (смещение оценки), среднее абсолютное, смещение в % от PDA
+            и перцентили относительного отклонения (в %, только по строкам с ненулевой PDA).
+        """
+        import numpy as np
+
+        keys = GROUPINGS[by]
+        columns = self.latest_columns()
+        if columns['case_id'].shape[0] == 0:
+            return []
+
+        pda = np.asarray(columns['pda'], dtype=np.int64)
+        fda = np.asarray(columns['fda'], dtype=np.int64)
+        variance = fda - pda
+
+        # Код группы: порт и/или сбор в одном целом числе; сортировка собирает группы в отрезки
+        group = np.zeros(pda.shape[0], dtype=np.int64)
+        for key in keys:
+            group = group * (int(columns[key].max()) + 1) + np.asarray(columns[key], dtype=np.int64)
+        order = np.argsort(group, kind='stable')
+        group = group[order]
+        pda, fda, variance = pda[order], fda[order], variance[order]
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        counts = np.diff(np.r_[starts, group.shape[0]])
+
+        total_pda = np.add.reduceat(pda, starts)
+        total_fda = np.add.reduceat(fda, starts)
+        total_variance = np.add.reduceat(variance, starts)
+        total_abs = np.add.reduceat(np.abs(variance), starts)
+
+        nonzero = pda != 0
+        relative = np.where(nonzero, variance / np.where(nonzero, pda, 1), np.nan) * 100
+
+        names = {key: self.names(key) for key in keys}
+        first_rows = order[starts]
+        result = []
+        for index, start in enumerate(starts):
+            segment = relative[start:start + counts[index]]
+            segment = segment[~np.isnan(segment)]
+            percentiles = np.percentile(segment, PERCENTILES) if segment.size else [np.nan] * len(PERCENTILES)
+            row = {key: names[key][int(columns[key][first_rows[index]])] for key in keys}
+            row.update({
+                'lines': int(counts[index]),
+                'pda': from_minor(int(total_pda[index])),
+                'fda': from_minor(int(total_fda[index])),
+                'variance': from_minor(int(total_variance[index])),
+                'mean_variance': from_minor(int(total_variance[index])) / int(counts[index]),
+                'mean_abs_variance': from_minor(int(total_abs[index])) / int(counts[index]),
+                'bias_percent': (float(total_variance[index]) / float(total_pda[index]) * 100
+                                 if total_pda[index] else float('nan')),
+            })
+            for percentile, value in zip(PERCENTILES, percentiles):
+                row[f'p{percentile}_percent'] = float(value)
+            result.append(row)
+        result.sort(key=lambda row: row['pda'], reverse=True)
+        return result
+
+
+def report_columns(by):
+    return list(GROUPINGS[by]) + ['lines', 'pda', 'fda', 'variance', 'mean_variance', 'mean_abs_variance',
+                                  'bias_percent'] + [f'p{percentile}_percent' for percentile in PERCENTILES]
+
+
+def write_report_csv(rows, by, path):
+    import csv
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=report_columns(by))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+_history = None
+
+
+def get_variance_history():
+    global _history
+    if _history is None:
+        _history = VarianceHistory()
+    return _history
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Отклонения FDA от PDA по истории расчётов.")
+    parser.add_argument('--by', choices=sorted(GROUPINGS), default='port', help="Группировка отчёта")
+    parser.add_argument('--csv', help="Сохранить отчёт в CSV")
+    args = parser.parse_args(argv)
+
+    rows = get_variance_history().report(args.by)
+    if args.csv:
+        write_report_csv(rows, args.by, args.csv)
+    for row in rows:
+        group = ' / '.join(row[key] for key in GROUPINGS[args.by])
+        print(f"{group:40} строк {row['lines']:8}  PDA {row['pda']:14.2f}  FDA {row['fda']:14.2f}  "
+              f"смещение {row['bias_percent']:7.2f}%  p50 {row['p50_percent']:7.2f}%  p95 {row['p95_percent']:7.2f}%")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())